@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistics of the dutch words, from the Dutch Lexicon Project (DLP2).
+
+The DLP2 excel file is large and slow to parse, and only a few columns are used.
+The first time, load_lexicon reads the sheet, keeps the columns in LEXICON_COLUMNS
+and saves them next to the excel file (DLP2_dataset_cache.parquet, or .pkl without pyarrow).
+The next times, the cache is read instead, as long as the excel file did not change
+(same size and modification time, or same content).
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import hashlib
+import pandas as pd
+
+# Sheet of the DLP2 file with the statistics of each word
+LEXICON_SHEET = 'DLP2_eerste_analyses'
+
+# Columns kept, with the names used in the pipeline
+LEXICON_COLUMNS = {'Woord': 'woord',
+                   'Length': 'length',
+                   'Nsyl': 'syllabels',
+                   'SUBTLEX2': 'frequency',
+                   'N_phonemes': 'phonemes',
+                   'OLD20': 'old20',
+                   'PLD30': 'pld30'}
+
+
+# Load the statistics of the dutch words, from the cache if it's still valid
+def load_lexicon(opt):
+
+    source = os.path.join(opt['dir']['stats'], 'datasets', 'DLP2_dataset.xlsx')
+    cache, info = get_cache_paths(source)
+
+    # Information about the file the cache was made from
+    previous = None
+    if os.path.exists(cache) and os.path.exists(info):
+        with open(info, 'r') as f:
+            previous = json.load(f)
+
+    # Same columns and same excel file: read the cache
+    if previous is not None and previous['columns'] == LEXICON_COLUMNS:
+
+        stats = os.stat(source)
+
+        if previous['size'] == stats.st_size and previous['mtime'] == stats.st_mtime:
+            return read_cache(cache)
+
+        # The file may only have been touched: look at the content
+        if previous['hash'] == get_file_hash(source):
+            previous['mtime'] = stats.st_mtime
+            save_info(info, previous)
+            return read_cache(cache)
+
+    # Otherwise read the excel file and make the cache
+    lexicon = pd.read_excel(source, sheet_name = LEXICON_SHEET, usecols = list(LEXICON_COLUMNS.keys()))
+    lexicon = lexicon[list(LEXICON_COLUMNS.keys())].rename(columns = LEXICON_COLUMNS)
+
+    save_cache(cache, lexicon)
+
+    stats = os.stat(source)
+    save_info(info, {'columns': LEXICON_COLUMNS, 'size': stats.st_size, 'mtime': stats.st_mtime,
+                     'hash': get_file_hash(source)})
+
+    return lexicon
+
+
+### Subfunctions
+
+# Paths of the cache and of its information, next to the excel file.
+# Parquet needs pyarrow, otherwise the cache is a pickle
+def get_cache_paths(source):
+
+    try:
+        import pyarrow
+        extension = 'parquet'
+    except ImportError:
+        extension = 'pkl'
+
+    base = os.path.splitext(source)[0]
+
+    return f'{base}_cache.{extension}', f'{base}_cache.json'
+
+
+def read_cache(cache):
+
+    if cache.endswith('.parquet'):
+        return pd.read_parquet(cache)
+
+    return pd.read_pickle(cache)
+
+
+def save_cache(cache, lexicon):
+
+    if cache.endswith('.parquet'):
+        lexicon.to_parquet(cache, index = False)
+    else:
+        lexicon.to_pickle(cache)
+
+
+def save_info(info, content):
+
+    with open(info, 'w') as f:
+        json.dump(content, f, indent = 2)
+
+
+# Hash of the content of a file
+def get_file_hash(filename):
+
+    fileHash = hashlib.sha256()
+
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            fileHash.update(chunk)
+
+    return fileHash.hexdigest()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Orthographic neighbourhood of any string, against the words of a lexicon.
+
+OLD20 is the mean Levenshtein distance of a string from its 20 closest words in the
+lexicon (the string itself excluded, if it is a word). DLP2 gives it only for its
+words: compute_old20 gives it for pseudowords and any other string, all at once.
+
+Words of the lexicon are sorted by length. A word that differs by n letters in length is
+at least n changes away, so each string is first compared to the words of similar length
+only, and to longer and shorter ones only if its 20 closest words can still change.
+The distances of each block of strings are computed together (rapidfuzz, installed
+with Levenshtein), or one by one with Levenshtein if rapidfuzz is missing.
+
+@author: Filippo Cerpelloni
+"""
+
+import numpy as np
+import pandas as pd
+import Levenshtein as lev
+
+try:
+    from rapidfuzz.process import cdist
+    from rapidfuzz.distance import Levenshtein as rfLevenshtein
+except ImportError:
+    cdist = None
+
+# Number of closest words averaged
+NEIGHBOURS = 20
+
+# Strings compared to the lexicon at once (limits the memory of the distances)
+BLOCK_SIZE = 1000
+
+
+# OLD20 of each string against the words of the lexicon
+# - nWorkers: threads used by rapidfuzz to compute the distances (-1 uses all the cores)
+def compute_old20(strings, lexicon, nNeighbours = NEIGHBOURS, nWorkers = 1):
+
+    strings = pd.Series(strings, dtype = object).str.lower()
+    lexicon = pd.Series(lexicon, dtype = object).dropna().str.lower().drop_duplicates()
+
+    # Words of the lexicon, sorted by length
+    lexLengths = lexicon.str.len().to_numpy()
+    order = np.argsort(lexLengths, kind = 'stable')
+    lexWords = lexicon.to_numpy()[order]
+    lexLengths = lexLengths[order]
+
+    # Each string once
+    codes, uniqueStrings = pd.factorize(strings)
+    lengths = np.array([len(string) for string in uniqueStrings], dtype = int)
+    old20 = np.full(len(uniqueStrings), np.nan)
+
+    for length in np.unique(lengths):
+
+        pending = np.flatnonzero(lengths == length)
+        window = 1
+
+        while len(pending):
+
+            # Words within the window of lengths
+            first = np.searchsorted(lexLengths, length - window, side = 'left')
+            last = np.searchsorted(lexLengths, length + window, side = 'right')
+            allWords = first == 0 and last == len(lexWords)
+
+            means, closest = get_closest_words(uniqueStrings[pending], lexWords[first:last], nNeighbours, nWorkers)
+
+            # Words outside the window are at least window + 1 changes away:
+            # the closest words are final if none of them is further than that
+            done = allWords | (closest <= window + 1)
+            old20[pending[done]] = means[done]
+
+            pending = pending[~done]
+            window = 2 * window + 1
+
+    # Trials without a string have no OLD20
+    return np.where(codes >= 0, old20[codes], np.nan)
+
+
+### Subfunctions
+
+# Mean distance of each string from its closest words and distance of the furthest of them.
+# Strings with less than nNeighbours words (other than themselves) get the mean of the ones there are,
+# and an infinite furthest distance
+def get_closest_words(strings, words, nNeighbours, nWorkers):
+
+    means = np.full(len(strings), np.nan)
+    closest = np.full(len(strings), np.inf)
+
+    for start in range(0, len(strings), BLOCK_SIZE):
+
+        block = slice(start, start + BLOCK_SIZE)
+        distances = get_distances(strings[block], words, nWorkers)
+
+        # A word is not its own neighbour
+        distances = np.where(distances == 0, np.inf, distances)
+        nWords = np.isfinite(distances).sum(axis = 1)
+
+        if distances.shape[1] > nNeighbours:
+            distances = np.partition(distances, nNeighbours - 1, axis = 1)[:, :nNeighbours]
+
+        distances = np.sort(distances, axis = 1)[:, :nNeighbours]
+        nKept = np.minimum(nWords, nNeighbours)
+
+        with np.errstate(invalid = 'ignore'):
+            means[block] = np.where(nKept > 0, np.where(np.isfinite(distances), distances, 0).sum(axis = 1) / nKept, np.nan)
+
+        closest[block] = np.where(nKept == nNeighbours, distances[:, -1] if distances.shape[1] else np.inf, np.inf)
+
+    return means, closest
+
+
+# Levenshtein distance of each string (rows) from each word (columns)
+def get_distances(strings, words, nWorkers):
+
+    if cdist is not None:
+        return cdist(list(strings), list(words), scorer = rfLevenshtein.distance,
+                     dtype = np.int32, workers = nWorkers).astype(float)
+
+    return np.array([[lev.distance(string, word) for word in words] for string in strings],
+                    dtype = float).reshape(len(strings), len(words))
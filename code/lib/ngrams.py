@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Letter and bigram frequencies of dutch, counted on the words of the lexicon (DLP2).
+
+Each word counts as many times as its frequency (SUBTLEX2). All the letters of all
+the words are counted at once, in one long table (see NGRAM_COLUMNS):
+    - kind: 'letter', 'bigram' (two letters next to each other) or 'position' (letter in a position)
+    - ngram: the letter or the bigram
+    - position: position of the letter in the word, from 1 (only for 'position')
+    - tokens: occurrences, weighted by the frequency of the words
+    - types: occurrences in the list of words, not weighted
+    - frequency: percentage of the tokens of the same kind (and same position)
+Only the letters a-z are counted (bigrams with other characters are skipped).
+
+The table is saved next to the lexicon cache (DLP2_dataset_ngrams.parquet, or .pkl without
+pyarrow) and made again only when the DLP2 file changes.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from lexicon import load_lexicon, get_cache_paths, read_cache, save_cache, save_info
+
+# Columns of the table of frequencies
+NGRAM_COLUMNS = ['kind', 'ngram', 'position', 'tokens', 'types', 'frequency']
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+# Load the letter and bigram frequencies, from the cache if it was made from the same DLP2 file
+def load_ngrams(opt):
+
+    lexicon = load_lexicon(opt)
+
+    # Information of the lexicon cache, updated by load_lexicon
+    source = os.path.join(opt['dir']['stats'], 'datasets', 'DLP2_dataset.xlsx')
+    _, lexiconInfo = get_cache_paths(source)
+    cache, info = get_ngrams_paths(source)
+
+    with open(lexiconInfo, 'r') as f:
+        sourceHash = json.load(f)['hash']
+
+    if os.path.exists(cache) and os.path.exists(info):
+        with open(info, 'r') as f:
+            if json.load(f)['hash'] == sourceHash:
+                return read_cache(cache)
+
+    ngrams = count_ngrams(lexicon['woord'], lexicon['frequency'])
+
+    save_cache(cache, ngrams)
+    save_info(info, {'hash': sourceHash})
+
+    return ngrams
+
+
+# Count letters, bigrams and letters in each position of the words, weighted by their frequency
+def count_ngrams(words, weights):
+
+    words = pd.Series(words, dtype = object).fillna('').str.lower().to_numpy()
+    weights = pd.Series(weights, dtype = float).fillna(0).to_numpy()
+
+    # All the letters, with the word they come from and their position in it
+    lengths = np.array([len(word) for word in words], dtype = int)
+    letters = np.array(list(''.join(words)), dtype = object)
+    wordIdx = np.repeat(np.arange(len(words)), lengths)
+    position = np.arange(len(letters)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    isLetter = np.isin(letters, list(LETTERS))
+
+    # Bigrams: each letter with the next one in the same word
+    first = np.flatnonzero(position[:-1] < lengths[wordIdx[:-1]] - 1)
+    first = first[isLetter[first] & isLetter[first + 1]]
+
+    ngrams = pd.concat([pd.DataFrame({'kind': 'letter', 'ngram': letters[isLetter], 'position': 0,
+                                      'weight': weights[wordIdx[isLetter]]}),
+                        pd.DataFrame({'kind': 'bigram', 'ngram': letters[first] + letters[first + 1], 'position': 0,
+                                      'weight': weights[wordIdx[first]]}),
+                        pd.DataFrame({'kind': 'position', 'ngram': letters[isLetter], 'position': position[isLetter] + 1,
+                                      'weight': weights[wordIdx[isLetter]]})],
+                       ignore_index = True)
+
+    counts = ngrams.groupby(['kind', 'position', 'ngram']).agg(tokens = ('weight', 'sum'),
+                                                              types = ('weight', 'size')).reset_index()
+
+    # Percentage of the tokens of the same kind and position
+    totals = counts.groupby(['kind', 'position'])['tokens'].transform('sum')
+    counts['frequency'] = np.where(totals > 0, 100 * counts['tokens'] / totals.where(totals > 0, 1), np.nan)
+
+    # Positions only make sense for the letters in a position
+    counts['position'] = counts['position'].where(counts['kind'] == 'position')
+
+    return counts[NGRAM_COLUMNS]
+
+
+# Frequency of each letter, as in VBT_stimuli-letters_desc-list-with-stats.csv
+def get_letter_frequency(ngrams):
+
+    letters = ngrams[ngrams['kind'] == 'letter']
+
+    return letters[['ngram', 'frequency']].rename(columns = {'ngram': 'letter'}).reset_index(drop = True)
+
+
+# Mean frequency of the bigrams of each word.
+# Words without bigrams (one letter) have no mean
+def get_bigram_frequency(words, ngrams):
+
+    bigrams = ngrams[ngrams['kind'] == 'bigram'].set_index('ngram')['frequency']
+
+    words = pd.Series(words, dtype = object).str.lower()
+    wordBigrams = words.map(lambda word: [word[i:i+2] for i in range(len(word) - 1)] if isinstance(word, str) else [])
+    wordBigrams = wordBigrams.explode().dropna()
+
+    # Bigrams never seen in the lexicon have frequency 0
+    frequencies = wordBigrams.map(bigrams).fillna(0)
+
+    return frequencies.groupby(level = 0).mean().reindex(words.index).to_numpy()
+
+
+### Subfunctions
+
+def get_ngrams_paths(source):
+
+    cache, _ = get_cache_paths(source)
+    base, extension = os.path.splitext(cache)
+    base = base[:-len('_cache')]
+
+    return f'{base}_ngrams{extension}', f'{base}_ngrams.json'
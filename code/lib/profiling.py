@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure the stages of preproc, stats and visualization.
+
+When enabled in the options (opt['profile']['use']), start_profile starts recording the run.
+Each part of the run is then measured by:
+    - the context manager profile(name): with profile('make_accuracy_timing'): ...
+    - the decorator profiled: the part is named after the function
+A part opened inside another one is a unit of work of that stage (e.g. a subject).
+Units run in worker processes are measured there (profile_unit) and added to the
+stage of the main process (add_unit).
+
+For each stage and unit, records:
+    - time: elapsed and processor time (s)
+    - rows: rows of the tables read (through read_table)
+    - files read (through read_table) and written (count_written, or for the stages
+      the files of the derivatives folder changed while the stage was running)
+    - memory: peak resident memory of the process so far (MB), i.e. since the process started and not
+      of the part alone, and how much the part raised it (0 if it stayed below an earlier peak).
+      Stages run in a pool of workers also record the peak of the workers (units measured there)
+
+At the end of the run, the profile is saved as json (opt['profile']['output']) and summarized in a table.
+When profiling is not enabled, all these functions do nothing.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import platform
+from functools import wraps
+from contextlib import contextmanager
+
+# Memory is measured where available (not on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# State of the current run: started or not, parts open and parts measured
+PROFILE = {'run': None, 'open': [], 'records': []}
+
+
+# Start recording the run, if profiling is enabled. The profile is saved when the run ends
+def start_profile(opt, runName):
+
+    if not opt.get('profile', {}).get('use', False):
+        return
+
+    PROFILE['run'] = {'name': runName,
+                      'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                      'python': platform.python_version(),
+                      'platform': platform.platform(),
+                      'output': opt['profile']['output'],
+                      'watch': opt['dir']['derivatives'],
+                      'start': time.perf_counter()}
+    PROFILE['open'] = []
+    PROFILE['records'] = []
+
+    atexit.register(save_profile)
+
+
+# Measure the part of the run inside the 'with' block
+@contextmanager
+def profile(name):
+
+    if PROFILE['run'] is None:
+        yield
+        return
+
+    # Parts inside another part are units of work of the stage that contains them
+    parent = PROFILE['open'][0]['name'] if PROFILE['open'] else None
+
+    record = {'name': name, 'stage': parent or name, 'kind': 'unit' if parent else 'stage',
+              'time': 0.0, 'cpu': 0.0, 'rows': 0, 'filesRead': 0, 'filesWritten': 0,
+              'peakRss': None, 'rssIncrease': None, 'peakRssWorkers': None}
+    PROFILE['open'].append(record)
+
+    startWall, startCpu, startRss = time.perf_counter(), time.process_time(), get_peak_rss()
+    startNs = time.time_ns()
+
+    try:
+        yield record
+
+    finally:
+        record['time'] = time.perf_counter() - startWall
+        record['cpu'] = time.process_time() - startCpu
+
+        if startRss is not None:
+            record['peakRss'] = get_peak_rss()
+            record['rssIncrease'] = record['peakRss'] - startRss
+
+        # Stages find the files they wrote, units count them as they go
+        if record['kind'] == 'stage':
+            record['filesWritten'] = max(record['filesWritten'], count_changed_files(PROFILE['run']['watch'], startNs))
+
+        PROFILE['open'].remove(record)
+        PROFILE['records'].append(record)
+
+
+# Measure a unit of work in a worker process (e.g. a pair extracted in a pool).
+# Workers do not share the profile of the main process: the unit is recorded on its own,
+# to be sent back and added to the stage of the main process (add_unit).
+# The record is complete when the 'with' block ends. None if profiling is not enabled
+@contextmanager
+def profile_unit(opt, name):
+
+    if not opt.get('profile', {}).get('use', False):
+        yield None
+        return
+
+    # A stage that holds the unit, in place of the one of the main process
+    PROFILE['run'] = {'name': 'worker'}
+    PROFILE['open'] = [{'name': 'worker', 'rows': 0, 'filesRead': 0, 'filesWritten': 0}]
+    PROFILE['records'] = []
+
+    try:
+        with profile(name) as record:
+            yield record
+
+    finally:
+        PROFILE['run'] = None
+        PROFILE['open'] = []
+        PROFILE['records'] = []
+
+
+# Add a unit measured in a worker process (see profile_unit) to the stage open in this process,
+# with the rows and files it read and the memory of the worker
+def add_unit(record):
+
+    if PROFILE['run'] is None or record is None or not PROFILE['open']:
+        return
+
+    record['stage'] = PROFILE['open'][0]['name']
+
+    for parent in PROFILE['open']:
+        parent['filesRead'] += record['filesRead']
+        parent['rows'] += record['rows']
+
+        if record['peakRss'] is not None:
+            parent['peakRssWorkers'] = max(parent['peakRssWorkers'] or 0, record['peakRss'])
+
+    PROFILE['records'].append(record)
+
+
+# Decorator: measure each call of the function, named after the function
+def profiled(function):
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with profile(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+# Add a file read and its rows to the parts open
+def count_read(rows):
+
+    for record in PROFILE['open']:
+        record['filesRead'] += 1
+        record['rows'] += rows
+
+
+# Add files written to the parts open
+def count_written(nFiles = 1):
+
+    for record in PROFILE['open']:
+        record['filesWritten'] += nFiles
+
+
+# Save the profile as json and print the summary
+def save_profile():
+
+    if PROFILE['run'] is None:
+        return
+
+    run = PROFILE['run']
+    run['time'] = time.perf_counter() - run['start']
+
+    os.makedirs(run['output'], exist_ok = True)
+    filename = os.path.join(run['output'], f"{run['name']}_{time.strftime('%Y-%m-%d_%Hh%M.%S')}_profile.json")
+
+    with open(filename, 'w') as f:
+        json.dump({'run': {key: value for key, value in run.items() if key not in ['start', 'watch']},
+                   'records': PROFILE['records']}, f, indent = 2)
+
+    print_summary(PROFILE['records'], run['time'])
+    print(f"\nProfile saved in: {filename}")
+
+    # Save only once
+    PROFILE['run'] = None
+
+
+### Subfunctions
+
+# One row per stage, with the units of work summarized
+def print_summary(records, totalTime):
+
+    stages = [r for r in records if r['kind'] == 'stage']
+
+    print(f"\n\nPROFILE OF THE RUN: {totalTime:.2f} s\n")
+    print(f"{'stage':<32}{'time (s)':>10}{'cpu (s)':>10}{'rows':>10}{'read':>7}{'written':>9}"
+          f"{'process peak so far (MB)':>26}{'workers peak (MB)':>19}{'units':>7}{'unit mean (s)':>15}{'unit max (s)':>14}")
+
+    for stage in stages:
+
+        units = [r['time'] for r in records if r['kind'] == 'unit' and r['stage'] == stage['name']]
+        unitMean = f"{sum(units) / len(units):.3f}" if units else '-'
+        unitMax = f"{max(units):.3f}" if units else '-'
+        peak = f"{stage['peakRss']:.1f}" if stage['peakRss'] is not None else '-'
+        workersPeak = f"{stage['peakRssWorkers']:.1f}" if stage['peakRssWorkers'] is not None else '-'
+
+        print(f"{stage['name']:<32}{stage['time']:>10.2f}{stage['cpu']:>10.2f}{stage['rows']:>10}{stage['filesRead']:>7}"
+              f"{stage['filesWritten']:>9}{peak:>26}{workersPeak:>19}{len(units):>7}{unitMean:>15}{unitMax:>14}")
+
+
+# Peak resident memory of the process so far, in MB
+def get_peak_rss():
+
+    if resource is None:
+        return None
+
+    # Linux gives it in kB, macOS in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+# Number of files in the folder (and subfolders) changed since a given time
+def count_changed_files(folder, sinceNs):
+
+    changed = 0
+
+    for path, _, files in os.walk(folder):
+        for file in files:
+            try:
+                if os.stat(os.path.join(path, file)).st_mtime_ns >= sinceNs:
+                    changed += 1
+            except OSError:
+                continue
+
+    return changed
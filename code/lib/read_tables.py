@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Read csv tables for preproc, stats and visualization.
+
+All the csv files go through read_table, that:
+    - reads only the columns needed (usecols)
+    - gives each column an explicit type, instead of guessing it from the values
+    - encodes the columns with categories (see vocabulary.py), and stops if a value is not one of them
+    - uses the parser chosen in the options (opt['reader']['engine']: 'c' or 'pyarrow')
+    - reports, if asked (opt['reader']['report']), size and parsing time of each file
+    - counts files and rows read in the stage being profiled (see profiling.py)
+
+Tables kept in memory instead of being read back (e.g. handed over by the extraction)
+are given the same form by as_read_table.
+
+The types of the tables used in the pipeline are listed in DTYPES
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from profiling import count_read
+
+# Types of the columns of the tables read in the pipeline:
+# - pavlovia: raw csv of the experiment (only the columns used)
+# - training, refresh, test, keypresses, phases: tables in extracted-data
+DTYPES = {'pavlovia': {'ID': 'float64', 'nlLet': str, 'nlWrd': str, 'test': 'float64', 'testResp': str},
+
+          'training': {'nlLet': str, 'letter': str, 'nlWrd': str, 'test': 'float64', 'testResp': str,
+                       'score': bool, 'word': str, 'readingTime': 'float64', 'checkingTime': 'float64',
+                       'tested': 'int64', 'writingTime': 'float64'},
+
+          'refresh': {'nlLet': str, 'letter': str, 'readingTime': 'float64', 'checkingTime': 'float64'},
+
+          'test': {'nlWrd': str, 'testResp': str, 'score': bool, 'word': 'int64',
+                   'readingTime': 'float64', 'writingTime': 'float64', 'breaks': 'float64', 'check': 'float64'},
+
+          'keypresses': {'word': 'int64', 'key': str, 'time': 'float64'},
+
+          'phases': {'Phase': str, 'Timing': 'float64'}}
+
+
+# Read a csv file.
+# - columns: only read these columns, in this order (all of them if None).
+#            Columns not present in the file are skipped (e.g. letters training has no words)
+# - dtypes: types of the columns, e.g. DTYPES['test']. Types of columns not read are ignored
+def read_table(opt, filename, columns = None, dtypes = None):
+
+    engine = opt.get('reader', {}).get('engine', 'c')
+
+    start = time.perf_counter()
+
+    # Keep only the columns present in the file, and only give the types of those
+    if columns is not None:
+        header = pd.read_csv(filename, nrows = 0).columns
+        columns = [col for col in columns if col in header]
+
+        if dtypes is not None:
+            dtypes = {col: dtype for col, dtype in dtypes.items() if col in columns}
+
+    # Categories (see vocabulary.py) are read as text and encoded after
+    categories = {col: dtype for col, dtype in (dtypes or {}).items() if isinstance(dtype, pd.CategoricalDtype)}
+    if categories:
+        dtypes = {col: str if col in categories else dtype for col, dtype in dtypes.items()}
+
+    if engine == 'pyarrow':
+        table = read_with_pyarrow(filename, columns, dtypes)
+    else:
+        # Numbers are read back exactly as they were saved, as the tables kept in memory
+        # (the default parser can be off in the last digit)
+        table = pd.read_csv(filename, usecols = columns, dtype = dtypes, float_precision = 'round_trip')
+
+    # Columns are read in the order of the file, give them back in the order asked
+    if columns is not None:
+        table = table[columns]
+
+    table = encode_categories(table, categories, filename)
+
+    elapsed = time.perf_counter() - start
+
+    # Count file and rows in the stage being profiled (if any)
+    count_read(len(table))
+
+    # Notify the user
+    if opt.get('reader', {}).get('report', False):
+        print(f"Read {os.path.basename(filename)}: {os.path.getsize(filename) / 1024:.1f} kB in {elapsed * 1000:.1f} ms")
+
+    return table
+
+
+# Give a table in memory the form it would have if it was saved as csv and read with read_table:
+# - rows numbered from 0
+# - empty text is missing (empty cells are read as missing values)
+# - columns of the given types (e.g. DTYPES['test']), when present
+def as_read_table(table, dtypes = None):
+
+    table = table.reset_index(drop = True)
+
+    for col in table.columns[table.dtypes == object]:
+        table[col] = table[col].where(table[col].notna() & (table[col] != ''), np.nan)
+
+    if dtypes is None:
+        return table
+
+    # Text stays missing where missing (astype would make it 'nan')
+    for col, dtype in dtypes.items():
+        if col in table.columns and dtype == str:
+            table[col] = table[col].where(table[col].isna(), table[col].astype(str))
+
+    table = table.astype({col: dtype for col, dtype in dtypes.items() if col in table.columns and dtype != str})
+
+    return table
+
+
+### Subfunctions
+
+# Read a csv file with pyarrow.
+# Types are given to pyarrow directly: through pandas they would be guessed first
+# and converted after (e.g. the response '12' would become '12.0')
+def read_with_pyarrow(filename, columns, dtypes):
+
+    import pyarrow as pa
+    import pyarrow.csv
+
+    dtypes = dtypes or {}
+
+    columnTypes = {col: pa.string() if dtype == str else pa.from_numpy_dtype(np.dtype(dtype))
+                   for col, dtype in dtypes.items()}
+
+    # Empty cells are missing values also in text columns, as in pandas
+    convertOptions = pyarrow.csv.ConvertOptions(include_columns = columns, column_types = columnTypes,
+                                                strings_can_be_null = True)
+    table = pyarrow.csv.read_csv(filename, convert_options = convertOptions).to_pandas()
+
+    # Missing text is None in pyarrow, NaN in pandas
+    for col in table.columns[table.dtypes == object]:
+        table[col] = table[col].where(table[col].notna(), np.nan)
+
+    return table
+
+
+# Encode the columns with their categories.
+# A value that is not one of the categories would become a missing value and silently drop
+# out of merges and groupings: stop instead (e.g. a table made after the vocabulary)
+def encode_categories(table, categories, filename):
+
+    for col, dtype in categories.items():
+
+        if col not in table.columns:
+            continue
+
+        encoded = table[col].astype(dtype)
+        unknown = table[col][encoded.isna() & table[col].notna()].unique()
+
+        if len(unknown):
+            raise ValueError(f"{os.path.basename(filename)}: {len(unknown)} values of '{col}' are not in the vocabulary "
+                             f"(e.g. {', '.join(map(str, unknown[:5]))}). Run make_stimuli_statistics again to update it")
+
+        table[col] = encoded
+
+    return table
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared encoding of the words, subjects and scripts of all the tables.
+
+Words, subjects and scripts are repeated in every row of the trial tables and are the
+keys of the joins between results and statistics. Instead of strings, the tables
+keep them as categories (pandas Categorical): one integer code per row and one copy
+of each string. All the tables use the same categories, so joins and groupings are
+made on the codes and the values saved in the csv files do not change.
+
+The vocabulary is made once per run by make_stimuli_statistics, from the stimuli,
+the DLP2 words and the results, and saved in outputs/derivatives/stats/datasets/VBT_vocabulary.json.
+Stats and visualization read the tables with it (see get_vocabulary_dtypes). read_table stops
+if a table has a value the vocabulary does not (e.g. a table made again after it).
+Grouping by encoded columns needs observed = True, to only get the combinations present.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import pandas as pd
+
+# Columns encoded with the vocabulary
+VOCABULARY_COLUMNS = ['subject', 'script', 'woord']
+
+
+# Make the categories of each column from all the tables that have it, sorted
+def build_vocabulary(tables):
+
+    vocabulary = {}
+
+    for col in VOCABULARY_COLUMNS:
+
+        values = [pd.Series(table[col].dropna().unique(), dtype = object) for table in tables if col in table.columns]
+        values = pd.concat(values, ignore_index = True).astype(str).unique() if values else []
+
+        vocabulary[col] = pd.CategoricalDtype(sorted(values))
+
+    return vocabulary
+
+
+# Encode the columns of the table that are in the vocabulary
+def encode_table(table, vocabulary):
+
+    for col, dtype in vocabulary.items():
+        if col in table.columns:
+            table[col] = table[col].astype(dtype)
+
+    return table
+
+
+def save_vocabulary(opt, vocabulary):
+
+    with open(get_vocabulary_path(opt), 'w') as f:
+        json.dump({col: list(dtype.categories) for col, dtype in vocabulary.items()}, f, ensure_ascii = False)
+
+
+# Load the vocabulary saved in the last run. None if there is none
+def load_vocabulary(opt):
+
+    if not os.path.exists(get_vocabulary_path(opt)):
+        return None
+
+    with open(get_vocabulary_path(opt), 'r') as f:
+        categories = json.load(f)
+
+    return {col: pd.CategoricalDtype(values) for col, values in categories.items()}
+
+
+# Types to read a table with, where the encoded columns use the vocabulary (if there is one)
+def get_vocabulary_dtypes(vocabulary, dtypes):
+
+    if vocabulary is None:
+        return dtypes
+
+    return {col: vocabulary.get(col, dtype) for col, dtype in dtypes.items()}
+
+
+### Subfunctions
+
+def get_vocabulary_path(opt):
+
+    return os.path.join(opt['dir']['stats'], 'datasets', 'VBT_vocabulary.json')
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Standalone script to measure the cost of each stage of preproc_main.py, on more and more participants
+
+For each number of subjects asked, makes a synthetic dataset (see make_synthetic_dataset.py)
+and runs the stages of the pipeline on it:
+- preproc_extract_csv, on all the csv files
+- preproc_extract_log, on all the log files, split by extractor
+  (events: reading and splitting the events, letters, training, test, phases)
+- preproc_merge_and_save, on all the pairs
+- make_accuracy_timing, make_stimuli_statistics, make_phases_statistics
+
+Each stage runs in a new process, to measure its own peak memory.
+For each stage and number of subjects, records:
+- wall: elapsed time (s)
+- cpu: processor time of the process (s)
+- peakRss: peak resident memory of the process (MB), at the end of the stage
+
+Results are saved as json (outputs/derivatives/benchmarks/ by default) and printed as a table.
+A previous results file can be given to compare the runs and report the stages that became slower:
+    python benchmark_pipeline.py --subjects 10 50 100
+    python benchmark_pipeline.py --subjects 10 50 100 --compare <previous results>.json
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from preproc_option import preproc_option
+from make_synthetic_dataset import make_synthetic_dataset
+
+# Stages of the pipeline, in the order in which they run
+STAGES = ['preproc_extract_csv', 'preproc_extract_log', 'preproc_merge_and_save',
+          'make_accuracy_timing', 'make_stimuli_statistics', 'make_phases_statistics']
+
+# Steps of preproc_extract_log, measured separately
+LOG_STEPS = ['events', 'letters', 'training', 'test', 'phases']
+
+
+# Run the benchmark for each number of subjects and save the results
+def benchmark_pipeline(opt, counts, seed, folder, outputFile):
+
+    results = {'info': get_run_info(opt, counts, seed), 'records': []}
+
+    for nSubjects in counts:
+
+        # Make the dataset only once, the same seed gives the same data
+        root = os.path.join(folder, f'subjects-{nSubjects}_seed-{seed}')
+
+        if not os.path.exists(os.path.join(root, 'inputs', 'participants.tsv')):
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                make_synthetic_dataset(opt, root, nSubjects, seed)
+
+        # Start from empty outputs
+        shutil.rmtree(os.path.join(root, 'outputs', 'derivatives', 'extracted-data'), ignore_errors = True)
+
+        # Notify the user
+        print(f"\nBenchmark on {nSubjects} subjects ({root})")
+
+        for stage in STAGES:
+
+            records = run_in_new_process(root, stage)
+
+            for record in records:
+                record['subjects'] = nSubjects
+                print(f"{nSubjects:>8} {record['stage']:<42}{record['wall']:>10.3f} s{record['cpu']:>10.3f} s{record['peakRss']:>10.1f} MB")
+
+            results['records'] += records
+
+    # Save the results
+    os.makedirs(os.path.dirname(outputFile), exist_ok = True)
+
+    with open(outputFile, 'w') as f:
+        json.dump(results, f, indent = 2)
+
+    print(f"\n\nResults saved in: {outputFile}")
+
+    return results
+
+
+# Compare the results with the ones of a previous run.
+# Stages (with the same number of subjects) slower than the tolerance are reported as regressions
+def compare_results(results, previousFile, tolerance):
+
+    with open(previousFile, 'r') as f:
+        previous = json.load(f)
+
+    before = {(r['stage'], r['subjects']): r for r in previous['records']}
+    regressions = []
+
+    print(f"\n\nComparison with {previousFile} ({previous['info']['date']}, commit {previous['info']['commit']})\n")
+    print(f"{'subjects':>8} {'stage':<42}{'before (s)':>12}{'now (s)':>12}{'ratio':>8}")
+
+    for record in results['records']:
+
+        key = (record['stage'], record['subjects'])
+        if key not in before:
+            continue
+
+        ratio = record['wall'] / before[key]['wall'] if before[key]['wall'] > 0 else float('inf')
+        flag = ''
+
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+            flag = '  SLOWER'
+
+        print(f"{record['subjects']:>8} {record['stage']:<42}{before[key]['wall']:>12.3f}{record['wall']:>12.3f}{ratio:>8.2f}{flag}")
+
+    # Notify the user
+    if regressions:
+        print(f"\n{len(regressions)} stages are more than {tolerance:.0%} slower than before")
+    else:
+        print("\nNo stage is slower than before")
+
+    return regressions
+
+
+### Subfunctions
+
+# Information about the run, to know what is being compared
+def get_run_info(opt, counts, seed):
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = opt['dir']['root'],
+                                capture_output = True, text = True).stdout.strip()
+    except OSError:
+        commit = ''
+
+    return {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'subjects': counts,
+            'seed': seed}
+
+
+# Run one stage in a new process (spawned, to start from a clean memory)
+def run_in_new_process(root, stage):
+
+    with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_stage, root, stage).result()
+
+
+# Run one stage of the pipeline on the dataset in root.
+# Returns the list of records of the stage (one for each extractor for the log files)
+def run_stage(root, stage):
+
+    # Workers do not inherit the filters of the main process on every platform
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    opt = preproc_option(root)
+    timers = {}
+
+    # Only the measures are printed
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+
+        if stage == 'preproc_extract_csv':
+            from preproc_extract_csv import preproc_extract_csv
+
+            for currentCsv, currentLog, sub in get_pairs(opt):
+                timed(timers, stage, preproc_extract_csv, opt, currentCsv, sub['sesID'])
+
+        elif stage == 'preproc_extract_log':
+            timers = {f'{stage}:{step}': {'wall': 0.0, 'cpu': 0.0, 'peakRss': 0.0} for step in LOG_STEPS}
+
+            for currentCsv, currentLog, sub in get_pairs(opt):
+                time_log_extractors(timers, currentLog, sub['sesID'])
+
+            # The whole extraction is the sum of its steps
+            timers[stage] = {'wall': sum(t['wall'] for t in timers.values()),
+                             'cpu': sum(t['cpu'] for t in timers.values()),
+                             'peakRss': get_peak_rss()}
+
+        elif stage == 'preproc_merge_and_save':
+            from preproc_extract_csv import preproc_extract_csv
+            from preproc_extract_log import preproc_extract_log
+            from preproc_merge_and_save import preproc_merge_and_save
+
+            # Only the merge is measured, the extraction is needed to have something to merge
+            for currentCsv, currentLog, sub in get_pairs(opt):
+                trimmedCsv = preproc_extract_csv(opt, currentCsv, sub['sesID'])
+                trimmedLog, completionTime = preproc_extract_log(currentLog, sub['sesID'])
+                timed(timers, stage, preproc_merge_and_save, opt, trimmedCsv, trimmedLog, completionTime, sub)
+
+        else:
+            import make_accuracy_timing, make_stimuli_statistics, make_phases_statistics
+            modules = {'make_accuracy_timing': make_accuracy_timing,
+                       'make_stimuli_statistics': make_stimuli_statistics,
+                       'make_phases_statistics': make_phases_statistics}
+
+            timed(timers, stage, getattr(modules[stage], stage), opt)
+
+    return [{'stage': name, **timer} for name, timer in timers.items()]
+
+
+# Time each extractor of preproc_extract_log on one log file
+def time_log_extractors(timers, filename, session):
+
+    from preproc_extract_log import (read_events, split_events, extract_letters_timings,
+                                     extract_training_timings, extract_test_timings, extract_phases_timings)
+
+    trainingEvents, testEvents, refreshEvents, phaseEvents = timed(timers, 'preproc_extract_log:events',
+                                                                   lambda: split_events(read_events(filename), session))
+
+    if session == '001':
+        timed(timers, 'preproc_extract_log:letters', extract_letters_timings, trainingEvents)
+    else:
+        if session == '002':
+            timed(timers, 'preproc_extract_log:letters', extract_letters_timings, refreshEvents)
+
+        timed(timers, 'preproc_extract_log:training', extract_training_timings, trainingEvents)
+
+    timed(timers, 'preproc_extract_log:test', extract_test_timings, testEvents)
+    timed(timers, 'preproc_extract_log:phases', extract_phases_timings, phaseEvents)
+
+
+# Run a function and add its wall and cpu time to the timer of the step
+def timed(timers, step, function, *args):
+
+    wallStart, cpuStart = time.perf_counter(), time.process_time()
+    result = function(*args)
+    wall, cpu = time.perf_counter() - wallStart, time.process_time() - cpuStart
+
+    timer = timers.setdefault(step, {'wall': 0.0, 'cpu': 0.0, 'peakRss': 0.0})
+    timer['wall'] += wall
+    timer['cpu'] += cpu
+    timer['peakRss'] = get_peak_rss()
+
+    return result
+
+
+# Peak resident memory of the current process, in MB
+def get_peak_rss():
+
+    import resource
+
+    # Linux gives it in kB, macOS in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+# csv/log pairs of the dataset, with the information about the subject (as in preproc_extract)
+def get_pairs(opt):
+
+    from preproc_extract import extract_subject_info
+
+    pairs = []
+
+    for folder in sorted(glob.glob(os.path.join(opt['dir']['input'], '*day*'))):
+
+        csvList = sorted(glob.glob(os.path.join(folder, 'sub-*.csv')))
+        logList = sorted(glob.glob(os.path.join(folder, 'sub-*.log')))
+
+        pairs += [(currentCsv, currentLog, extract_subject_info(currentCsv)) for currentCsv, currentLog in zip(csvList, logList)]
+
+    return pairs
+
+
+if __name__ == '__main__':
+
+    opt = preproc_option()
+
+    # Command line: numbers of subjects, seed of the synthetic data, where to save data and results
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subjects', type = int, nargs = '+', default = [10, 50, 100], help = 'numbers of subjects to test')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the synthetic datasets')
+    parser.add_argument('--folder', default = os.path.join(tempfile.gettempdir(), 'VBT_benchmark'),
+                        help = 'folder of the synthetic datasets, kept to be used by the next runs')
+    parser.add_argument('--output', default = os.path.join(opt['dir']['derivatives'], 'benchmarks',
+                                                           f"VBT_benchmark_{time.strftime('%Y-%m-%d_%Hh%M.%S')}.json"),
+                        help = 'json file of the results')
+    parser.add_argument('--compare', default = None, help = 'json file of a previous run, to compare with')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'slowdown reported as regression (0.2: 20%% slower)')
+    args = parser.parse_args()
+
+    results = benchmark_pipeline(opt, args.subjects, args.seed, args.folder, args.output)
+
+    if args.compare is not None:
+        regressions = compare_results(results, args.compare, args.tolerance)
+        sys.exit(1 if regressions else 0)
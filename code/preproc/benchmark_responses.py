@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Standalone script to measure the cost of cleaning and scoring the test responses
+
+Takes the real test responses of all the participants, repeats them to reach
+more than 100k responses and compares the previous row-by-row cleaning
+(.apply on each response) with the column-level one used in preproc_extract_csv.
+Prints the time per response of each step.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import glob
+import time
+import numpy as np
+import pandas as pd
+from preproc_option import preproc_option
+from preproc_extract_csv import extract_test_results, clean_test_responses, score_responses
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
+
+# Number of responses to test and number of repetitions of each measure
+nResponses = 120000
+nRepetitions = 5
+
+opt = preproc_option()
+
+
+## Collect the real responses
+
+responses = []
+words = []
+
+for filename in sorted(glob.glob(os.path.join(opt['dir']['input'], '*day*', 'sub-*.csv'))):
+
+    session = '00' + os.path.basename(os.path.dirname(filename))[-1]
+    columns = ["ID", "nlWrd", "testResp"] if session == '001' else ["ID", "nlWrd", "test", "testResp"]
+
+    # Keep the raw responses, before cleaning
+    table = read_table(opt, filename, columns, DTYPES['pavlovia'])
+    testIdx = table['nlWrd'].notna() if session == '001' else table['nlWrd'].notna() & table['test'].isna()
+
+    responses.append(table.loc[testIdx, 'testResp'])
+    words.append(table.loc[testIdx, 'nlWrd'])
+
+responses = pd.concat(responses, ignore_index = True)
+words = pd.concat(words, ignore_index = True)
+
+# Repeat them to reach the number of responses needed
+picks = np.resize(np.arange(len(responses)), nResponses)
+responses = responses.iloc[picks].reset_index(drop = True)
+words = words.iloc[picks].reset_index(drop = True)
+
+print(f"Benchmark on {len(responses)} responses ({responses.nunique()} different ones)\n")
+
+
+## Previous implementation, response by response
+
+def clean_test_response(answer):
+
+    # Choose allowed characters and numbers
+    allowedChar = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~0123456789'
+    allowedNums = [ord(c) for c in allowedChar] + [ord("'")]  # Include ASCII for '
+
+    cleanAnswer = ''
+
+    # if the answer has been skipped, mark the string as empty
+    if isinstance(answer, float):
+        answer = ''
+
+    for char in answer:
+        if ord(char) in allowedNums:
+            cleanAnswer += char
+
+    return cleanAnswer
+
+
+## Measure
+
+# Run a step multiple times, keep the best time
+def measure(step):
+
+    times = []
+
+    for r in range(nRepetitions):
+        start = time.perf_counter()
+        result = step()
+        times.append(time.perf_counter() - start)
+
+    return result, min(times)
+
+
+byRow, tRow = measure(lambda: responses.apply(clean_test_response))
+byColumn, tColumn = measure(lambda: clean_test_responses(responses))
+scores, tScore = measure(lambda: score_responses(words, byColumn))
+
+# Same results, or the comparison is meaningless
+if not byRow.equals(byColumn):
+    raise ValueError("Row-level and column-level cleaning give different responses")
+
+# Whole extraction of the test table, on one big table
+table = pd.DataFrame({'ID': range(len(responses)), 'nlWrd': words, 'testResp': responses})
+_, tTable = measure(lambda: extract_test_results(table, '001'))
+
+print(f"{'step':<32}{'total (s)':>12}{'per response (us)':>20}")
+for step, t in [('cleaning, row by row', tRow), ('cleaning, whole column', tColumn),
+                ('scoring, whole column', tScore), ('extract_test_results', tTable)]:
+    print(f"{step:<32}{t:>12.4f}{t / len(responses) * 1e6:>20.3f}")
+
+print(f"\nColumn-level cleaning is {tRow / tColumn:.1f} times faster")
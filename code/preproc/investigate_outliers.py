@@ -14,17 +14,23 @@ import os
 import pandas as pd
 import glob
 import matplotlib.pyplot as plt
+from preproc_option import preproc_option
+from preproc_outliers import exclude_outliers
+
+opt = preproc_option()
 
 # Load files 
-outWR = pd.read_csv('/Volumes/fcerpe_phd/VBT_data/outputs/derivatives/stats/' + 
-                         'VBT_investigation-outliers-writing.csv')
-outRD = pd.read_csv('/Volumes/fcerpe_phd/VBT_data/outputs/derivatives/stats/' + 
-                         'VBT_investigation-outliers-reading.csv')
+outWR = pd.read_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-writing.csv'))
+outRD = pd.read_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-reading.csv'))
 
 
 # Writing time during test, issue in day 1
-outWR = outWR.sort_values(by = outWR.columns[7], ascending = False)
+outWR = outWR.sort_values(by = 'breaks', ascending = False)
+
+# Same rules of the test as in the summary. Writing times are in the 'writing' column
+testRules = {name: rule for name, rule in opt['outliers']['summary'].items() if ('phase', '==', 'test') in rule}
+
+outWR = outWR.drop(columns = ['writingTime']).rename(columns = {'writing': 'writingTime'}).assign(phase = 'test')
+outWR, excluded = exclude_outliers(outWR, testRules)
 
-selection = outWR[(outWR['check'] == 0) & ((outWR['writing'] < 1) | (outWR['writing'] > 30)) | 
-                  (outWR['breaks'] > 30) | (outWR['writing'] > 60)]
-outWR = outWR.drop(selection.index)
+print(excluded)
@@ -7,98 +7,100 @@ Created on Tue Mar  5 09:34:15 2024
 """
 
 import os
+import sys
 import pandas as pd
 import glob
+from preproc_trial_store import load_trial_store, get_from_store
+from preproc_table_buffer import init_buffer, append_to_buffer, finalize_buffer
+from preproc_outliers import exclude_outliers, get_rule_columns
+from preproc_index import load_index, get_sessions
 
-def make_accuracy_timing(opt):
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
+from profiling import profile
+
+# Columns of the extracted tables used in the summary
+COLUMNS = ['nlWrd', 'score', 'readingTime', 'checkingTime', 'writingTime', 'breaks', 'check']
+
+# Measures of the summary, named after the column of the trials they average.
+# Each one is computed for every session and phase where it was recorded:
+# e.g. 'ses-2_train-reading' is the average reading time of the training of session 2
+METRICS = {'accuracy': 'score', 'reading': 'readingTime', 'checking': 'checkingTime', 'writing': 'writingTime'}
+
+# Phases of each session, in the order of the columns of the summary
+PHASES = ['test', 'train', 'ref']
+
+# Training accuracy is counted over the words tested, not over the trials left after the outliers
+SCORED_ITEMS = {'train': 20}
+
+def make_accuracy_timing(opt, tables = None):
     
     #  MAKE SUMMARY TABLE 
     # Organize infromation about accuracy and timing for each subjects and day of training
     
     # Import data
 
-    # Get "preproc" folder
-    # Glob is used to find specific patterns within a path (e.g. 'sub-*')
-    subjects = glob.glob(os.path.join(opt['dir']['extracted'], 'sub-*'))
+    # Get the extracted files of each subject and session from the index of the "preproc" folder
+    subjects = get_sessions(opt, load_index(opt))
 
-    # Initialize summary table
-    summary = pd.DataFrame()
+    # Initialize list of trials of all the subjects, sessions and phases.
+    # They are merged and summarized only once, at the end
+    trials = []
+    subIDs = []
+    
+    # Columns of the trials needed for the summary and to find the outliers
+    trialColumns = list(METRICS.values()) + [col for col in get_rule_columns(opt['outliers']['summary']) 
+                                             if col not in list(METRICS.values()) + ['subject', 'session', 'phase']]
     
-    outliersWR = pd.DataFrame(columns = ['sub', 'ses', 'nlWrd', 'writingTime', 'score'])
-    outliersRD = pd.DataFrame(columns = ['sub', 'ses', 'nlWrd', 'readingTime'])
+    # Timings to investigate outliers, collected subject by subject and made into tables at the end
+    outliersWR = init_buffer(['sub', 'ses', 'nlWrd', 'writingTime', 'score'])
+    outliersRD = init_buffer(['sub', 'ses', 'nlWrd', 'readingTime'])
+    
+    # Take the tables already in memory, if given (fused mode).
+    # Otherwise, if present, load all the trials at once from the columnar store, only with the columns needed
+    store = tables
+    if store is None and opt['store']['use']:
+        store = load_trial_store(opt, ['training', 'test', 'refresh'], columns = COLUMNS)
 
     # Extract data participant by participant
-    for sub in subjects:
+    for subID, sessions in subjects.items():
         
-        # Get subject path
-        subPath = sub
-
-        # Extract sub name and ID to compose the subject's entry
-        subID = subPath.split('-')[2]
+        # Compose sub name for the subject's entry
         subName = 'sub-' + subID
+        subIDs.append(subID)
 
-        # Compose new entry for table
-        entry = init_entry(opt, subID)
-        
-        # Notify the user
-        print(f'\n\nWorking on {subName}\n')
-        
-        # Get the different session folders
-        sessions = glob.glob(os.path.join(opt['dir']['extracted'], subName, 'ses-*'))
-
-
-        # Work on each file
-        for ses in sessions:
-            
-            # Get session
-            sesPath = ses
-            
-            # Extract sub name and ID to compose the subject's entry
-            sesID = sesPath.split('-')[3]
-            sesName = 'ses-' + sesID
+        # Each subject is a unit of work of the profile (if enabled)
+        with profile(subName):
 
             # Notify the user
-            print(f'- adding data from {sesName}')
-
-            # Find elements in the folder
-            sesFiles = glob.glob(os.path.join(opt['dir']['extracted'], subName, sesName, '*_beh-*'))
-            
-            scriptID = sesFiles[0].split('-')[7][:2]
+            print(f'\n\nWorking on {subName}\n')
         
+            # Work on each session
+            for sesID, sesFiles in sessions.items():
+            
+                # Compose session name
+                sesName = 'ses-' + sesID
 
-            # Based on session, distinguish which routines were presented
-            if sesName in ['ses-001', 'ses-003', 'ses-004']:
-                # Load the tables from the folder
-                train, test, _ = load_results(sesFiles)
-                
-                # Save timings to investigate outliers
-                outliersWR, outliersRD = add_outliers(train, test, outliersWR, outliersRD, subID, sesID, scriptID)
-                
-                # Exclude outliers based on sperate investigation from previous line
-                train, test = exclude_outliers(train, test)
-                
-                # Process the results (e.g. compute means) and add them to the
-                # right columns of the entry
-                entry = add_results_to_entry(entry, sesName, train, test, [])
+                # Notify the user
+                print(f'- adding data from {sesName}')
 
-            elif sesName == 'ses-002':
-                # Load the tables from the folder
-                train, test, ref = load_results(sesFiles)
+                # Load the tables from the folder (refresh is only present in session 2)
+                train, test, ref = load_results(opt, sesFiles, store, subID, sesID)
                 
                 # Save timings to investigate outliers
-                outliersWR, outliersRD = add_outliers(train, test, outliersWR, outliersRD, subID, sesID, scriptID)
+                add_outliers(train, test, outliersWR, outliersRD, subID, sesID, sesFiles['script'])
                 
-                # Exclude outliers based on sperate investigation from previous line
-                train, test = exclude_outliers(train, test)
+                # Keep the trials, to be summarized with the others
+                trials.append(get_session_trials(subID, sesID, {'test': test, 'train': train, 'ref': ref}, trialColumns))
 
-                entry = add_results_to_entry(entry, sesName, train, test, ref)
-                
 
-            
+    # Exclude outliers of all the subjects at once, based on the rules in the options 
+    # (from the investigation of the tables saved above)
+    trials, excluded = exclude_outliers(pd.concat(trials, ignore_index = True), opt['outliers']['summary'])
 
-        # Add the entry to the summary
-        summary = pd.concat([summary, entry])
-        
+    # Average the trials of each subject, session and phase, in one table
+    summary = summarize_trials(opt, trials, subIDs)
     
     # Save table
     if not os.path.exists(opt['dir']['stats']):
@@ -106,8 +108,11 @@ def make_accuracy_timing(opt):
 
 
     summary.to_csv(os.path.join(opt['dir']['stats'], 'VBT_results-accuracy-timing.csv'), index = False)
+    outliersWR = finalize_buffer(outliersWR)
+    outliersRD = finalize_buffer(outliersRD)
     outliersWR.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-writing.csv'), index = False)
     outliersRD.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-reading.csv'), index = False)
+    excluded.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-excluded-summary.csv'), index = False)
     
 
     # Notify the user
@@ -116,142 +121,81 @@ def make_accuracy_timing(opt):
 
 ### Subfunctions
 
-# from a folder, load the corresponding results for each part of the training
-def load_results(files):
+# from the files of a session (see preproc_index), load the corresponding results for each part of the training
+# If the columnar store is loaded, take the tables from there instead
+def load_results(opt, files, store = None, subID = None, sesID = None):
     # init outputs to avoid errors
     tr = pd.DataFrame()
     te = pd.DataFrame()
     re = pd.DataFrame()
+    
+    if store is not None:
+        tr = get_from_store(store, 'training', subID, sesID)
+        te = get_from_store(store, 'test', subID, sesID)
+        
+        if sesID == '002':
+            re = get_from_store(store, 'refresh', subID, sesID)
+            
+        return tr, te, re
 
-    # find positions of files
-    trPos = [i for i, file in enumerate(files) if file.endswith('training.csv')]
-    tePos = [i for i, file in enumerate(files) if file.endswith('test.csv')]
-
-    # Load files
-    tr = pd.read_csv(files[trPos[0]])
-    te = pd.read_csv(files[tePos[0]])
+    # Load files, only the columns needed
+    tr = read_table(opt, files['training'], COLUMNS, DTYPES['training'])
+    te = read_table(opt, files['test'], COLUMNS, DTYPES['test'])
 
     # Load extra file if we are in session 2
-    if 'ses-002' in files[0]:
-        rePos = [i for i, file in enumerate(files) if file.endswith('refresh.csv')]
-        re = pd.read_csv(files[rePos[0]])
+    if 'refresh' in files:
+        re = read_table(opt, files['refresh'], COLUMNS, DTYPES['refresh'])
 
     return tr, te, re
 
 
-# Initialize custom dataframe / table
-def init_entry(opt, subID):
-    tableOut = pd.DataFrame(columns=['subject', 'script',
-                                     'ses-1_test-accuracy', 'ses-1_test-reading', 'ses-1_test-writing',
-                                     'ses-1_train-reading', 'ses-1_train-checking',
-                                     'ses-2_test-accuracy', 'ses-2_test-reading', 'ses-2_test-writing',
-                                     'ses-2_train-accuracy', 'ses-2_train-reading', 'ses-2_train-checking',
-                                     'ses-2_train-writing', 'ses-2_ref-reading', 'ses-2_ref-checking',
-                                     'ses-3_test-accuracy', 'ses-3_test-reading', 'ses-3_test-writing',
-                                     'ses-3_train-accuracy', 'ses-3_train-reading', 'ses-3_train-checking',
-                                     'ses-3_train-writing', 'ses-4_test-accuracy', 'ses-4_test-reading',
-                                     'ses-4_test-writing', 'ses-4_train-accuracy', 'ses-4_train-reading',
-                                     'ses-4_train-checking', 'ses-4_train-writing'])
+# Trials of one session in long format: one row per trial, with the subject, session and phase.
+# Measures that a phase does not have (e.g. score in refresh) are left empty
+def get_session_trials(subID, sesID, phases, columns):
 
-    # Add subject
-    tableOut.loc[0, "subject"] = subID
+    tables = [table.reindex(columns = columns).astype('float64').assign(subject = subID, 
+                                                                        session = int(sesID), 
+                                                                        phase = phase)
+              for phase, table in phases.items() if len(table) > 0]
 
-    # Find and add script
-    scriptID = opt['subList'].index(subID)
-    tableOut.loc[0, "script"] = opt['scriptList'][scriptID]
+    return pd.concat(tables, ignore_index = True)
 
-    return tableOut
 
+# From the trials of all the subjects, make the summary table: one row per subject and
+# one column per session, phase and metric (e.g. 'ses-1_test-accuracy')
+def summarize_trials(opt, trials, subIDs):
 
-# Extract subject's means and add them to the corresponding line in the table
-def add_results_to_entry(tableIn, sesName, tr, te, re):
-    tableOut = tableIn.copy()
+    groups = trials.groupby(['subject', 'session', 'phase'])
 
-    if sesName == 'ses-001':
-        
-        # Need to assign the following variables
-        # - 'ses-1_test-accuracy'
-        # - 'ses-1_test-reading'
-        # - 'ses-1_test-writing'
-        # - 'ses-1_train-reading'
-        # - 'ses-1_train-checking'
-        tableOut.loc[0, "ses-1_test-accuracy"] = sum(te['score']) / len(te)
-        tableOut.loc[0, "ses-1_test-reading"] = te['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-1_test-writing"] = te['writingTime'].mean(skipna = True)
-
-        tableOut.loc[0, "ses-1_train-reading"] = tr['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-1_train-checking"] = tr['checkingTime'].mean(skipna = True)
-
-    elif sesName == 'ses-002':
-        
-        # Cut possible outliers in the train-reading and in test-writing
-        
-        
-        # Need to assign the following variables
-        # - 'ses-2_test-accuracy'
-        # - 'ses-2_test-reading'
-        # - 'ses-2_test-writing'
-        # - 'ses-2_train-accuracy'
-        # - 'ses-2_train-reading'
-        # - 'ses-2_train-checking'
-        # - 'ses-2_train-writing'
-        # - 'ses-2_ref-reading'
-        # - 'ses-2_ref-checking'
-        tableOut.loc[0, "ses-2_test-accuracy"] = sum(te['score']) / len(te)
-        tableOut.loc[0, "ses-2_test-reading"] = te['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-2_test-writing"] = te['writingTime'].mean(skipna = True)
-
-        tableOut.loc[0, "ses-2_train-accuracy"] = sum(tr['score']) / 20
-        tableOut.loc[0, "ses-2_train-reading"] = tr['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-2_train-checking"] = tr['checkingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-2_train-writing"] = tr['writingTime'].mean(skipna = True)
-
-        tableOut.loc[0, "ses-2_ref-reading"] = re['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-2_ref-checking"] = re['checkingTime'].mean(skipna = True)
-
-    elif sesName == 'ses-003':
-        
-        # Need to assign the following variables
-        # - 'ses-3_test-accuracy'
-        # - 'ses-3_test-reading'
-        # - 'ses-3_test-writing'
-        # - 'ses-3_train-accuracy'
-        # - 'ses-3_train-reading'
-        # - 'ses-3_train-checking'
-        # - 'ses-3_train-writing'
-        tableOut.loc[0, "ses-3_test-accuracy"] = sum(te['score']) / len(te)
-        tableOut.loc[0, "ses-3_test-reading"] = te['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-3_test-writing"] = te['writingTime'].mean(skipna = True)
-
-        tableOut.loc[0, "ses-3_train-accuracy"] = sum(tr['score']) / 20
-        tableOut.loc[0, "ses-3_train-reading"] = tr['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-3_train-checking"] = tr['checkingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-3_train-writing"] = tr['writingTime'].mean(skipna = True)
-
-    elif sesName == 'ses-004':
-        
-        # Need to assign the following variables
-        # - 'ses-4_test-accuracy'
-        # - 'ses-4_test-reading'
-        # - 'ses-4_test-writing'
-        # - 'ses-4_train-accuracy'
-        # - 'ses-4_train-reading'
-        # - 'ses-4_train-checking'
-        # - 'ses-4_train-writing'
-        tableOut.loc[0, "ses-4_test-accuracy"] = sum(te['score']) / len(te)
-        tableOut.loc[0, "ses-4_test-reading"] = te['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-4_test-writing"] = te['writingTime'].mean(skipna = True)
+    # Averages of each metric, for each subject, session and phase
+    values = groups[list(METRICS.values())].mean()
+    values.columns = list(METRICS.keys())
+
+    # Accuracy of the phases with a fixed number of words scored
+    items = values.index.get_level_values('phase').map(SCORED_ITEMS).to_numpy(dtype = 'float64')
+    scored = groups['score'].sum(min_count = 1) / items
+    values['accuracy'] = values['accuracy'].where(pd.isna(items), scored)
+
+    # One row for each value, with the name of its column in the summary
+    values = values.stack().rename('value').reset_index().rename(columns = {'level_3': 'metric'})
+    values['phaseOrder'] = values['phase'].map(PHASES.index)
+    values['metricOrder'] = values['metric'].map(list(METRICS.keys()).index)
+    values = values.sort_values(['session', 'phaseOrder', 'metricOrder'], kind = 'stable')
 
-        tableOut.loc[0, "ses-4_train-accuracy"] = sum(tr['score']) / 20
-        tableOut.loc[0, "ses-4_train-reading"] = tr['readingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-4_train-checking"] = tr['checkingTime'].mean(skipna = True)
-        tableOut.loc[0, "ses-4_train-writing"] = tr['writingTime'].mean(skipna = True)
+    values['column'] = 'ses-' + values['session'].astype(str) + '_' + values['phase'] + '-' + values['metric']
 
+    # One row per subject, in the order in which they were found. Columns follow sessions, phases and metrics
+    summary = values.pivot(index = 'subject', columns = 'column', values = 'value')
+    summary = summary.reindex(index = subIDs, columns = values['column'].unique())
 
-    return tableOut
+    # Add subject and script
+    summary.insert(0, 'subject', summary.index)
+    summary.insert(1, 'script', [opt['scriptList'][opt['subList'].index(subID)] for subID in subIDs])
 
+    return summary.reset_index(drop = True)
 
-# Add timings to lists to control for outliers
+
+# Add timings to the buffers of the tables to control for outliers
 def add_outliers(train, test, outliersWR, outliersRD, sub, ses, script):
     
     writing = pd.DataFrame({'sub': [sub]*len(test),
@@ -262,7 +206,7 @@ def add_outliers(train, test, outliersWR, outliersRD, sub, ses, script):
                             'breaks': test.breaks, 
                             'check': test.check, 
                             'score': test.score})
-    outliersWR = pd.concat([outliersWR, writing], ignore_index = True)
+    append_to_buffer(outliersWR, writing)
     
     if not ses == '001':
     
@@ -270,41 +214,4 @@ def add_outliers(train, test, outliersWR, outliersRD, sub, ses, script):
                                 'ses': [ses]*len(train),
                                 'nlWrd': train.nlWrd,
                                 'readingTime': train.readingTime})
-        outliersRD = pd.concat([outliersRD, reading], ignore_index = True)
-    
-    
-    return outliersWR, outliersRD
-
-
-# Exclude outliers form each subject
-def exclude_outliers(train, test):
-    
-    # Training reading time, max 60 seconds. Then considered outlier
-    train = train[(train['readingTime'] <= 60) | train['readingTime'].isna()]
-    
-    # Test writing time
-    # - exclude cases where no key was pressed if the time is shorter than 1s or longer than 30s
-    selection = test[(test['check'] == 0) & ((test['writingTime'] < 1) | (test['writingTime'] > 30)) | 
-                     (test['breaks'] > 30) | (test['writingTime'] > 60)]
-    
-    test = test.drop(selection.index)
-    
-    return train, test
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+        append_to_buffer(outliersRD, reading)
@@ -7,72 +7,74 @@ Created on Thu Oct 24 15:12:43 2024
 """
 
 import os
+import sys
 import pandas as pd
 import glob
+from preproc_trial_store import load_trial_store, get_from_store
+from preproc_index import load_index, get_sessions
 
-def make_phases_statistics(opt):
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
+from profiling import profile
+
+def make_phases_statistics(opt, tables = None):
     
     #  MAKE SUMMARY TABLE 
     # Organize infromation about accuracy and timing for each subjects and day of training
     
     # Import data
 
-    # Get "preproc" folder
-    # Glob is used to find specific patterns within a path (e.g. 'sub-*')
-    subjects = glob.glob(os.path.join(opt['dir']['extracted'], 'sub-*'))
+    # Get the extracted files of each subject and session from the index of the "preproc" folder
+    subjects = get_sessions(opt, load_index(opt))
 
     # Initialize summary table
     summary = pd.DataFrame()
+    
+    # Take the tables already in memory, if given (fused mode).
+    # Otherwise, if present, load all the phases timings at once from the columnar store
+    store = tables
+    if store is None and opt['store']['use']:
+        store = load_trial_store(opt, ['phases'], columns = ['Timing'])
 
 
     # Extract data participant by participant
-    for sub in subjects:
+    for subID, sessions in subjects.items():
         
-        # Get subject path
-        subPath = sub
-
-        # Extract sub name and ID to compose the subject's entry
-        subID = subPath.split('-')[2]
+        # Compose sub name for the subject's entry
         subName = 'sub-' + subID
 
-        # Compose new entry for table
-        entry = init_entry(opt, subID)
+        # Each subject is a unit of work of the profile (if enabled)
+        with profile(subName):
+
+            # Compose new entry for table
+            entry = init_entry(opt, subID)
         
-        # Notify the user
-        print(f'\n\nWorking on {subName}\n')
+            # Notify the user
+            print(f'\n\nWorking on {subName}\n')
         
-        # Get the different session folders
-        sessions = glob.glob(os.path.join(opt['dir']['extracted'], subName, 'ses-*'))
-
-
-        # Work on each file
-        for ses in sessions:
-            
-            # Get session
-            sesPath = ses
+            # Work on each session
+            for sesID, sesFiles in sessions.items():
             
-            # Extract sub name and ID to compose the subject's entry
-            sesID = sesPath.split('-')[3]
-            sesName = 'ses-' + sesID
+                # Compose session name
+                sesName = 'ses-' + sesID
 
-            # Notify the user
-            print(f'- adding data from {sesName}')
-
-            # Find elements in the folder
-            sesFiles = glob.glob(os.path.join(opt['dir']['extracted'], subName, sesName, '*_phases-time*'))
-            
-            scriptID = sesFiles[0].split('-')[7][:2]
+                # Notify the user
+                print(f'- adding data from {sesName}')
         
-            # Load the tables from the folder
-            timings = pd.read_csv(sesFiles[0])
+                # Load the tables from the folder, or from the store
+                if store is not None:
+                    timings = get_from_store(store, 'phases', subID, sesID)
+                else:
+                    timings = read_table(opt, sesFiles['phases'], ['Timing'], DTYPES['phases'])
             
-            # Process the results (e.g. compute means) and add them to the
-            # right columns of the entry
-            entry = add_results_to_entry(entry, sesName, timings)
+                # Process the results (e.g. compute means) and add them to the
+                # right columns of the entry
+                entry = add_results_to_entry(entry, sesName, timings)
 
         
-        # Add the entry to the summary
-        summary = pd.concat([summary, entry])
+            # Add the entry to the summary
+            summary = pd.concat([summary, entry])
         
     
     # Save table
@@ -19,42 +19,98 @@ Lastly, it will save (individual and merged) tables in outputs/derivatives/datas
 """
 
 import os
+import sys
 import pandas as pd
 import glob as glob
-import Levenshtein as lev
-
-def make_stimuli_statistics(opt):
+from preproc_trial_store import load_trial_store, get_from_store
+from preproc_keypresses import encode_keypresses, save_keypresses
+from preproc_table_buffer import init_buffer, append_to_buffer, finalize_buffer
+from preproc_outliers import exclude_outliers
+from preproc_test_responses import score_test_responses, adjust_responses
+from preproc_confusion import make_confusion_matrices, save_confusion
+from preproc_index import load_index, get_sessions
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
+from profiling import profile
+from lexicon import load_lexicon
+from neighbourhood import compute_old20
+from ngrams import load_ngrams, get_letter_frequency, get_bigram_frequency
+from vocabulary import build_vocabulary, encode_table, save_vocabulary
+
+# Columns of the extracted tables used for the stimuli
+COLUMNS = ['letter', 'nlWrd', 'tested', 'testResp', 'score', 'readingTime', 'checkingTime', 'writingTime']
+
+def make_stimuli_statistics(opt, tables = None):
     
     # Get the stimuli list
     # If the files are not already present in the stats/datasets folder, make them
     tr, te = get_stimuli_lists(opt)
     
-    # Load datasets of statistics
+    # Load datasets of statistics: words and frequency of letters and bigrams
     dlp = get_dutch_statistics(opt)
+    ngrams = load_ngrams(opt)
     
     # Compute stimuli accuracy and timings
-    letters, training, test = get_results_stimuli(opt)
+    letters, training, test, keypresses = get_results_stimuli(opt, tables)
+    
+    # Encode words, subjects and scripts with the same categories in all the tables:
+    # joins are made on integer codes, and each string is kept only once in memory
+    vocabulary = build_vocabulary([tr, te, dlp, letters, training, test, keypresses])
+    tr, te, dlp, letters, training, test, keypresses = [encode_table(table, vocabulary) 
+                                                        for table in [tr, te, dlp, letters, training, test, keypresses]]
+    
+    # Exclude outliers of all the subjects at once, based on the rules in the options
+    training, trExcluded = exclude_outliers(training, opt['outliers']['training'])
+    test, teExcluded = exclude_outliers(test, opt['outliers']['test'])
     
     # Extract qualitative information about the test responses:
     # - how distant were the responses from the correct answers
     # - which letters have been omitted most and which have been mistaken 
     # - which words have been recognized the most / the least
-    test = extract_test_responses(test)
+    test = extract_test_responses(test, opt.get('parallel', {}).get('nScoring', 1))
+    
+    # Count which letters were identified, omitted or mistaken for another, in the test and 
+    # in the training words tested, for each subject, session and script
+    groups, confusion = make_confusion_matrices(get_responses(training, test))
     
-    # Exclude outliers
-    training, test = exclude_outliers(training, test)
+    # Encode the keys pressed in each test trial, following the order of the test table
+    keypresses = encode_keypresses(test, keypresses)
+    test = test.drop(columns = ['trial'])
         
     # Apply the statistics to the training and test sets
     trStats = pd.merge(tr, dlp, on = 'woord', how = 'left')
     teStats = pd.merge(te, dlp, on = 'woord', how = 'left')
+    
+    # Pseudowords and words missing from DLP2 have no statistics: give them their length.
+    # OLD20 of all the stimuli is computed against the DLP2 words, to compare words and pseudowords
+    trStats = add_missing_statistics(trStats, dlp)
+    teStats = add_missing_statistics(teStats, dlp)
+    
+    # Add how frequent the bigrams of each stimulus are, on average
+    trStats['bigramFrequency'] = get_bigram_frequency(trStats['woord'], ngrams)
+    teStats['bigramFrequency'] = get_bigram_frequency(teStats['woord'], ngrams)
 
     # Save the datasets
     trStats.to_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-training_desc-list-with-stats.csv'), index = False)
     teStats.to_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-list-with-stats.csv'), index = False)
     
+    # The frequencies of the letters are made from DLP2 only if not already present
+    leFullpath = os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-letters_desc-list-with-stats.csv')
+    if not os.path.exists(leFullpath):
+        get_letter_frequency(ngrams).to_csv(leFullpath, index = False)
+    
     letters.to_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-letters_desc-behavioural-results.csv'), index = False)
     training.to_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-training_desc-behavioural-results.csv'), index = False)
     test.to_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-behavioural-results.csv'), index = False)
+    save_keypresses(opt, keypresses)
+    save_confusion(opt, groups, confusion)
+    save_vocabulary(opt, vocabulary)
+    
+    # Save how many trials each rule excluded
+    excluded = pd.concat([trExcluded.assign(table = 'training'), teExcluded.assign(table = 'test')], ignore_index = True)
+    excluded.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-excluded-stimuli.csv'), index = False)
 
 
 ### Subfunctions
@@ -72,12 +128,15 @@ def get_stimuli_lists(opt):
         # Create list of stimuli post-hoc
         # Extract training set from ses-002 and test sets from each session
         # Participant is not important, they all saw the same stimuli
-        tr2 = pd.read_csv(os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-002', 
-                                      'sub-00004_ses-002_task-alphabetLearning_script-cb_beh-training.csv'))
-        tr3 = pd.read_csv(os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-003', 
-                                      'sub-00004_ses-003_task-alphabetLearning_script-cb_beh-training.csv'))
-        tr4 = pd.read_csv(os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-004', 
-                                      'sub-00004_ses-004_task-alphabetLearning_script-cb_beh-training.csv'))
+        tr2 = read_table(opt, os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-002', 
+                                           'sub-00004_ses-002_task-alphabetLearning_script-cb_beh-training.csv'), 
+                         ['nlWrd', 'test'], DTYPES['training'])
+        tr3 = read_table(opt, os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-003', 
+                                           'sub-00004_ses-003_task-alphabetLearning_script-cb_beh-training.csv'), 
+                         ['nlWrd', 'test'], DTYPES['training'])
+        tr4 = read_table(opt, os.path.join(opt['dir']['extracted'], 'sub-00004', 'ses-004', 
+                                           'sub-00004_ses-004_task-alphabetLearning_script-cb_beh-training.csv'), 
+                         ['nlWrd', 'test'], DTYPES['training'])
         
         ## Make list of training stimuli
         tr2.sort_values(by = ['nlWrd'], inplace = True, ignore_index = True)
@@ -99,10 +158,10 @@ def get_stimuli_lists(opt):
         
         ## Make list of all test stimuli
         # Extract stimuli from tests of each day
-        te1 = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'test_d1.csv'))
-        te2 = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'test_d2.csv'))
-        te3 = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'test_d3.csv'))
-        te4 = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'test_d4.csv'))
+        te1 = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'test_d1.csv'), ['nlWrd'], {'nlWrd': str})
+        te2 = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'test_d2.csv'), ['nlWrd'], {'nlWrd': str})
+        te3 = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'test_d3.csv'), ['nlWrd'], {'nlWrd': str})
+        te4 = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'test_d4.csv'), ['nlWrd'], {'nlWrd': str})
         
         # Add a tags to the test stimuli
         # - session: on which day were they presented? [1,2,3,4]
@@ -144,40 +203,39 @@ def get_stimuli_lists(opt):
 
     # If the training file (and the others) do exist, load them
     else: 
-        tr = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-training_desc-list.csv'))
-        te = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-list.csv'))
+        tr = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-training_desc-list.csv'), 
+                        dtypes = {'woord': str, 'session': 'int64'})
+        te = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-list.csv'), 
+                        dtypes = {'woord': str, 'session': 'int64', 'stimulus': str})
         
 
     return tr, te    
 
 
 # Read dutch exicon project (DLP2) table and extract relevant columns
+# The relevant columns are kept in a cache, the excel file is read only when it changes (see lexicon.py)
 def get_dutch_statistics(opt):
     
-    # Load the file
-    dlpPath = os.path.join(opt['dir']['stats'], 'datasets', 'DLP2_dataset.xlsx')
-    dlp = pd.read_excel(dlpPath, 
-                        sheet_name='DLP2_eerste_analyses')
+    return load_lexicon(opt)
     
-    # Adjust the dataset
-    # - keep only relevant columns
-    dlp = dlp[['Woord', 'Length', 'Nsyl', 'SUBTLEX2', 'N_phonemes', 'OLD20', 'PLD30']]
+
+# Length of the stimuli without DLP2 statistics and OLD20 of all the stimuli, with the same lexicon.
+# The OLD20 published by DLP2 (computed on a larger lexicon, only for words) is kept in old20DLP2
+def add_missing_statistics(stats, dlp):
+    
+    missing = stats['old20'].isna()
     
-    # - rename columns 
-    dlp = dlp.rename(columns = {'Woord': 'woord', 
-                                'Length': 'length', 
-                                'Nsyl': 'syllabels',
-                                'SUBTLEX2': 'frequency',
-                                'N_phonemes': 'phonemes',
-                                'OLD20': 'old20',
-                                'PLD30': 'pld30'})
+    stats.loc[missing, 'length'] = stats.loc[missing, 'woord'].str.len()
     
-    return dlp
+    stats.insert(stats.columns.get_loc('old20') + 1, 'old20DLP2', stats['old20'])
+    stats['old20'] = compute_old20(stats['woord'], dlp['woord'])
+    
+    return stats
     
 
 # Extract information about stimuli for training of letters, training of words,
 # testing of words
-def get_results_stimuli(opt):
+def get_results_stimuli(opt, tables = None):
     
     # For each subject
     # import all the files
@@ -185,57 +243,75 @@ def get_results_stimuli(opt):
     # extract training: add sub, group, day, extract columns, append
     # extract test: add day, type, sub, group, extract columns, append
     
-    # Get "preproc" folder
-    # Glob is used to find specific patterns within a path (e.g. 'sub-*')
-    subjects = glob.glob(os.path.join(opt['dir']['extracted'], 'sub-*'))
+    # Get the extracted files of each subject and session from the index of the "preproc" folder
+    subjects = get_sessions(opt, load_index(opt))
 
-    # Initialize summary table
-    letters = pd.DataFrame()
-    training = pd.DataFrame()
-    test = pd.DataFrame()
+    # Initialize summary tables, collected subject by subject and made at the end
+    letters = init_buffer()
+    training = init_buffer()
+    test = init_buffer()
+    keypresses = init_buffer()
+    
+    # Take the tables already in memory, if given (fused mode).
+    # Otherwise, if present, load all the trials at once from the columnar store, only with the columns needed
+    store = tables
+    keyStore = tables
+    if store is None and opt['store']['use']:
+        store = load_trial_store(opt, ['training', 'test'], columns = COLUMNS)
+        keyStore = load_trial_store(opt, ['keypresses'])
 
     # Extract data participant by participant
-    for sub in subjects:
-        
-        # Get subject path
-        subPath = sub
+    for subID, sessions in subjects.items():
 
-        # Extract sub name and ID to compose the subject's entry
-        subID = subPath.split('-')[2]
+        # Each subject is a unit of work of the profile (if enabled)
+        with profile(f'sub-{subID}'):
 
-        # Take path of letters (day 1)
-        le = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-001', '*-training.csv'))[0])
-        
-        # Take path of training (days 2-3-4)
-        tr2 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-002', '*-training.csv'))[0])
-        tr3 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-003', '*-training.csv'))[0])
-        tr4 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-004', '*-training.csv'))[0])     
-        
-        # Take path of test (days 1-2-3-4)
-        te1 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-001', '*-test.csv'))[0])
-        te2 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-002', '*-test.csv'))[0])
-        te3 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-003', '*-test.csv'))[0])
-        te4 = pd.read_csv(glob.glob(os.path.join(subPath, 'ses-004', '*-test.csv'))[0])
-
-        # Get the relevant information out of the letters
-        le = extract_letters_information(opt, subID, le)
+            # Take the tables from the store, if loaded
+            if store is not None:
+            
+                # Letters (day 1), training (days 2-3-4), test (days 1-2-3-4)
+                le = get_from_store(store, 'training', subID, '001')
+                tr2, tr3, tr4 = [get_from_store(store, 'training', subID, ses) for ses in ['002', '003', '004']]
+                te1, te2, te3, te4 = [get_from_store(store, 'test', subID, ses) for ses in ['001', '002', '003', '004']]
+            
+                # Keys pressed during the test (days 1-2-3-4)
+                ke1, ke2, ke3, ke4 = [get_from_store(keyStore, 'keypresses', subID, ses) for ses in ['001', '002', '003', '004']]
+            
+            else:
+            
+                # Take path of letters (day 1)
+                le = read_table(opt, sessions['001']['training'], COLUMNS, DTYPES['training'])
+            
+                # Take path of training (days 2-3-4)
+                tr2, tr3, tr4 = [read_table(opt, sessions[ses]['training'], COLUMNS, DTYPES['training']) for ses in ['002', '003', '004']]
+            
+                # Take path of test (days 1-2-3-4)
+                te1, te2, te3, te4 = [read_table(opt, sessions[ses]['test'], COLUMNS, DTYPES['test']) for ses in ['001', '002', '003', '004']]
+            
+                # Take path of the keys pressed during the test (days 1-2-3-4)
+                ke1, ke2, ke3, ke4 = [read_table(opt, sessions[ses]['keypresses'], dtypes = DTYPES['keypresses'])
+                                      for ses in ['001', '002', '003', '004']]
+
+            # Get the relevant information out of the letters
+            le = extract_letters_information(opt, subID, le)
         
-        # Get the relevant information out of the letters
-        tr = extract_training_information(opt, subID, tr2, tr3, tr4)
+            # Get the relevant information out of the letters
+            tr = extract_training_information(opt, subID, tr2, tr3, tr4)
         
-        # Get the relevant information out of the letters
-        te = extract_test_information(opt, subID, te1, te2, te3, te4)
+            # Get the relevant information out of the letters
+            te = extract_test_information(opt, subID, te1, te2, te3, te4)
         
-        # Exclude outliers
-        tr, te = exclude_outliers(tr, te)
+            # Get the keys pressed during the test
+            ke = extract_keypresses_information(subID, ke1, ke2, ke3, ke4)
         
-        # Add the entries to the statistics
-        letters = pd.concat([letters, le], ignore_index = True)
-        training = pd.concat([training, tr], ignore_index = True)
-        test = pd.concat([test, te], ignore_index = True)
+            # Add the entries to the statistics
+            append_to_buffer(letters, le)
+            append_to_buffer(training, tr)
+            append_to_buffer(test, te)
+            append_to_buffer(keypresses, ke)
         
 
-    return letters, training, test
+    return finalize_buffer(letters), finalize_buffer(training), finalize_buffer(test), finalize_buffer(keypresses)
 
 
 # From behavioural results of letters training, extract and order information of 
@@ -291,6 +367,10 @@ def extract_test_information(opt, subID, te1, te2, te3, te4):
     te3['session'] = '3'
     te4['session'] = '4'
     
+    # Keep the trial number, to link each trial to its keys
+    for t in [te1, te2, te3, te4]:
+        t['trial'] = t.index
+    
     # Merge and add information about script and subject
     te = pd.concat([te1, te2, te3, te4])
     te['subject'] = 'sub-' + subID
@@ -299,126 +379,57 @@ def extract_test_information(opt, subID, te1, te2, te3, te4):
     te['script'] = opt['scriptList'][scriptID]
     
     # Re-arrange table and drop redundant letter column
-    te = te.rename(columns = {'nlWrd': 'woord', 'testResp': 'response', 'attempts': 'keypresses'})
-    test = te[['subject','script','session','woord','response','score','readingTime','writingTime', 'keypresses']]
+    te = te.rename(columns = {'nlWrd': 'woord', 'testResp': 'response'})
+    test = te[['subject','script','session','trial','woord','response','score','readingTime','writingTime']]
     
     return test
 
 
+# From the keys pressed during the word test, extract and order information of 
+# one participant
+def extract_keypresses_information(subID, ke1, ke2, ke3, ke4):
+    
+    # Add 'day' information to each file
+    ke1['session'] = '1'
+    ke2['session'] = '2'
+    ke3['session'] = '3'
+    ke4['session'] = '4'
+    
+    # Merge and add information about the subject
+    ke = pd.concat([ke1, ke2, ke3, ke4])
+    ke['subject'] = 'sub-' + subID
+    
+    # Re-arrange table: trials are identified by subject, session and trial number
+    ke = ke.rename(columns = {'word': 'trial'})
+    keypresses = ke[['subject','session','trial','key','time']]
+    
+    return keypresses
+
+
 # Extract information from test responses:
 # - distance (levensthein) between target and response
 # - which letters were identified, omitted, mistaken for another
-def extract_test_responses(te):
-    
-    # Initialize new columns to be added to table
-    distances = []
-    mistakes = []
-    newResponses = []
+# Each (response, target) pair is scored once, see preproc_test_responses
+def extract_test_responses(te, nWorkers = 1):
     
-    # go entry by entry and correct them
-    for target, response, score in zip(te['woord'], te['response'], te['score']):
-        
-        # edit response to add missing dots, useful to then comupute mistakes and 
-        # distance between response and correct answer
-        response = adjust_response(response)    
-
-        # Calculate Levensthein distance between two strings
-        # (number of changes to go from one to the other)
-        distance = lev.distance(response, target)
-        
-        # In case the strings don't match, have a look at why
-        if distance > 0:
-            
-            # Check omitted letters or mistook ones
-            mistake = assess_mistakes(response, target)
-            
-        else:
-            mistake = []
-                        
-        # Save new columns to be added to table
-        distances.append(distance/len(target))
-        mistakes.append(mistake)
-        newResponses.append(response)
+    responses, distances, mistakes = score_test_responses(te['response'], te['woord'], nWorkers)
         
     # Add new columns and update answers
     te['distance'] = distances
     te['mistakes'] = mistakes
-    te['response'] = newResponses
+    te['response'] = responses
 
     return te
 
 
-# Assess which mistakes were made in the response
-def assess_mistakes(re, ta):
+# Responses of the test and of the training words tested, 
+# with the subject, session and script they belong to
+def get_responses(tr, te):
     
-    mi = ''
+    tested = tr.loc[tr['tested'] > 0, ['subject','session','script','woord','response']]
+    tested['response'] = adjust_responses(tested['response'])
     
-    # If the first character of the response is not equal to the target and 
-    # it's not a '.', assume that the participant did not follow the instructions 
-    # to mark the skipped letters and do it yourself   
-    if not (re[0] == ta[0] or re[0] == '.') or len(re) > len(ta) :
-        
-        # Ask for manual check
-        return 'Requires manual assessment'
-        
-        # # compare current response with the case of adding +1 or +2 dots at the beginning
-        # rePlus1 = '.' + re
-        # rePlus2 = '..' + re
-        
-        # lev0 = lev.distance(re, ta)
-        # lev1 = lev.distance(rePlus1, ta)
-        # lev2 = lev.distance(rePlus2, ta)
-        
-        # # which is closest to answer? Assign the corresponding string and prefer 
-        # # minimal changes if dots don't improve distance
-        # closest = min([lev0, lev1, lev2])
-        # if closest == lev0: 
-        #     re = re
-        # elif closest == lev1:
-        #     re = rePlus1
-        # elif closest == lev2:
-        #     re = rePlus2
-                
-    # take the difference in length between strings and add dots to match lengths
-    if len(re) < len(ta):
-        
-        # compute number of dots to add
-        nbDots = len(ta) - len(re)
-        
-        # add at the end of the string
-        re = re + '.'*nbDots
-        
-    # Asess errors
-    for iLet in range(0, len(re)):
-        
-        # If the letter in response is different from target, store it with the 
-        # corresponding target
-        if not re[iLet] == ta[iLet]:
-            mi = mi + ta[iLet] + '-' + re[iLet] + '_'
-            
-    mi = mi[:-1]
-    
-    return mi
-    
-    mi = []
-    
-    # look up each letter against the same one in that position
-    
-    return mi
-
-
-# Fix the missing dots to have equally long strings
-def adjust_response(re):
-    
-    # First checks on the response
-    # - make sure it's not empty 
-    if pd.isna(re): 
-        re = '.'
-        
-    # - make sure it contains only lower-case letters
-    re = re.lower()
-        
-    return re
+    return pd.concat([te[['subject','session','script','woord','response']], tested], ignore_index = True)
 
 
 # Assign the type of test stimulus (seen words, pseudo-words, novel words)
@@ -461,19 +472,3 @@ def get_stimulus_repetition(idx):
     
     else:
         return '7'
-    
-
-# Exclude outliers form each subject
-def exclude_outliers(train, test):
-    
-    # Training reading time, max 60 seconds. Then considered outlier
-    train = train[(train['readingTime'] <= 60) | train['readingTime'].isna()]
-    
-    # Test writing time
-    # - exclude cases where no key was pressed if the time is shorter than 1s or longer than 30s
-    selection = test[((test['writingTime'] > 30)) | 
-                      (test['writingTime'] > 60)]
-    
-    test = test.drop(selection.index)
-    
-    return train, test
\ No newline at end of file
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Standalone script to make a synthetic dataset, to test the pipeline on many participants
+
+For N subjects and a seed, writes a copy of the project folders with:
+- inputs/participants.tsv
+- inputs/<script>_day<session>/sub-<ID>_ses-<ID>_task-training_script-<ID>_date-<date>.csv/.log
+  with the same columns and events as the files downloaded from Pavlovia:
+  letters training (session 1) and refresh (session 2), words training with tested and
+  non-tested trials (sessions 2-4), test with the keys pressed (all sessions), phases markers
+- outputs/derivatives/stats/datasets: the lists of stimuli and the DLP2 dataset, copied from
+  the project, used to make the summary tables
+
+Words are taken from the real lists of stimuli, responses and timings are random.
+Each subject has its own random generator (seed, subject), so the first subjects
+are the same whatever the number of subjects asked.
+
+The pipeline runs on the synthetic dataset with:
+    python make_synthetic_dataset.py <folder> --subjects 1000 --seed 42
+    python preproc_main.py --root <folder>
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import shutil
+import string
+import argparse
+import numpy as np
+import pandas as pd
+from preproc_option import preproc_option
+
+# Columns of the raw csv files, for each session
+# (session 1 has no words training, session 2 starts with the letters refresh)
+COLUMNS = {'001': ['welcome_mouse.x', 'welcome_mouse.y', 'welcome_mouse.leftButton', 'welcome_mouse.midButton',
+                   'welcome_mouse.rightButton', 'welcome_mouse.time', 'ID', 'date', 'expName', 'psychopyVersion',
+                   'OS', 'frameRate', 'mouse_2.x', 'mouse_2.y', 'mouse_2.leftButton', 'mouse_2.midButton',
+                   'mouse_2.rightButton', 'mouse_2.time', 'mouse_3.x', 'mouse_3.y', 'mouse_3.leftButton',
+                   'mouse_3.midButton', 'mouse_3.rightButton', 'mouse_3.time', 'train_mouse.x', 'train_mouse.y',
+                   'train_mouse.leftButton', 'train_mouse.midButton', 'train_mouse.rightButton', 'train_mouse.time',
+                   'braille_mouse.x', 'braille_mouse.y', 'braille_mouse.leftButton', 'braille_mouse.midButton',
+                   'braille_mouse.rightButton', 'braille_mouse.time', 'trials.thisRepN', 'trials.thisTrialN',
+                   'trials.thisN', 'trials.thisIndex', 'trials.ran', 'nlLet', 'brLet', 'cbLet', 'mouse.x', 'mouse.y',
+                   'mouse.leftButton', 'mouse.midButton', 'mouse.rightButton', 'testInstr_mouse.x',
+                   'testInstr_mouse.y', 'testInstr_mouse.leftButton', 'testInstr_mouse.midButton',
+                   'testInstr_mouse.rightButton', 'test_mouse.x', 'test_mouse.y', 'test_mouse.leftButton',
+                   'test_mouse.midButton', 'test_mouse.rightButton', 'test_response.text', 'testResp',
+                   'test_loop.thisRepN', 'test_loop.thisTrialN', 'test_loop.thisN', 'test_loop.thisIndex',
+                   'test_loop.ran', 'nlWrd', 'brWrd', 'cbWrd'],
+
+           '002': ['welcome_mouse.x', 'welcome_mouse.y', 'welcome_mouse.leftButton', 'welcome_mouse.midButton',
+                   'welcome_mouse.rightButton', 'welcome_mouse.time', 'ID', 'date', 'expName', 'psychopyVersion',
+                   'OS', 'frameRate', 'refresh_mouse.x', 'refresh_mouse.y', 'refresh_mouse.leftButton',
+                   'refresh_mouse.midButton', 'refresh_mouse.rightButton', 'refresh_mouse.time', 'braille_mouse.x',
+                   'braille_mouse.y', 'braille_mouse.leftButton', 'braille_mouse.midButton',
+                   'braille_mouse.rightButton', 'braille_mouse.time', 'trials.thisRepN', 'trials.thisTrialN',
+                   'trials.thisN', 'trials.thisIndex', 'trials.ran', 'nlLet', 'brLet', 'cbLet', 'trainInstr_mouse.x',
+                   'trainInstr_mouse.y', 'trainInstr_mouse.leftButton', 'trainInstr_mouse.midButton',
+                   'trainInstr_mouse.rightButton', 'trainInstr_mouse.time', 'translation_key.keys',
+                   'translation_key.corr', 'translation_key.rt', 'word_rsp.text', 'word_mouse.x', 'word_mouse.y',
+                   'word_mouse.leftButton', 'word_mouse.midButton', 'word_mouse.rightButton', 'word_mouse.time',
+                   'train_loop.thisRepN', 'train_loop.thisTrialN', 'train_loop.thisN', 'train_loop.thisIndex',
+                   'train_loop.ran', 'nlWrd', 'brWrd', 'cbWrd', 'test', 'testResp', 'mouse.x', 'mouse.y',
+                   'mouse.leftButton', 'mouse.midButton', 'mouse.rightButton', 'testInstr_mouse.x',
+                   'testInstr_mouse.y', 'testInstr_mouse.leftButton', 'testInstr_mouse.midButton',
+                   'testInstr_mouse.rightButton', 'test_mouse.x', 'test_mouse.y', 'test_mouse.leftButton',
+                   'test_mouse.midButton', 'test_mouse.rightButton', 'test_response.text', 'test_loop.thisRepN',
+                   'test_loop.thisTrialN', 'test_loop.thisN', 'test_loop.thisIndex', 'test_loop.ran'],
+
+           '003': ['welcome_mouse.x', 'welcome_mouse.y', 'welcome_mouse.leftButton', 'welcome_mouse.midButton',
+                   'welcome_mouse.rightButton', 'ID', 'date', 'expName', 'psychopyVersion', 'OS', 'frameRate',
+                   'trainInstr_mouse.x', 'trainInstr_mouse.y', 'trainInstr_mouse.leftButton',
+                   'trainInstr_mouse.midButton', 'trainInstr_mouse.rightButton', 'translation_key.keys',
+                   'translation_key.corr', 'translation_key.rt', 'word_rsp.text', 'trWrd_mouse.x', 'trWrd_mouse.y',
+                   'trWrd_mouse.leftButton', 'trWrd_mouse.midButton', 'trWrd_mouse.rightButton',
+                   'train_loop.thisRepN', 'train_loop.thisTrialN', 'train_loop.thisN', 'train_loop.thisIndex',
+                   'train_loop.ran', 'nlWrd', 'brWrd', 'cbWrd', 'test', 'testResp', 'mouse.x', 'mouse.y',
+                   'mouse.leftButton', 'mouse.midButton', 'mouse.rightButton', 'testInstr_mouse.x',
+                   'testInstr_mouse.y', 'testInstr_mouse.leftButton', 'testInstr_mouse.midButton',
+                   'testInstr_mouse.rightButton', 'test_mouse.x', 'test_mouse.y', 'test_mouse.leftButton',
+                   'test_mouse.midButton', 'test_mouse.rightButton', 'test_response.text', 'test_loop.thisRepN',
+                   'test_loop.thisTrialN', 'test_loop.thisN', 'test_loop.thisIndex', 'test_loop.ran']}
+COLUMNS['004'] = COLUMNS['003']
+
+# Files of stats/datasets needed to make the summary tables
+DATASETS = ['test_d1.csv', 'test_d2.csv', 'test_d3.csv', 'test_d4.csv',
+            'VBT_stimuli-training_desc-list.csv', 'VBT_stimuli-test_desc-list.csv',
+            'VBT_stimuli-test_desc-seen-words.csv', 'VBT_stimuli-test_desc-pseudowords.csv',
+            'VBT_stimuli-test_desc-novel-words.csv', 'DLP2_dataset.xlsx']
+
+# Letters of the alphabet and number of repetitions of each letter in the training of session 1
+LETTERS = list(string.ascii_lowercase)
+LETTERS_REPETITIONS = 7
+
+
+# Make the synthetic dataset in outputDir
+def make_synthetic_dataset(opt, outputDir, nSubjects, seed):
+
+    # Copy the lists of stimuli, they are the same for every participant
+    datasetsDir = os.path.join(outputDir, 'outputs', 'derivatives', 'stats', 'datasets')
+    os.makedirs(datasetsDir, exist_ok = True)
+
+    for dataset in DATASETS:
+        shutil.copy(os.path.join(opt['dir']['stats'], 'datasets', dataset), datasetsDir)
+
+    stimuli = get_stimuli(datasetsDir)
+
+    # Make the participants and save the list
+    inputDir = os.path.join(outputDir, 'inputs')
+    os.makedirs(inputDir, exist_ok = True)
+
+    participants = make_participants(nSubjects, seed)
+    participants.to_csv(os.path.join(inputDir, 'participants.tsv'), sep = '\t', index = False)
+
+    # Make the four sessions of each participant
+    for iSub, sub in participants.iterrows():
+
+        # Notify the user
+        if iSub % 100 == 0:
+            print(f"Making sub-{sub['subject']} ({iSub + 1}/{nSubjects})")
+
+        # Same subject, same data: the generator depends only on the seed and the subject
+        rng = np.random.default_rng([seed, iSub, 1])
+        profile = make_profile(rng)
+
+        for session in ['001', '002', '003', '004']:
+            write_session(inputDir, sub, session, stimuli, profile, rng)
+
+    print(f"\n\n MADE {nSubjects} SYNTHETIC SUBJECTS \nData can be found in: {inputDir}")
+
+
+### Subfunctions
+
+# Words of each part of the experiment:
+# - training: the 200 words, with the session in which they are tested
+# - test: the 60 words of each session
+def get_stimuli(datasetsDir):
+
+    training = pd.read_csv(os.path.join(datasetsDir, 'VBT_stimuli-training_desc-list.csv'), dtype = {'woord': str})
+    test = {f'00{d}': pd.read_csv(os.path.join(datasetsDir, f'test_d{d}.csv'), dtype = str)['nlWrd'].tolist()
+            for d in range(1, 5)}
+
+    return {'training': training['woord'].tolist(), 'tested': training['session'].to_numpy(), 'test': test}
+
+
+# List of participants, as in inputs/participants.tsv
+def make_participants(nSubjects, seed):
+
+    # IDs keep five digits, as in the real data, unless there are more subjects
+    width = max(5, len(str(nSubjects)))
+
+    participants = []
+
+    for iSub in range(nSubjects):
+
+        # Information of a subject depends only on the seed and the subject
+        rng = np.random.default_rng([seed, iSub, 0])
+        firstDay = pd.Timestamp('2023-07-01') + pd.Timedelta(days = int(rng.integers(0, 90)))
+
+        participants.append({'subject': str(iSub + 1).zfill(width),
+                             'script': rng.choice(['br', 'cb']),
+                             'date': firstDay.strftime('%d.%m.%Y'),
+                             'recruitment': rng.choice(['sona', 'flyer']),
+                             'age': f"{rng.uniform(18, 30):.2f}",
+                             'sex': rng.choice(['f', 'm']),
+                             'handedness': rng.choice(['r', 'l'], p = [0.85, 0.15])})
+
+    return pd.DataFrame(participants)
+
+
+# Characteristics of a participant: how accurate and how fast they are
+def make_profile(rng):
+
+    return {'accuracy': rng.normal(0, 1),
+            'speed': rng.lognormal(0, 0.25),
+            'typing': rng.lognormal(np.log(0.3), 0.3),
+            'os': rng.choice(['Win32', 'MacIntel']),
+            'frameRate': rng.choice([59.99880002, 60.00240014, 61.31959774])}
+
+
+# Make and save csv and log of one session
+def write_session(inputDir, sub, session, stimuli, profile, rng):
+
+    # Name of the files, e.g.
+    # cb_day1/sub-00004_ses-001_task-training_script-CB_date-2023-07-31_18h59.50.262
+    day = int(session)
+    start = pd.to_datetime(sub['date'], format = '%d.%m.%Y') + pd.Timedelta(days = day - 1,
+                                                                            seconds = int(rng.integers(9 * 3600, 19 * 3600)),
+                                                                            milliseconds = int(rng.integers(0, 1000)))
+    date = f"{start.strftime('%Y-%m-%d_%Hh%M.%S')}.{start.microsecond // 1000:03d}"
+
+    folder = os.path.join(inputDir, f"{sub['script']}_day{day}")
+    os.makedirs(folder, exist_ok = True)
+
+    filename = os.path.join(folder, f"sub-{sub['subject']}_ses-{session}_task-training_script-{sub['script'].upper()}_date-{date}")
+
+    # Information present in every row of the csv
+    info = {'ID': int(sub['subject']), 'date': date,
+            'expName': f"vbt_B{1 if sub['script'] == 'br' else 2}_day{day}",
+            'psychopyVersion': '2022.2.4', 'OS': profile['os'], 'frameRate': profile['frameRate']}
+
+    rows, events = make_session(session, stimuli, profile, rng)
+
+    # Raw csv files start with the byte order mark
+    table = pd.DataFrame(rows, columns = COLUMNS[session])
+    for column, value in info.items():
+        table[column] = value
+
+    table.to_csv(filename + '.csv', index = False, encoding = 'utf-8-sig')
+
+    # Each event is 'timing - level - description', separated by tabs
+    with open(filename + '.log', 'w', encoding = 'utf-8') as f:
+        f.writelines(f"{timing}\t{level}\t{description}\n" for timing, level, description in events)
+
+
+# Go through the parts of a session, in order, and collect the rows of the csv and the events of the log
+def make_session(session, stimuli, profile, rng):
+
+    rows = []
+    events = []
+    clock = {'now': round(rng.uniform(1, 5), 4)}
+
+    # Components are created and reset before the experiment starts
+    for component in ['welcome_text', 'train_text', 'refresh_text', 'trainInstr_text', 'dutch_letter',
+                      'braille_letter', 'dutch_word', 'braille_word', 'word_rsp', 'endTrain_text',
+                      'testInstr_text', 'test_word', 'test_response', 'end_text']:
+        events.append((clock['now'], 'EXP', f"Created {component} = {component}( name={component}, autoDraw=null, autoLog=true )"))
+
+    events += [(clock['now'], 'EXP', "dutch_letter: text = null"),
+               (clock['now'], 'EXP', "dutch_word: text = null"),
+               (clock['now'], 'EXP', "welcome_text: autoDraw = true")]
+
+    # Welcome screen
+    wait(clock, rng.lognormal(np.log(15), 0.4))
+    rows.append({**mouse_click('welcome_mouse', rng), 'welcome_mouse.time': clock['now']})
+    events += [*mouse_events(clock, rng), (clock['now'], 'EXP', "welcome_text: autoDraw = null")]
+
+    # Letters: all the alphabet for training in session 1, once for refresh in session 2
+    if session == '001':
+        rows += [mouse_click('mouse_2', rng), mouse_click('mouse_3', rng)]
+        events += instructions('train_text', clock, rng)
+        rows.append({**mouse_click('train_mouse', rng), 'train_mouse.time': clock['now']})
+
+        letters = np.concatenate([rng.permutation(LETTERS) for r in range(LETTERS_REPETITIONS)])
+        make_letters(letters, rows, events, profile, clock, rng)
+        events.append((clock['now'], 'EXP', "endTrain_text: autoDraw = true"))
+
+    elif session == '002':
+        events += instructions('refresh_text', clock, rng)
+        rows.append({**mouse_click('refresh_mouse', rng), 'refresh_mouse.time': clock['now']})
+
+        make_letters(rng.permutation(LETTERS), rows, events, profile, clock, rng)
+        events.append((clock['now'], 'EXP', "trainInstr_text: autoDraw = true"))
+
+    # Words training, in sessions 2 to 4
+    if session != '001':
+
+        # Sessions 3 and 4 start directly with the instructions of the training
+        if session != '002':
+            events.append((clock['now'], 'EXP', "trainInstr_text: autoDraw = true"))
+
+        wait(clock, rng.lognormal(np.log(20), 0.4))
+        events += [*mouse_events(clock, rng), (clock['now'], 'EXP', "trainInstr_text: autoDraw = null")]
+        rows.append({**mouse_click('trainInstr_mouse', rng), 'trainInstr_mouse.time': clock['now']})
+
+        order = rng.permutation(len(stimuli['training']))
+        words = [stimuli['training'][i] for i in order]
+        tested = stimuli['tested'][order] == int(session)
+
+        make_training(session, words, tested, order, rows, events, profile, clock, rng)
+        events.append((clock['now'], 'EXP', "endTrain_text: autoDraw = true"))
+
+    # Break between training and test
+    wait(clock, rng.lognormal(np.log(180), 0.5))
+    events += [*mouse_events(clock, rng),
+               (clock['now'], 'EXP', "endTrain_text: autoDraw = null"),
+               (clock['now'], 'EXP', "testInstr_text: autoDraw = true")]
+    rows.append(mouse_click('mouse', rng))
+
+    wait(clock, rng.lognormal(np.log(15), 0.4))
+    events += [*mouse_events(clock, rng), (clock['now'], 'EXP', "testInstr_text: autoDraw = null")]
+    rows.append(mouse_click('testInstr_mouse', rng))
+
+    # Test
+    order = rng.permutation(len(stimuli['test'][session]))
+    make_test(session, [stimuli['test'][session][i] for i in order], order, rows, events, profile, clock, rng)
+    events.append((clock['now'], 'EXP', "end_text: autoDraw = true"))
+
+    # End of the experiment
+    wait(clock, rng.lognormal(np.log(3), 0.3))
+    events += mouse_events(clock, rng)
+    rows.append({})
+
+    return rows, events
+
+
+# Letters training: the letter is shown in braille, the participant clicks to see
+# the dutch letter, then clicks again to go to the next one
+def make_letters(letters, rows, events, profile, clock, rng):
+
+    for iLet, letter in enumerate(letters):
+
+        events += [(clock['now'], 'EXP', "braille_letter: image = {}"),
+                   (clock['now'], 'EXP', f"dutch_letter: text = {letter}"),
+                   (clock['now'], 'EXP', "outline: autoDraw = true"),
+                   (clock['now'], 'EXP', "braille_letter: autoDraw = true"),
+                   (wait(clock, 0.05), 'DATA', mouse_position('up', rng))]
+
+        wait(clock, profile['speed'] * rng.lognormal(np.log(2), 0.5))
+        events += [(clock['now'], 'EXP', "dutch_letter: autoDraw = true")]
+
+        wait(clock, profile['speed'] * rng.lognormal(np.log(1.2), 0.5))
+        events += [(clock['now'], 'DATA', mouse_position('down', rng)),
+                   (wait(clock, 0.03), 'EXP', "outline: autoDraw = null"),
+                   (clock['now'], 'EXP', "braille_letter: autoDraw = null"),
+                   (clock['now'], 'EXP', "dutch_letter: autoDraw = null")]
+
+        rows.append({**mouse_click('braille_mouse', rng), 'braille_mouse.time': clock['now'],
+                     'trials.thisRepN': float(iLet // len(LETTERS)), 'trials.thisTrialN': float(iLet % len(LETTERS)),
+                     'trials.thisN': float(iLet), 'trials.thisIndex': float(LETTERS.index(letter)), 'trials.ran': 1.0,
+                     'nlLet': letter, 'brLet': f"images/br_{letter}.png", 'cbLet': f"images/cb_{letter}.png"})
+
+
+# Words training: the word is shown in braille, the participant either writes the translation (tested)
+# or reads it and presses the arrow down to see the dutch word. A click goes to the next word
+def make_training(session, words, tested, order, rows, events, profile, clock, rng):
+
+    mouse = 'word_mouse' if session == '002' else 'trWrd_mouse'
+
+    for iWord, (word, isTested) in enumerate(zip(words, tested)):
+
+        events += [(clock['now'], 'EXP', "braille_word: image = {}"),
+                   (clock['now'], 'EXP', f"dutch_word: text = {word}")]
+
+        if isTested:
+            events += [(clock['now'], 'EXP', "word_rsp: editable = true"),
+                       (clock['now'], 'EXP', "word_rsp: autoDraw = true")]
+
+        events += [(wait(clock, 0.05), 'DATA', mouse_position('up', rng)),
+                   (wait(clock, 0.4), 'EXP', "braille_word: autoDraw = true")]
+
+        row = {**mouse_click(mouse, rng), 'train_loop.thisRepN': 0.0, 'train_loop.thisTrialN': float(iWord),
+               'train_loop.thisN': float(iWord), 'train_loop.thisIndex': float(order[iWord]), 'train_loop.ran': 1.0,
+               'nlWrd': word, 'brWrd': f"images/br_{word}.png", 'cbWrd': f"images/cb_{word}.png",
+               'test': float(isTested)}
+
+        # Tested words: write the translation before seeing the solution
+        if isTested:
+            response = make_response(word, session, profile, rng)
+            events += type_response(response, clock, profile, rng)
+            row.update({'testResp': response, 'word_rsp.text': response})
+        else:
+            wait(clock, profile['speed'] * rng.lognormal(np.log(4), 0.5))
+
+        # Rarely, the participant takes a long break
+        if rng.random() < 0.002:
+            wait(clock, rng.uniform(60, 120))
+
+        events += [(wait(clock, 0.3), 'DATA', "Keydown: ArrowDown"),
+                   (wait(clock, 0.04), 'EXP', "dutch_word: autoDraw = true")]
+        row.update({'translation_key.keys': 'down', 'translation_key.corr': 0.0, 'translation_key.rt': clock['now']})
+
+        wait(clock, profile['speed'] * rng.lognormal(np.log(0.7), 0.4))
+        events += [(clock['now'], 'DATA', mouse_position('down', rng)),
+                   (wait(clock, 0.03), 'EXP', "braille_word: autoDraw = null"),
+                   (clock['now'], 'EXP', "dutch_word: autoDraw = null"),
+                   (clock['now'], 'EXP', "word_rsp: autoDraw = null")]
+
+        row[f'{mouse}.time'] = clock['now']
+        rows.append(row)
+
+
+# Test: the word is shown in braille for 6 seconds, then the participant writes the translation
+# and clicks to go to the next one
+def make_test(session, words, order, rows, events, profile, clock, rng):
+
+    for iWord, word in enumerate(words):
+
+        events += [(clock['now'], 'EXP', "test_word: image = {}"),
+                   (clock['now'], 'EXP', "test_response: editable = true"),
+                   (clock['now'], 'EXP', "test_word: autoDraw = true"),
+                   (wait(clock, 0.05), 'DATA', mouse_position('up', rng))]
+
+        wait(clock, 6 + rng.uniform(-0.05, 0.05))
+        events += [(clock['now'], 'EXP', "test_word: autoDraw = null"),
+                   (wait(clock, 0.02), 'EXP', "test_response: autoDraw = true")]
+
+        # Some words are skipped: no key is pressed and there is no response
+        response = make_response(word, session, profile, rng) if rng.random() > 0.03 else np.nan
+        events += type_response(response, clock, profile, rng)
+
+        wait(clock, profile['speed'] * rng.lognormal(np.log(1), 0.5))
+        events += [(clock['now'], 'DATA', mouse_position('down', rng)),
+                   (wait(clock, 0.07), 'EXP', "test_word: autoDraw = null"),
+                   (clock['now'], 'EXP', "test_response: autoDraw = null")]
+
+        rows.append({**mouse_click('test_mouse', rng), 'test_response.text': response, 'testResp': response,
+                     'test_loop.thisRepN': 0.0, 'test_loop.thisTrialN': float(iWord), 'test_loop.thisN': float(iWord),
+                     'test_loop.thisIndex': float(order[iWord]), 'test_loop.ran': 1.0,
+                     'nlWrd': word, 'brWrd': f"images/br_{word}.png", 'cbWrd': f"images/cb_{word}.png"})
+
+
+# Response to a word: correct, or with some letters changed, added or removed.
+# Participants get more accurate from one session to the next
+def make_response(word, session, profile, rng):
+
+    pCorrect = 1 / (1 + np.exp(-(profile['accuracy'] + 0.8 * (int(session) - 2))))
+
+    if rng.random() < pCorrect:
+        return word
+
+    response = list(word)
+
+    for e in range(rng.integers(1, 3)):
+
+        position = int(rng.integers(0, len(response) + 1))
+        edit = rng.choice(['substitute', 'insert', 'delete']) if response else 'insert'
+        position = min(position, len(response) - 1) if edit != 'insert' else position
+
+        if edit == 'substitute':
+            response[position] = rng.choice(LETTERS)
+        elif edit == 'insert':
+            response.insert(position, rng.choice(LETTERS))
+        else:
+            del response[position]
+
+    return ''.join(response)
+
+
+# Keys pressed to write a response: its letters, with some typos corrected with Backspace
+def type_response(response, clock, profile, rng):
+
+    events = []
+
+    if not isinstance(response, str):
+        return events
+
+    wait(clock, rng.lognormal(np.log(1), 0.4))
+
+    for letter in response:
+
+        if rng.random() < 0.05:
+            events += [(wait(clock, profile['typing'] * rng.lognormal(0, 0.3)), 'DATA', f"Keydown: {rng.choice(LETTERS)}"),
+                       (wait(clock, profile['typing'] * rng.lognormal(0.5, 0.3)), 'DATA', "Keydown: Backspace")]
+
+        events.append((wait(clock, profile['typing'] * rng.lognormal(0, 0.3)), 'DATA', f"Keydown: {letter}"))
+
+    return events
+
+
+# Instructions screen: shown, read, closed with a click
+def instructions(name, clock, rng):
+
+    events = [(clock['now'], 'EXP', f"{name}: autoDraw = true")]
+
+    wait(clock, rng.lognormal(np.log(20), 0.4))
+    events += [*mouse_events(clock, rng), (clock['now'], 'EXP', f"{name}: autoDraw = null")]
+
+    return events
+
+
+# Click of the mouse in the log: button down and up
+def mouse_events(clock, rng):
+
+    return [(clock['now'], 'DATA', mouse_position('down', rng)),
+            (wait(clock, 0.08), 'DATA', mouse_position('up', rng))]
+
+
+def mouse_position(action, rng):
+
+    return f"Mouse: 0 button {action}, pos=({rng.uniform(500, 1200)},{rng.uniform(100, 700)})"
+
+
+# Click of the mouse in the csv: position and buttons
+def mouse_click(name, rng):
+
+    return {f'{name}.x': rng.uniform(-0.4, 0.4), f'{name}.y': rng.uniform(-0.4, 0.4),
+            f'{name}.leftButton': 1.0, f'{name}.midButton': 0.0, f'{name}.rightButton': 0.0}
+
+
+# Move forward the time since the start of the experiment (as in the log files) and return it
+def wait(clock, seconds):
+
+    clock['now'] = round(clock['now'] + seconds, 4)
+
+    return clock['now']
+
+
+if __name__ == '__main__':
+
+    # Command line: folder where to make the dataset, number of subjects and seed
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output', help = 'folder of the synthetic dataset (inputs and outputs/derivatives)')
+    parser.add_argument('--subjects', type = int, default = 100, help = 'number of subjects to make')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the random generator')
+    args = parser.parse_args()
+
+    make_synthetic_dataset(preproc_option(), args.output, args.subjects, args.seed)
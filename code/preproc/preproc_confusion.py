@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Letter confusion matrices of the responses, by subject, session and script.
+
+Each response is aligned to its target (Levenshtein operations): every letter of the
+target is matched to the letter written in its place, to nothing (omitted) or the
+response has a letter that is not in the target (inserted).
+For each subject, session and script, the matches are counted in a 27 x 27 matrix:
+    - rows: letter of the target, a-z, and '-' for the letters inserted in the response
+    - columns: letter of the response, a-z, and '-' for the letters omitted
+The diagonal holds the letters identified. Marks for skipped letters ('.') and other
+characters that are not letters count as omissions.
+
+The same (response, target) pairs come back many times: each pair is aligned once,
+and the matrices are filled with all the trials at once.
+Matrices are saved in outputs/derivatives/stats/datasets/VBT_stimuli-responses_desc-letter-confusion/:
+    - counts.npy: matrices, groups x 27 x 27
+    - groups.csv: subject, session and script of each matrix
+    - labels.json: letter of each row and column
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import Levenshtein as lev
+from preproc_test_responses import get_unique_pairs
+
+# Letters of the matrices, and position of the omissions (column) and insertions (row)
+LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+LABELS = list(LETTERS) + ['-']
+GAP = len(LETTERS)
+
+# Each matrix is made for one subject, session and script
+GROUPS = ['subject', 'session', 'script']
+
+
+# Count the letters confused in all the responses.
+# - trials: table with the GROUPS columns, 'woord' and 'response' (see adjust_responses)
+# Returns the group of each matrix and the matrices (groups x 27 x 27)
+def make_confusion_matrices(trials):
+
+    nCells = len(LABELS) ** 2
+
+    groupCodes = trials.groupby(GROUPS, sort = False, dropna = False, observed = True).ngroup().to_numpy()
+    groups = trials[GROUPS].drop_duplicates().reset_index(drop = True)
+
+    # Align each (response, target) pair once: which cells of the matrix it adds to
+    pairCodes, pairs = get_unique_pairs(trials['response'], trials['woord'])
+    pairCells = [align_letters(response, target) for response, target in pairs]
+
+    cellLengths = np.array([len(cells) for cells in pairCells], dtype = int)
+    cellStarts = np.cumsum(cellLengths) - cellLengths
+    allCells = np.concatenate(pairCells + [np.array([], dtype = int)])
+
+    # How many times each group has each pair
+    comboCodes, combos = pd.factorize(groupCodes * max(len(pairs), 1) + pairCodes)
+    comboCounts = np.bincount(comboCodes, minlength = len(combos))
+    comboGroups = combos // max(len(pairs), 1)
+    comboPairs = combos % max(len(pairs), 1)
+
+    # Repeat the cells of each pair for each group that has it
+    nRepeats = cellLengths[comboPairs]
+    firstRepeat = np.cumsum(nRepeats) - nRepeats
+    position = np.repeat(cellStarts[comboPairs] - firstRepeat, nRepeats) + np.arange(nRepeats.sum())
+
+    counts = np.bincount(np.repeat(comboGroups, nRepeats) * nCells + allCells[position],
+                         weights = np.repeat(comboCounts, nRepeats), minlength = len(groups) * nCells)
+
+    return groups, counts.astype(np.int64).reshape(len(groups), len(LABELS), len(LABELS))
+
+
+def save_confusion(opt, groups, counts):
+
+    outputDir = get_confusion_path(opt)
+    os.makedirs(outputDir, exist_ok = True)
+
+    np.save(os.path.join(outputDir, 'counts.npy'), counts)
+    groups.to_csv(os.path.join(outputDir, 'groups.csv'), index = False)
+
+    with open(os.path.join(outputDir, 'labels.json'), 'w') as f:
+        json.dump(LABELS, f)
+
+
+# Load the matrices and the group of each of them
+def load_confusion(opt):
+
+    inputDir = get_confusion_path(opt)
+
+    counts = np.load(os.path.join(inputDir, 'counts.npy'))
+    groups = pd.read_csv(os.path.join(inputDir, 'groups.csv'), dtype = str)
+
+    return groups, counts
+
+
+### Subfunctions
+
+# Cells of the matrix (row * 27 + column) of each letter of the target and of the response
+def align_letters(response, target):
+
+    cells = []
+
+    for op, resStart, resEnd, tarStart, tarEnd in lev.opcodes(response, target):
+
+        # Letters in the same place: identified or mistaken for another
+        if op in ['equal', 'replace']:
+            cells += [get_cell(ta, re) for re, ta in zip(response[resStart:resEnd], target[tarStart:tarEnd])]
+
+        # Letters of the target missing in the response
+        elif op == 'insert':
+            cells += [get_cell(ta, None) for ta in target[tarStart:tarEnd]]
+
+        # Letters of the response not in the target
+        else:
+            cells += [get_cell(None, re) for re in response[resStart:resEnd]]
+
+    # Skip marks and characters that are not letters, when they are not in place of a letter
+    return np.array([cell for cell in cells if cell != GAP * len(LABELS) + GAP], dtype = int)
+
+
+def get_cell(ta, re):
+
+    row = LETTERS.find(ta) if ta else -1
+    col = LETTERS.find(re) if re else -1
+
+    return (row if row >= 0 else GAP) * len(LABELS) + (col if col >= 0 else GAP)
+
+
+def get_confusion_path(opt):
+
+    return os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-responses_desc-letter-confusion')
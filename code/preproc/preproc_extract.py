@@ -1,8 +1,19 @@
 import os
+import sys
+import traceback
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from preproc_extract_csv import preproc_extract_csv  # assuming this function is implemented in a separate file
 from preproc_extract_log import preproc_extract_log  # assuming this function is implemented in a separate file
 from preproc_merge_and_save import preproc_merge_and_save
+from preproc_trial_store import save_trial_store, has_trial_store, load_extracted_tables
+from preproc_index import save_index
+from preproc_manifest import load_manifest, save_manifest, check_manifest, update_manifest, report_manifest
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from profiling import profile, profile_unit, add_unit, count_written
+from read_tables import as_read_table, DTYPES
 
 def preproc_extract(opt):
 
@@ -12,6 +23,10 @@ def preproc_extract(opt):
     # - import each csv and extract the meaningful responses (for accuracy)
     # - import log file and extract timings
     # - save relevant files in /outputs/extracted_data/subID
+    # In fused mode (see preproc_option), also return all the extracted tables, to be used
+    # by the summaries without reading them again. Otherwise return None
+    # Pairs that cannot be extracted do not stop the others: they are returned as 
+    # (csv file, error), next to the tables
 
     # Suppress warnings
     import warnings
@@ -19,19 +34,20 @@ def preproc_extract(opt):
 
     # Load folders
     # only those specifying a day of training
-    rawFolders = [folder for folder in os.listdir(opt['dir']['input']) if 'day' in folder]
+    rawFolders = sorted([folder for folder in os.listdir(opt['dir']['input']) if 'day' in folder])
 
-    # Folder by folder, get all the files for a participant and extract the data
-    for rw in rawFolders:
+    # List of csv/log pairs to extract, with the information about the subject
+    pairs = []
 
-        # Notify the user
-        print(f"\n\nWorking on script-{rw[0:2]} ses-00{rw[-1]}\n")
+    # Folder by folder, get all the files for a participant and check that they can be extracted
+    for rw in rawFolders:
 
         # Get two separate lists, one for response/csv files and one for timing/log files
-        csvList = list(Path(os.path.join(opt['dir']['input'], rw)).glob('sub-*.csv'))
-        logList = list(Path(os.path.join(opt['dir']['input'], rw)).glob('sub-*.log'))
+        # Sort them, to be sure that csv and log of the same subject are paired
+        csvList = sorted(Path(os.path.join(opt['dir']['input'], rw)).glob('sub-*.csv'))
+        logList = sorted(Path(os.path.join(opt['dir']['input'], rw)).glob('sub-*.log'))
 
-        # Work on each file
+        # Check each file
         for cf, lf in zip(csvList, logList):
             currentCsv = str(cf)
             currentLog = str(lf)
@@ -47,20 +63,62 @@ def preproc_extract(opt):
             if sub['subID'] not in opt['subList']:
                 raise ValueError("Participant that is being processed is not on the list. Check inputs folder")
 
-            # Notify the user
-            print(f"Extracting sub-{sub['subID']}...")
+            pairs.append((rw, currentCsv, currentLog, sub))
+
+    # Skip the pairs whose raw files and extraction code did not change since the last run
+    manifest = load_manifest(opt)
+    toExtract, reused, entries = check_manifest(opt, manifest, pairs)
+
+    # Extract the pairs, one after the other or spread across different processes
+    # In the main process, files are saved in the background while the next pairs are extracted
+    nWorkers = opt.get('parallel', {}).get('nWorkers', 1)
+    writer = {'pool': ThreadPoolExecutor(max_workers = 1), 'pending': []}
+    errors = []
+
+    if nWorkers == 1:
+        extracted = extract_serial(opt, toExtract, errors, writer)
+    else:
+        extracted = extract_parallel(opt, toExtract, errors, nWorkers)
+
+    # Keep the extracted tables in memory, in fused mode
+    tables = {} if opt.get('fused', {}).get('use', False) else None
 
-            # Import csv and clean it based on the day and which files are needed
-            trimmedCsv = preproc_extract_csv(currentCsv, sub['sesID'])
+    # Add each extracted pair to the manifest as soon as it's done, 
+    # save the manifest even if the extraction stops on an error
+    done = []
 
-            # Import log file and clean it to get the events
-            trimmedLog, completionTime = preproc_extract_log(currentLog, sub['sesID'])
+    try:
+        for pair, outputs, pairTables in extracted:
+            update_manifest(opt, manifest, entries, pair[1], outputs)
+            done.append(pair)
 
-            # Save files
-            preproc_merge_and_save(opt, trimmedCsv, trimmedLog, completionTime, sub)
+            if tables is not None:
+                add_to_tables(tables, pair[3], pairTables)
+    finally:
+        # The files of the manifest must be on disk before saving it
+        finish_writer(writer)
+        save_manifest(opt, manifest)
 
     # Notify the user
-    print(f"\n\n EXTRACTED ALL THE SUBJECTS \nData can be found in: {opt['dir']['extracted']}")
+    report_manifest(opt, reused, done)
+    report_errors(errors)
+
+    # List all the extracted files once, for the tables made from them
+    save_index(opt)
+
+    # Gather all the trials in the columnar store, if something changed or if it's not there yet
+    # (or only in another format)
+    if opt.get('store', {}).get('use', False) and (done or not has_trial_store(opt)):
+        save_trial_store(opt)
+
+    if not errors:
+        print(f"\n\n EXTRACTED ALL THE SUBJECTS \nData can be found in: {opt['dir']['extracted']}")
+
+    # Tables of the pairs not extracted in this run are read from their files
+    if tables is not None and not errors:
+        tables = load_extracted_tables(opt, store = tables)
+
+    return tables, errors
 
 
 ### Subfunctions
@@ -75,9 +133,130 @@ def extract_subject_info(filename):
     separators = filename.maketrans("/", "_")
     modFilename = filename.translate(separators)
     nameParcels = modFilename.split('_')
-    
+
     subInfo['subID'] = nameParcels[-6].split('-')[1]
     subInfo['sesID'] = nameParcels[-5].split('-')[1]
     subInfo['scriptID'] = nameParcels[-3].split('-')[1].lower()
 
     return subInfo
+
+
+# Extract one csv/log pair and save the tables of the subject
+# Returns the list of saved files
+def extract_pair(opt, currentCsv, currentLog, sub, writer = None):
+
+    # Import csv and clean it based on the day and which files are needed
+    trimmedCsv = preproc_extract_csv(opt, currentCsv, sub['sesID'])
+
+    # Import log file and clean it to get the events
+    trimmedLog, completionTime = preproc_extract_log(currentLog, sub['sesID'])
+
+    # Save files, returns the files saved and the tables
+    return preproc_merge_and_save(opt, trimmedCsv, trimmedLog, completionTime, sub, writer)
+
+
+# Extract the pairs one by one, in the main process.
+# Errors are collected file by file in errors, without stopping the other pairs.
+# Yields each pair with its saved files and tables as soon as it's extracted
+def extract_serial(opt, pairs, errors, writer = None):
+
+    currentFolder = None
+
+    for pair in pairs:
+
+        rw, currentCsv, currentLog, sub = pair
+
+        # Notify the user when moving to a new folder
+        if rw != currentFolder:
+            print(f"\n\nWorking on script-{rw[0:2]} ses-00{rw[-1]}\n")
+            currentFolder = rw
+
+        # Notify the user
+        print(f"Extracting sub-{sub['subID']}...")
+
+        # Each pair is a unit of work of the profile (if enabled)
+        try:
+            with profile(f"sub-{sub['subID']}_ses-{sub['sesID']}"):
+                outputs, pairTables = extract_pair(opt, currentCsv, currentLog, sub, writer)
+                count_written(len(outputs))
+
+        except Exception:
+            errors.append((currentCsv, traceback.format_exc()))
+            continue
+
+        yield pair, outputs, pairTables
+
+
+# Extract the pairs in a pool of processes.
+# Each pair writes its own files, so the outputs are the same as the serial extraction.
+# Each pair is measured in its worker and added to the profile as a unit of work.
+# Errors are collected file by file in errors, without stopping the other pairs.
+# Yields each pair with its saved files and tables as soon as it's extracted
+def extract_parallel(opt, pairs, errors, nWorkers):
+
+    # Notify the user
+    print(f"\n\nExtracting {len(pairs)} files on {nWorkers or os.cpu_count()} processes\n")
+
+    with ProcessPoolExecutor(max_workers = nWorkers) as pool:
+
+        futures = {pool.submit(extract_pair_safely, opt, pair[1], pair[2], pair[3]): pair for pair in pairs}
+
+        for future in as_completed(futures):
+
+            pair = futures[future]
+            result, error = future.result()
+
+            if error is None:
+                print(f"Extracted {os.path.basename(pair[1])}")
+                outputs, pairTables, unit = result
+                add_unit(unit)
+                yield pair, outputs, pairTables
+            else:
+                errors.append((pair[1], error))
+
+
+# Report the files that could not be extracted, with their errors
+def report_errors(errors):
+
+    if errors:
+        print(f"\n\n{len(errors)} FILES COULD NOT BE EXTRACTED")
+        for filename, error in sorted(errors):
+            print(f"\n{filename}\n{error}")
+
+
+# Wrapper around extract_pair for the worker processes: return the error instead of raising it
+def extract_pair_safely(opt, currentCsv, currentLog, sub):
+
+    # Workers do not inherit the filters of the main process on every platform
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    try:
+        with profile_unit(opt, f"sub-{sub['subID']}_ses-{sub['sesID']}") as unit:
+            outputs, tables = extract_pair(opt, currentCsv, currentLog, sub)
+            count_written(len(outputs))
+
+        # Tables are sent back to the main process only if they are kept in memory
+        return (outputs, tables if opt.get('fused', {}).get('use', False) else {}, unit), None
+
+    except Exception:
+        return None, traceback.format_exc()
+
+
+# Wait for the files saved in the background, and report errors in saving them
+def finish_writer(writer):
+
+    writer['pool'].shutdown(wait = True)
+
+    for future in writer['pending']:
+        future.result()
+
+    writer['pending'] = []
+
+
+# Add the tables of an extracted pair to the tables in memory (organized as a loaded columnar store),
+# in the same form as if they were read from their files
+def add_to_tables(tables, sub, pairTables):
+
+    for phase, table in pairTables.items():
+        tables.setdefault((phase, sub['sesID']), {})[sub['subID']] = as_read_table(table, DTYPES[phase])
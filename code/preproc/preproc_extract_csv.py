@@ -1,9 +1,17 @@
+import os
+import re
+import sys
 import pandas as pd
 
-def preproc_extract_csv(filename, session):
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
 
-    # Import the data
-    imported = pd.read_csv(filename)
+# Characters allowed in the test responses: letters, numbers and punctuation, 
+# i.e. the printable ASCII characters without the space
+NOT_ALLOWED = re.compile(r'[^!-~]')
+
+def preproc_extract_csv(opt, filename, session):
     
     # Initialize the trimmed structure
     trimmed = {}
@@ -11,8 +19,8 @@ def preproc_extract_csv(filename, session):
     # Switch based on session
     if session == '001':
 
-        # Extract necessary columns
-        tableToTrim = imported[["ID", "nlLet", "nlWrd", "testResp"]]
+        # Import only the necessary columns
+        tableToTrim = read_table(opt, filename, ["ID", "nlLet", "nlWrd", "testResp"], DTYPES['pavlovia'])
         
         # Extract chunks for session '001'
         trimmed['training'] = extract_letters_results(tableToTrim)
@@ -20,8 +28,8 @@ def preproc_extract_csv(filename, session):
 
     elif session == '002':
 
-        # Extract necessary columns
-        tableToTrim = imported[["ID", "nlLet", "nlWrd", "test", "testResp"]]
+        # Import only the necessary columns
+        tableToTrim = read_table(opt, filename, ["ID", "nlLet", "nlWrd", "test", "testResp"], DTYPES['pavlovia'])
 
         # Extract chunks for session '002'
         trimmed['refresh'] = extract_letters_results(tableToTrim)
@@ -30,8 +38,8 @@ def preproc_extract_csv(filename, session):
 
     elif session in ['003', '004']:
 
-        # Extract necessary columns
-        tableToTrim = imported[["ID", "nlWrd", "test", "testResp"]]
+        # Import only the necessary columns
+        tableToTrim = read_table(opt, filename, ["ID", "nlWrd", "test", "testResp"], DTYPES['pavlovia'])
 
         # Extract chunks for sessions '003' and '004'
         trimmed['training'] = extract_training_results(tableToTrim)
@@ -74,8 +82,11 @@ def extract_training_results(tableIn):
     # Start and end of letters array defines the training set
     tableOut = tableIn.loc[writeIdx, ["nlWrd", "test", "testResp"]]
 
+    # Clean the responses, as in the test
+    tableOut['testResp'] = clean_test_responses(tableOut['testResp'])
+
     # Quickly assign rudimental score to the elements tested
-    tableOut['score'] = tableOut['nlWrd'].str.lower() == tableOut['testResp'].str.lower()
+    tableOut['score'] = score_responses(tableOut['nlWrd'], tableOut['testResp'])
     
     # Adjust csv output: from series to dataframe, index starting from 0
     tableOut = pd.DataFrame(tableOut)
@@ -101,10 +112,10 @@ def extract_test_results(tableIn, session):
     tableOut = tableIn.loc[testIdx, ["nlWrd", "testResp"]]
     
     # Clean the test output
-    tableOut['testResp'] = tableOut['testResp'].apply(clean_test_response)
+    tableOut['testResp'] = clean_test_responses(tableOut['testResp'])
     
     # Quickly assign rudimental score to the elements tested
-    tableOut['score'] = tableOut['nlWrd'].str.lower() == tableOut['testResp'].str.lower()
+    tableOut['score'] = score_responses(tableOut['nlWrd'], tableOut['testResp'])
     
     # Adjust csv output: index starting from 0
     tableOut.reset_index(drop = True, inplace = True)
@@ -112,20 +123,17 @@ def extract_test_results(tableIn, session):
     return tableOut
 
 
-def clean_test_response(answer):
+# Clean all the responses at once: 
+# - skipped answers (not text, e.g. NaN) become empty strings
+# - characters that are not allowed (spaces, accents, newlines, ...) are removed
+def clean_test_responses(responses):
 
-    # Choose allowed characters and numbers
-    allowedChar = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!"#$%&()*+,-./:;<=>?@[\]^_`{|}~0123456789'
-    allowedNums = [ord(c) for c in allowedChar] + [ord("'")]  # Include ASCII for '
+    responses = responses.where(responses.notna(), '').astype(str)
+
+    return responses.str.replace(NOT_ALLOWED, '', regex = True)
 
-    cleanAnswer = ''
-    
-    # if the answer has been skipped, mark the string as empty
-    if isinstance(answer, float):
-        answer = ''
 
-    for char in answer:
-        if ord(char) in allowedNums:
-            cleanAnswer += char
+# Compare words and responses, regardless of case. Missing responses are wrong
+def score_responses(words, responses):
 
-    return cleanAnswer
+    return words.str.lower() == responses.str.lower()
@@ -1,59 +1,65 @@
 import pandas as pd
 import numpy as np
+from collections import deque
 
 def preproc_extract_log(filename, session):
 
-    # Import the data
-    imported = pd.read_table(filename, names=['Timing', 'EVENT', 'Description'])
+    # Read the log line by line and sort the events of interest into the parts of the session
+    # Only these events are kept in memory, not the whole log
+    trainingEvents, testEvents, refreshEvents, phaseEvents = split_events(read_events(filename), session)
     
-    # Manipulate the table to get organized data
+    # Manipulate the tables to get organized data
     trimmed = {}
-    trimmed['raw'] = imported
     
-    # Trim based on the session
+    # Compute timings based on the session
     if session == '001':
 
-        # Extract necessary chunks of files
-        trainingEvents, testEvents, _ = trim_events(imported, session)
-        phaseEvents = trim_phases(imported, session)
-        
         # Compute timings and assign them to the final variable
         trimmed['training'] = extract_letters_timings(trainingEvents)
-        trimmed['test'] = extract_test_timings(testEvents)
-        completion = extract_phases_timings(phaseEvents)
+        trimmed['test'], trimmed['keypresses'] = extract_test_timings(testEvents)
 
     elif session == '002':
 
-        # Extract necessary chunks of files
-        trainingEvents, testEvents, refreshEvents = trim_events(imported, session)
-        phaseEvents = trim_phases(imported, session)
-
         # Compute timings and assign them to the final variable
         trimmed['refresh'] = extract_letters_timings(refreshEvents)
         trimmed['training'] = extract_training_timings(trainingEvents)
-        trimmed['test'] = extract_test_timings(testEvents)
-        completion = extract_phases_timings(phaseEvents)
+        trimmed['test'], trimmed['keypresses'] = extract_test_timings(testEvents)
 
     elif session in ['003', '004']:
 
-        # Extract necessary chunks of files
-        trainingEvents, testEvents, _ = trim_events(imported, session)
-        phaseEvents = trim_phases(imported, session)
-
         # Compute timings and assign them to the final variable
         trimmed['training'] = extract_training_timings(trainingEvents)
-        trimmed['test'] = extract_test_timings(testEvents)
-        completion = extract_phases_timings(phaseEvents)
+        trimmed['test'], trimmed['keypresses'] = extract_test_timings(testEvents)
+
+    completion = extract_phases_timings(phaseEvents)
     
     return trimmed, completion
 
 
 ### Subfunctions
 
-def trim_events(tableIn, session):
+# Read the log one line at the time and yield the typed events of interest:
+# - 'start': start of a part of the session (refresh, training, test)
+# - 'phase': markers of the phases, to compute their duration
+# - 'trial': events used to compute the timings of letters and words 
+#   (trial start, word on/off, answer, keydown, mouse)
+def read_events(filename):
+
+    # Start of the parts of the session
+    starts = ["refresh_text: autoDraw = null",
+              "train_text: autoDraw = null", 
+              "trainInstr_text: autoDraw = null",
+              "testInstr_text: autoDraw = null"]
+
+    # Phases markers
+    phases = ("refresh_text: autoDraw = true",
+              "train_text: autoDraw = true", 
+              "trainInstr_text: autoDraw = true",
+              "endTrain_text: autoDraw = true",
+              "end_text: autoDraw = true")
 
-    # Events of interest
-    events = ["dutch_letter: text", 
+    # Trial events, the starts of the parts are also kept with them
+    trials = ("dutch_letter: text", 
               "dutch_letter: autoDraw", 
               "dutch_word: text",
               "dutch_word: autoDraw = true", 
@@ -61,57 +67,87 @@ def trim_events(tableIn, session):
               "braille_word: autoDraw",
               "word_rsp: editable = true", 
               "Keydown:", "Mouse:", 
-              "refresh_text: autoDraw = null",
-              "train_text: autoDraw = null", 
-              "trainInstr_text: autoDraw = null",
-              "testInstr_text: autoDraw = null"]
+              *starts)
+
+    with open(filename, 'r', encoding = 'utf-8') as f:
+
+        for line in f:
+
+            # Each event is 'timing - level - description', separated by tabs.
+            # Lines that continue the text of a stimulus do not have all the fields
+            fields = line.rstrip('\n').split('\t', 2)
+
+            if len(fields) < 3:
+                continue
+
+            timing, _, description = fields
+
+            if description in starts:
+                yield 'start', float(timing), description
+
+            elif description.startswith(phases):
+                yield 'phase', float(timing), description
+
+            elif description.startswith(trials):
+                yield 'trial', float(timing), description
 
-    # Avoid import issues with NaNs, cast them as string
-    tableIn['Description'] = tableIn['Description'].apply(lambda x: str(x) if isinstance(x, float) else x)
 
-    # Trim events
-    trimmedEvents = tableIn[tableIn['Description'].str.startswith(tuple(events))][["Timing", "Description"]]
+# Go through the events and assign them to the part of the session they belong to.
+# Parts start at the first occurrence of their 'start' event and are expected in order:
+# (refresh, only in session 2) > training > test. 
+# The start of the test closes the training and is included in both
+def split_events(events, session):
+
+    # Which event starts which part
+    refreshStart = "refresh_text: autoDraw = null"
+    testStart = "testInstr_text: autoDraw = null"
 
-    # Split between training and test events, use indexes to find starts events of:
-    # - TRAining
-    # - TESt
-    # - REFresh
     if session == '001':
-        trainingStartIdx = trimmedEvents[trimmedEvents['Description'] == "train_text: autoDraw = null"].index[0]
+        trainingStart = "train_text: autoDraw = null"
     else:
-        trainingStartIdx = trimmedEvents[trimmedEvents['Description'] == "trainInstr_text: autoDraw = null"].index[0]
+        trainingStart = "trainInstr_text: autoDraw = null"
 
-    if session == '002':
-        refreshStartIdx = trimmedEvents[trimmedEvents['Description'] == "refresh_text: autoDraw = null"].index[0]
-        ref = trimmedEvents.loc[refreshStartIdx:trainingStartIdx-1]
-    else:
-        ref = None
+    # Events of each part, only those that come after the start of a part are kept
+    parts = {'refresh': [], 'training': [], 'test': []}
+    currentPart = None
 
-    testStartIdx = trimmedEvents[trimmedEvents['Description'] == "testInstr_text: autoDraw = null"].index[0]
+    # Only the last markers are needed to compute the duration of the phases
+    # The start of the test also marks the end of the break
+    phaseTimings = deque(maxlen = 5)
 
-    tra = trimmedEvents.loc[trainingStartIdx:testStartIdx]
-    tes = trimmedEvents.loc[testStartIdx:]
+    for kind, timing, description in events:
 
-    return tra, tes, ref
+        if kind == 'phase':
+            phaseTimings.append(timing)
+            continue
 
+        if kind == 'start':
 
-def trim_phases(tableIn, session):
+            if description == refreshStart and session == '002' and currentPart is None:
+                currentPart = 'refresh'
 
-    # Events of interest
-    events = ["refresh_text: autoDraw = true",
-              "train_text: autoDraw = true", 
-              "trainInstr_text: autoDraw = true",
-              "endTrain_text: autoDraw = true",
-              "testInstr_text: autoDraw = null",
-              "end_text: autoDraw = true"]
+            elif description == trainingStart and currentPart in [None, 'refresh']:
+                currentPart = 'training'
+
+            elif description == testStart and currentPart == 'training':
+                parts['training'].append((timing, description))
+                currentPart = 'test'
 
-    # Avoid import issues with NaNs, cast them as string
-    tableIn['Description'] = tableIn['Description'].apply(lambda x: str(x) if isinstance(x, float) else x)
+            if description == testStart:
+                phaseTimings.append(timing)
 
-    # Trim events
-    trimmedEvents = tableIn[tableIn['Description'].str.startswith(tuple(events))][["Timing", "Description"]]
+        if currentPart is not None:
+            parts[currentPart].append((timing, description))
 
-    return trimmedEvents
+    # Notify the user if the session is incomplete
+    if currentPart != 'test':
+        raise ValueError(f"Could not find the start of the training and of the test (session {session}) in the log file")
+
+    # Cast the events as tables
+    tra, tes, ref = [pd.DataFrame(parts[p], columns = ['Timing', 'Description']) for p in ['training', 'test', 'refresh']]
+    phases = pd.DataFrame({'Timing': list(phaseTimings)})
+
+    return tra, tes, ref, phases
 
 
 def extract_phases_timings(tableIn):
@@ -146,162 +182,152 @@ def extract_letters_timings(tableIn):
 
     tableIn = tableIn[tableIn['Description'].str.startswith("dutch")]
 
-    # Create new table to store timings
-    tableOut = pd.DataFrame(columns = ['letter', 'readingTime', 'checkingTime'])
-    idx = 0
-
-    # Move of steps by 3: events are sequential and identify 
+    # Events are sequential and identify 
     # - which letter is shown to the participant
     # - when the letter appears 
     # - when the letter disappears
-    for i in range(0, len(tableIn), 3):
-        
-        letterEvent = tableIn.iloc[i]['Description']
-        tableOut.loc[idx, 'letter'] = letterEvent[-1]
-        tableOut.loc[idx, 'readingTime'] = float(tableIn.iloc[i+1]['Timing']) - float(tableIn.iloc[i]['Timing'])
-        tableOut.loc[idx, 'checkingTime'] = float(tableIn.iloc[i+2]['Timing']) - float(tableIn.iloc[i+1]['Timing'])
-        idx += 1
+    # Reshape them into one row of three events per letter
+    description = tableIn['Description'].to_numpy(dtype = object).reshape(-1, 3)
+    timing = tableIn['Timing'].to_numpy(dtype = float).reshape(-1, 3)
+
+    # Compute all the timings at once
+    tableOut = pd.DataFrame({'letter': [letterEvent[-1] for letterEvent in description[:, 0]],
+                             'readingTime': timing[:, 1] - timing[:, 0],
+                             'checkingTime': timing[:, 2] - timing[:, 1]})
 
     return tableOut
 
 
 def extract_test_timings(tableIn):
 
-    # Initialize DataFrame to contain test timings
-    tableOut = pd.DataFrame(columns = ['word', 'readingTime', 'writingTime', 'breaks', 'check', 'attempts'])
-
-    # Extract order of events
-    # look for [t]est_word autodraw = tru[e]
-    appearenceIdx = tableIn[(tableIn['Description'].str.startswith('t')) & 
-                              (tableIn['Description'].str.endswith('e'))].index
-    
-    # Iterate over appearence events
-    for iEv, trialStart in enumerate(appearenceIdx):
-        
-        # Create a time window from one appearance to the next, to record events relative to one word
-        if iEv < len(appearenceIdx) - 1:
-            rangeEnd = appearenceIdx[iEv + 1]
-        else:
-            rangeEnd = tableIn.index[-1]
-
-        # Where does the word presentation end? 
-        # look for [t]est_word autodraw = nul[l]
-        wordEnd = tableIn.loc[trialStart:rangeEnd][tableIn['Description'].str.startswith('t') & 
-                                                   tableIn['Description'].str.endswith('l')].index.min()
-        
-        # Where does the answer stop?
-        # look for [M]ouse
-        mouseEvent = tableIn.loc[trialStart:rangeEnd][tableIn['Description'].str.startswith('M')].index.max()
-        
-        # Create a range of keypresses
-        keyRangeStart = wordEnd
-        keyRangeEnd = mouseEvent
-
-        # Which keys were pressed during the answer?
-        # look for [K]eyboard
-        keyPresses = tableIn.loc[keyRangeStart:keyRangeEnd][tableIn['Description'].str.startswith('K')]['Description'].tolist()
-        
-        # List of timings for each key pressed, to compute difference / uncertainty
-        keyTimings = tableIn.loc[keyRangeStart:keyRangeEnd]['Timing'].tolist()
-        
-        # Last key pressed (if any press at all), to have more accurate 'writing time'
-        lastKey = tableIn.loc[keyRangeStart:keyRangeEnd][tableIn['Description'].str.startswith('K')].index.max()
-        
-        # If there was a keypress, assign it as last event to calc writing time
-        if not np.isnan(lastKey):
-            
-            # Save key press
-            lastEvent = lastKey
-            checkTime = float(tableIn.loc[mouseEvent]['Timing']) - float(tableIn.loc[lastKey]['Timing'])
-            
-            # Calculate the time delta between key presses, to measure uncertainty or breaks
-            keyTimings = list(map(float, keyTimings))
-            keyDiff = [second - first for first, second in zip(keyTimings[:-1], keyTimings[1:])]
-            maxInterval = max(keyDiff)
-            
-        # Otherwise use mouse press
-        else:
-            lastEvent = mouseEvent
-            maxInterval = float(tableIn.loc[mouseEvent]['Timing']) - float(tableIn.loc[wordEnd]['Timing'])
-            checkTime = 0
-            
-
-        # Add data to the DataFrame
-        tableOut.loc[iEv, 'word'] = iEv
-        tableOut.loc[iEv, 'readingTime'] = float(tableIn.loc[wordEnd, 'Timing']) - float(tableIn.loc[trialStart, 'Timing'])
-        tableOut.loc[iEv, 'writingTime'] = float(tableIn.loc[lastEvent, 'Timing']) - float(tableIn.loc[wordEnd, 'Timing'])
-        tableOut.loc[iEv, 'breaks'] = maxInterval
-        tableOut.loc[iEv, 'check'] = checkTime
-        tableOut.loc[iEv, 'attempts'] = keyPresses
-
-    return tableOut
+    # Work on arrays: positions in the table replace the labels of the events
+    description = tableIn['Description'].to_numpy(dtype = object)
+    timing = tableIn['Timing'].to_numpy(dtype = float)
+    descSeries = pd.Series(description)
+
+    # Classify the events only once
+    # - [t]est_word autodraw = tru[e]: the word appears
+    # - [t]est_word autodraw = nul[l]: the word disappears
+    # - [M]ouse: the answer stops
+    # - [K]eyboard: keys pressed during the answer
+    startsWithT = descSeries.str.startswith('t').to_numpy()
+    appearencePos = np.flatnonzero(startsWithT & descSeries.str.endswith('e').to_numpy())
+    disappearencePos = np.flatnonzero(startsWithT & descSeries.str.endswith('l').to_numpy())
+    mousePos = np.flatnonzero(descSeries.str.startswith('M').to_numpy())
+    keyPos = np.flatnonzero(descSeries.str.startswith('K').to_numpy())
+
+    # No word was presented, return empty tables
+    if len(appearencePos) == 0:
+        return (pd.DataFrame(columns = ['word', 'readingTime', 'writingTime', 'breaks', 'check']), 
+                pd.DataFrame(columns = ['word', 'key', 'time']))
+
+    # Each trial goes from one appearance to the next (included), the last one to the end of the logs
+    rangeEnd = np.append(appearencePos[1:], len(description) - 1)
+
+    # Where does the word presentation end? First disappearance after the appearance
+    # (-1 if there is none)
+    wordEnd = np.append(disappearencePos, -1)[np.searchsorted(disappearencePos, appearencePos, side = 'left')]
+
+    # Where does the answer stop? Last mouse event in the trial (-1 if there is none)
+    mouseEvent = np.append(mousePos, -1)[np.searchsorted(mousePos, rangeEnd, side = 'right') - 1]
+
+    # Each trial needs both events: the word disappears in the trial and the answer stops after it
+    # (otherwise the events of another trial would be taken)
+    hasEnd = (wordEnd >= 0) & (wordEnd <= rangeEnd)
+    hasMouse = mouseEvent >= wordEnd
+
+    if not (hasEnd & hasMouse).all():
+        trial = np.flatnonzero(~(hasEnd & hasMouse))[0]
+        event = 'the word never disappears' if not hasEnd[trial] else 'the answer never stops (no mouse event)'
+        raise ValueError(f"Could not extract trial {trial + 1} of the test in the log file: {event}")
+
+    # Which keys were pressed during the answer, between the end of the word and the mouse event?
+    keyFirst = np.searchsorted(keyPos, wordEnd, side = 'left')
+    keyLast = np.searchsorted(keyPos, mouseEvent, side = 'right')
+    hasKey = keyLast > keyFirst
+
+    # Last key pressed (if any press at all), to have more accurate 'writing time'
+    # Otherwise use mouse press
+    lastKey = keyPos[np.maximum(keyLast - 1, 0)] if len(keyPos) else mouseEvent
+    lastEvent = np.where(hasKey, lastKey, mouseEvent)
+
+    # Largest time delta between successive events of the answer, to measure uncertainty or breaks
+    # Pad the differences so that the answer can end on the last event of the logs
+    eventDiff = np.append(np.diff(timing), 0)
+    maxInterval = np.maximum.reduceat(eventDiff, np.column_stack((wordEnd, mouseEvent)).ravel())[::2]
+
+    # Compute the timings of all the trials at once
+    readingTime = timing[wordEnd] - timing[appearencePos]
+    writingTime = timing[lastEvent] - timing[wordEnd]
+    breaks = np.where(hasKey, maxInterval, timing[mouseEvent] - timing[wordEnd])
+    checkTime = pd.Series(timing[mouseEvent] - timing[lastKey], dtype = object).where(hasKey, 0)
+
+    # Build the table in one go
+    tableOut = pd.DataFrame({'word': np.arange(len(appearencePos)),
+                             'readingTime': readingTime,
+                             'writingTime': writingTime,
+                             'breaks': breaks,
+                             'check': checkTime})
+
+    # Same keys, one row per key, with their time from the end of the word presentation
+    keyCounts = keyLast - keyFirst
+    keyTrial = np.repeat(np.arange(len(appearencePos)), keyCounts)
+    keyIdx = keyPos[np.repeat(keyFirst - np.cumsum(keyCounts) + keyCounts, keyCounts) + np.arange(keyCounts.sum())]
+
+    keysOut = pd.DataFrame({'word': keyTrial,
+                            'key': [keyEvent[len('Keydown: '):] for keyEvent in description[keyIdx]],
+                            'time': timing[keyIdx] - timing[wordEnd][keyTrial]})
+
+    return tableOut, keysOut
 
 
 
 def extract_training_timings(tableIn):
 
-    # Training set: initialize the log table
-    tableOut = pd.DataFrame(columns = ['word', 'readingTime', 'checkingTime', 'tested', 'writingTime'], 
-                            index=range(200))
+    # Work on arrays: positions in the table replace the labels of the events
+    description = tableIn['Description']
+    timing = tableIn['Timing'].to_numpy(dtype = float)
 
-    # Extract order of relevant events, to facilitate loop
-    textIdx = tableIn.index[tableIn['Description'].str.startswith("dutch_word: text")]
-    appearenceIdx = tableIn.index[tableIn['Description'] == "braille_word: autoDraw = true"]
-    disappearenceIdx = tableIn.index[tableIn['Description'] == "braille_word: autoDraw = null"]
-    solutionIdx = tableIn.index[tableIn['Description'] == "dutch_word: autoDraw = true"]
-    answerIdx = tableIn.index[tableIn['Description'] == "word_rsp: editable = true"]
+    # Extract order of relevant events
+    textPos = np.flatnonzero(description.str.startswith("dutch_word: text").to_numpy())
+    appearencePos = np.flatnonzero((description == "braille_word: autoDraw = true").to_numpy())
+    disappearencePos = np.flatnonzero((description == "braille_word: autoDraw = null").to_numpy())
+    solutionPos = np.flatnonzero((description == "dutch_word: autoDraw = true").to_numpy())
+    answerPos = np.flatnonzero((description == "word_rsp: editable = true").to_numpy())
 
     # text events represent number of the trials
-    for iTx in range(len(textIdx)):
-        
-        # Create a window in which to check for events. If it's the
-        # last iteration, window stops at the end of the logs
-        if iTx <= len(textIdx) - 2:
-            evWindow = tableIn.loc[textIdx[iTx]:textIdx[iTx + 1]]
-        else:
-            evWindow = tableIn.loc[textIdx[iTx]:tableIn.index[-1]]
-
-        # When does the word presentation start?
-        wordAppears = float(tableIn.loc[appearenceIdx[iTx], "Timing"])
-
-        # When is the solution displayed?
-        solutionAppears = float(tableIn.loc[solutionIdx[iTx], "Timing"])
-
-        # Where does the presentation end?
-        wordDisappears = float(tableIn.loc[disappearenceIdx[iTx], "Timing"])
-
-        # Which word was presented?
-        whichWord = tableIn.loc[textIdx[iTx], "Description"].split(' = ')[1]
-
-        # Does it require a written answer?
-        # i.e. is there an 'answer' event within the window we are processing
-        if present_in_events(answerIdx, evWindow):
-            
-            # Additional analysis: deal with "Keydown" events
-            # keys = recordKeyboardEvents(whichKeys)
-
-            # Add everything to the training log
-            tableOut.loc[iTx, "word"] = whichWord
-            tableOut.loc[iTx, "readingTime"] = None
-            tableOut.loc[iTx, "checkingTime"] = wordDisappears - solutionAppears
-            tableOut.loc[iTx, "tested"] = 1
-            tableOut.loc[iTx, "writingTime"] = solutionAppears - wordAppears
-
-        else:
-            # Add everything to the training log
-            tableOut.loc[iTx, "word"] = whichWord
-            tableOut.loc[iTx, "readingTime"] = solutionAppears - wordAppears
-            tableOut.loc[iTx, "checkingTime"] = wordDisappears - solutionAppears
-            tableOut.loc[iTx, "tested"] = 0
-            tableOut.loc[iTx, "writingTime"] = None
+    nTrials = len(textPos)
+
+    # When does the word presentation start?
+    wordAppears = timing[appearencePos[:nTrials]]
+
+    # When is the solution displayed?
+    solutionAppears = timing[solutionPos[:nTrials]]
+
+    # Where does the presentation end?
+    wordDisappears = timing[disappearencePos[:nTrials]]
+
+    # Which word was presented?
+    whichWord = description.iloc[textPos].str.split(' = ').str[1].tolist()
+
+    # Does it require a written answer?
+    # i.e. is there an 'answer' event within the window of the trial. 
+    # The window goes from one text event to the next, the last one stops at the end of the logs
+    windowEnds = np.append(textPos[1:], len(timing) - 1)
+    tested = present_in_events(answerPos, textPos, windowEnds)
+
+    # Tested words are written before seeing the solution, the others are read
+    tableOut = pd.DataFrame({'word': whichWord,
+                             'readingTime': np.where(tested, np.nan, solutionAppears - wordAppears),
+                             'checkingTime': wordDisappears - solutionAppears,
+                             'tested': tested.astype(int),
+                             'writingTime': np.where(tested, solutionAppears - wordAppears, np.nan)})
 
     return tableOut
 
 
 
-def present_in_events(listIn, boundaries):
-        
-    minIdx = min(boundaries.index)
-    maxIdx = max(boundaries.index)
-    
-    return any(minIdx <= num <= maxIdx for num in listIn)
+# For each window [start, end], check whether any of the (sorted) events falls inside it
+def present_in_events(listIn, windowStarts, windowEnds):
+
+    return np.searchsorted(listIn, windowEnds, side = 'right') > np.searchsorted(listIn, windowStarts, side = 'left')
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of the extracted data.
+
+The folder of the extracted data is read only once: each file is listed with the
+information in its name (BIDS-style):
+    sub-<ID>_ses-<ID>_task-<name>_script-<ID>_<beh-phase or phases-time>.csv
+i.e. subject, session, script, phase (training, test, refresh, keypresses, phases)
+and path (from outputs/derivatives/extracted-data).
+
+The index is saved next to the extracted data (VBT_extraction-index.csv) at the end of each
+extraction, and the tables for stats get their files from it instead of searching the folders.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import glob
+import pandas as pd
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+
+# Columns of the index
+INDEX_DTYPES = {'subject': str, 'session': str, 'script': str, 'phase': str, 'path': str}
+
+
+# List the extracted files and save the index
+def save_index(opt):
+
+    index = build_index(opt)
+
+    os.makedirs(opt['dir']['extracted'], exist_ok = True)
+    index.to_csv(get_index_path(opt), index = False)
+
+    return index
+
+
+# Load the index of the extracted files. If it was never saved, make it
+def load_index(opt):
+
+    if not os.path.exists(get_index_path(opt)):
+        return save_index(opt)
+
+    return read_table(opt, get_index_path(opt), list(INDEX_DTYPES.keys()), INDEX_DTYPES)
+
+
+# Organize the index by subject and session, in the order in which they were found:
+# {subID: {sesID: {'script': scriptID, <phase>: full path of the file}}}
+def get_sessions(opt, index):
+
+    sessions = {}
+
+    for subID, sesID, scriptID, phase, path in index[list(INDEX_DTYPES.keys())].itertuples(index = False):
+
+        entry = sessions.setdefault(subID, {}).setdefault(sesID, {'script': scriptID})
+        entry[phase] = os.path.join(opt['dir']['extracted'], path)
+
+    return sessions
+
+
+### Subfunctions
+
+# List the extracted files, with the information in their names.
+# Subjects and sessions are listed in the order of the folders
+def build_index(opt):
+
+    rows = []
+
+    for filename in glob.glob(os.path.join(opt['dir']['extracted'], 'sub-*', 'ses-*', 'sub-*.csv')):
+
+        # sub-<ID>_ses-<ID>_task-<name>_script-<ID>_<beh-phase or phases-time>.csv
+        nameParcels = os.path.basename(filename)[:-4].split('_')
+
+        rows.append({'subject': nameParcels[0].split('-')[1],
+                     'session': nameParcels[1].split('-')[1],
+                     'script': nameParcels[3].split('-')[1],
+                     'phase': nameParcels[4].split('-')[1] if nameParcels[4].startswith('beh') else 'phases',
+                     'path': os.path.relpath(filename, opt['dir']['extracted'])})
+
+    return pd.DataFrame(rows, columns = list(INDEX_DTYPES.keys()))
+
+
+def get_index_path(opt):
+
+    return os.path.join(opt['dir']['extracted'], 'VBT_extraction-index.csv')
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact encoding of the keys pressed during the test.
+
+Instead of writing the keys of each trial as a list inside the tables, all the
+keys are stored in three flat arrays:
+    - codes: position of each key in the vocabulary of key names
+    - times: time of each key from the end of the word presentation
+    - offsets: the keys of trial i go from offsets[i] to offsets[i+1]
+Trial i is row i of VBT_stimuli-test_desc-behavioural-results.csv.
+
+Arrays are saved as .npy files in outputs/derivatives/stats/datasets/VBT_stimuli-test_desc-keypresses/
+and loaded without copying them in memory (memory-mapped).
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+
+
+# Encode the keys of each trial of the test table.
+# - test: table with 'subject', 'session' and 'trial' columns
+# - keypresses: table with one key per row and the same 'subject', 'session' and 'trial' columns
+# Returns a dictionary with codes, times, offsets and vocabulary
+def encode_keypresses(test, keypresses):
+
+    # Find the row of the test table to which each key belongs,
+    # keys of trials not in the table (e.g. outliers) are dropped
+    trials = pd.MultiIndex.from_frame(test[['subject', 'session', 'trial']])
+    rows = trials.get_indexer(pd.MultiIndex.from_frame(keypresses[['subject', 'session', 'trial']]))
+
+    keep = rows >= 0
+    rows = rows[keep]
+
+    # Order keys by trial, keeping the order in which they were pressed
+    order = np.argsort(rows, kind = 'stable')
+    rows = rows[order]
+    keys = keypresses['key'].to_numpy(dtype = str)[keep][order]
+    times = keypresses['time'].to_numpy(dtype = np.float64)[keep][order]
+
+    # Each key name becomes its position in the vocabulary
+    vocabulary, codes = np.unique(keys, return_inverse = True)
+
+    # Where the keys of each trial start and end
+    offsets = np.zeros(len(test) + 1, dtype = np.int64)
+    offsets[1:] = np.cumsum(np.bincount(rows, minlength = len(test)))
+
+    return {'codes': codes.astype(np.uint16),
+            'times': times,
+            'offsets': offsets,
+            'vocabulary': vocabulary.tolist()}
+
+
+# Save the encoded keys in the stats/datasets folder
+def save_keypresses(opt, keypresses):
+
+    outputDir = get_keypresses_path(opt)
+    os.makedirs(outputDir, exist_ok = True)
+
+    for array in ['codes', 'times', 'offsets']:
+        np.save(os.path.join(outputDir, f'{array}.npy'), keypresses[array])
+
+    with open(os.path.join(outputDir, 'vocabulary.json'), 'w') as f:
+        json.dump(keypresses['vocabulary'], f, ensure_ascii = False)
+
+
+# Load the encoded keys. Arrays are memory-mapped: only the trials accessed are read
+def load_keypresses(opt):
+
+    inputDir = get_keypresses_path(opt)
+
+    keypresses = {array: np.load(os.path.join(inputDir, f'{array}.npy'), mmap_mode = 'r')
+                  for array in ['codes', 'times', 'offsets']}
+
+    with open(os.path.join(inputDir, 'vocabulary.json'), 'r') as f:
+        keypresses['vocabulary'] = np.array(json.load(f), dtype = object)
+
+    return keypresses
+
+
+# Get the keys pressed in one trial (row of the test table): names and times
+def get_trial_keypresses(keypresses, iTrial):
+
+    start, end = keypresses['offsets'][iTrial], keypresses['offsets'][iTrial + 1]
+    vocabulary = np.asarray(keypresses['vocabulary'], dtype = object)
+
+    return vocabulary[keypresses['codes'][start:end]].tolist(), np.asarray(keypresses['times'][start:end])
+
+
+# Get the number of keys pressed in each trial
+def get_keypresses_counts(keypresses):
+
+    return np.diff(keypresses['offsets'])
+
+
+### Subfunctions
+
+def get_keypresses_path(opt):
+
+    return os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-keypresses')
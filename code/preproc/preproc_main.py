@@ -16,40 +16,75 @@ From raw data for results (.csv) and timings (.log), will extract:
 @author: Filippo Cerpelloni
 """
 
+import os
+import sys
+import argparse
 from preproc_option import preproc_option
 from preproc_extract import preproc_extract
 from make_accuracy_timing import *
 from make_stimuli_statistics import *
+from make_phases_statistics import *
 
-# Get options
-opt = preproc_option()
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from profiling import start_profile, profile
 
+# Guard the script: the parallel extraction starts new processes that import this file
+if __name__ == '__main__':
 
-### Clean tables for each individual subject / session
+    # Command line: 
+    # --force re-extracts all the files, even if they did not change
+    # --root runs the pipeline on another copy of the project folders (e.g. a synthetic dataset)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--force', action = 'store_true', help = 'ignore the manifest and extract all the raw files')
+    parser.add_argument('--root', default = None, help = 'folder with inputs and outputs/derivatives to use instead of the project')
+    args, _ = parser.parse_known_args()
 
-# Extract data from raw
-# For each subject, extract data from the four different days of training
-# - import each CSV and extract responses
-# - import log file and extract timings
-# - save relevant files in /outputs/extracted_data/subID
-preproc_extract(opt)
+    # Get options
+    opt = preproc_option(args.root)
+    opt['cache']['force'] = opt['cache']['force'] or args.force
 
+    # Measure each stage, if profiling is enabled in the options
+    start_profile(opt, 'preproc_main')
 
-### Create tables for analyses
 
-## Summarize accuracy and timing
-# for each subject, save accuracies (test and training) and timings (reading, checking, writing) 
-# as a summary in: outputs/derivatives/summary/VBT_summary_results-accuracies-timings.csv
-make_accuracy_timing(opt)
+    ### Clean tables for each individual subject / session
 
+    # Extract data from raw
+    # For each subject, extract data from the four different days of training
+    # - import each CSV and extract responses
+    # - import log file and extract timings
+    # - save relevant files in /outputs/extracted_data/subID
+    # In fused mode, the extracted tables are also kept in memory for the summaries
+    with profile('preproc_extract'):
+        tables, errors = preproc_extract(opt)
 
-## Extract statistics of stimuli presented
-# If not prsent, load the statistics of stimuli (from DLP2, and SUBTLEX) and 
-# merge it with the stimuli used in the experiment
-# Then, create tables for each important statistic (full list inside the function)
-make_stimuli_statistics(opt)
+    # Summaries are not made without the pairs that could not be extracted
+    if errors:
+        sys.exit(f"\nStopped: {len(errors)} files could not be extracted (see above). "
+                 "Fix them and run again, only the missing files will be extracted")
 
 
-## Extract statistics of completion time for each phase
-make_phases_statistics(opt)
+    ### Create tables for analyses
 
+    # In fused mode, all the summaries take the tables handed over by the extraction,
+    # without reading the extracted files again
+
+    ## Summarize accuracy and timing
+    # for each subject, save accuracies (test and training) and timings (reading, checking, writing) 
+    # as a summary in: outputs/derivatives/summary/VBT_summary_results-accuracies-timings.csv
+    with profile('make_accuracy_timing'):
+        make_accuracy_timing(opt, tables)
+
+
+    ## Extract statistics of stimuli presented
+    # If not prsent, load the statistics of stimuli (from DLP2, and SUBTLEX) and 
+    # merge it with the stimuli used in the experiment
+    # Then, create tables for each important statistic (full list inside the function)
+    with profile('make_stimuli_statistics'):
+        make_stimuli_statistics(opt, tables)
+
+
+    ## Extract statistics of completion time for each phase
+    with profile('make_phases_statistics'):
+        make_phases_statistics(opt, tables)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifest of the extracted data, to avoid re-extracting the csv/log pairs that
+did not change since the last run.
+
+For each pair, the manifest stores size, modification time and content hash of
+the raw files, the version of the extraction code (and of the reader) and the files that were saved.
+A pair is reused if its raw files and the extraction code are the same and all
+its outputs are still present.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import json
+import hashlib
+
+# Files that define how raw data are extracted (from this folder): changing any of them invalidates the manifest.
+# The parser used to read the raw files (opt['reader']['engine']) is part of the version too
+EXTRACTION_CODE = ['preproc_extract.py', 'preproc_extract_csv.py', 'preproc_extract_log.py', 'preproc_merge_and_save.py',
+                   os.path.join('..', 'lib', 'read_tables.py')]
+
+
+# Load the manifest of the previous extraction, if present
+def load_manifest(opt):
+
+    manifestPath = get_manifest_path(opt)
+
+    if not os.path.exists(manifestPath):
+        return {'codeVersion': None, 'files': {}}
+
+    with open(manifestPath, 'r') as f:
+        return json.load(f)
+
+
+# Save the manifest next to the extracted data
+def save_manifest(opt, manifest):
+
+    os.makedirs(opt['dir']['extracted'], exist_ok = True)
+
+    with open(get_manifest_path(opt), 'w') as f:
+        json.dump(manifest, f, indent = 2, sort_keys = True)
+
+
+# Sort the pairs between those that can be reused and those to extract.
+# Returns the pairs to extract, the reused ones and the new entries of the pairs to extract
+def check_manifest(opt, manifest, pairs):
+
+    codeVersion = get_code_version(opt)
+    force = opt.get('cache', {}).get('force', False)
+
+    toExtract = []
+    reused = []
+    entries = {}
+
+    for pair in pairs:
+
+        _, currentCsv, currentLog, _ = pair
+        key = get_manifest_key(opt, currentCsv)
+        previous = manifest['files'].get(key)
+
+        # Same extraction code and all the outputs still there: the raw files decide
+        if not force and previous is not None and manifest['codeVersion'] == codeVersion \
+            and all(os.path.exists(os.path.join(opt['dir']['extracted'], o)) for o in previous['outputs']):
+
+            # Quick check: size and modification time did not change
+            if same_stats(previous['csv'], currentCsv) and same_stats(previous['log'], currentLog):
+                reused.append(pair)
+                continue
+
+            # Otherwise look at the content, the file may only have been touched
+            entry = {'csv': get_fingerprint(currentCsv), 'log': get_fingerprint(currentLog)}
+
+            if entry['csv']['hash'] == previous['csv']['hash'] and entry['log']['hash'] == previous['log']['hash']:
+                previous.update(entry)
+                reused.append(pair)
+                continue
+
+        else:
+            entry = {'csv': get_fingerprint(currentCsv), 'log': get_fingerprint(currentLog)}
+
+        entries[key] = entry
+        toExtract.append(pair)
+
+    # If the code changed, the entries of the old version are not valid anymore
+    if manifest['codeVersion'] != codeVersion:
+        manifest['codeVersion'] = codeVersion
+        manifest['files'] = {}
+
+    return toExtract, reused, entries
+
+
+# Add a newly extracted pair to the manifest
+def update_manifest(opt, manifest, entries, currentCsv, outputs):
+
+    key = get_manifest_key(opt, currentCsv)
+
+    entry = entries[key]
+    entry['outputs'] = [os.path.relpath(o, opt['dir']['extracted']) for o in outputs]
+
+    manifest['files'][key] = entry
+
+
+# Notify the user about what was reused and what was extracted again
+def report_manifest(opt, reused, extracted):
+
+    print(f"\n\nReused {len(reused)} files from the previous extraction, extracted {len(extracted)} files")
+
+    if opt['verbosity'] > 1:
+        for _, currentCsv, _, _ in extracted:
+            print(f"- extracted {os.path.basename(currentCsv)}")
+
+
+### Subfunctions
+
+def get_manifest_path(opt):
+
+    return os.path.join(opt['dir']['extracted'], 'VBT_extraction-manifest.json')
+
+
+# Files are identified by their path in the inputs folder, i.e. 'br_day1/sub-..._script-BR_....csv'
+def get_manifest_key(opt, filename):
+
+    return os.path.relpath(filename, opt['dir']['input'])
+
+
+# Hash of the extraction code and of the parser of the raw files
+def get_code_version(opt):
+
+    codeHash = hashlib.sha256()
+
+    for codeFile in EXTRACTION_CODE:
+        with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), codeFile), 'rb') as f:
+            codeHash.update(f.read())
+
+    codeHash.update(opt.get('reader', {}).get('engine', 'c').encode())
+
+    return codeHash.hexdigest()
+
+
+# Size, modification time and content hash of a file
+def get_fingerprint(filename):
+
+    fileHash = hashlib.sha256()
+
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            fileHash.update(chunk)
+
+    stats = os.stat(filename)
+
+    return {'size': stats.st_size, 'mtime': stats.st_mtime, 'hash': fileHash.hexdigest()}
+
+
+def same_stats(fingerprint, filename):
+
+    stats = os.stat(filename)
+
+    return fingerprint['size'] == stats.st_size and fingerprint['mtime'] == stats.st_mtime
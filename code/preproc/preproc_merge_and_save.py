@@ -1,10 +1,12 @@
 import os
 import pandas as pd
 
-def preproc_merge_and_save(opt, trimmedCsv, trimmedLog, completionTime, subInfo):
+def preproc_merge_and_save(opt, trimmedCsv, trimmedLog, completionTime, subInfo, writer = None):
     # SAVE FILES
     # - save each file as a .csv
     # - add current sub's data to the subResults structure
+    # - if a writer is given (see preproc_extract), files are saved in the background
+    # Returns the files saved and the merged tables, by phase
 
     # Merge files: accuracy and then timing
     trainingTable = pd.concat([trimmedCsv['training'], trimmedLog['training']], axis = 1)
@@ -22,20 +24,42 @@ def preproc_merge_and_save(opt, trimmedCsv, trimmedLog, completionTime, subInfo)
     outputDir = os.path.join(opt['dir']['extracted'], subName, sesName)
     os.makedirs(outputDir, exist_ok = True)
 
+    # Keep track of the files saved and of the tables
+    outputs = []
+    tables = {}
+
     # Save tables as csv
-    trainingTable.to_csv(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-training.csv"), 
-                          index = False)
-    testTable.to_csv(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-test.csv"), 
-                      index = False)
-    
+    outputs.append(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-training.csv"))
+    tables['training'] = save_table(trainingTable, outputs[-1], writer)
+
+    outputs.append(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-test.csv"))
+    tables['test'] = save_table(testTable, outputs[-1], writer)
+
     completion = pd.DataFrame(completionTime)
-    completion.to_csv(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_phases-time.csv"), 
-                      index = False)
-    
+    outputs.append(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_phases-time.csv"))
+    tables['phases'] = save_table(completion, outputs[-1], writer)
+
+
+    # Save the keys pressed during the test, one per row
+    if 'keypresses' in trimmedLog:
+        outputs.append(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-keypresses.csv"))
+        tables['keypresses'] = save_table(trimmedLog['keypresses'], outputs[-1], writer)
 
     # Save refresh table, if present
     if subInfo['sesID'] == '002':
-        refreshTable.to_csv(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-refresh.csv"), 
-                             index = False)
-    
-    return 
+        outputs.append(os.path.join(outputDir, f"{subName}_{sesName}_task-{opt['taskName']}_{scriptName}_beh-refresh.csv"))
+        tables['refresh'] = save_table(refreshTable, outputs[-1], writer)
+
+    return outputs, tables
+
+
+# Save a table as csv, now or in the background if a writer is given.
+# The table must not be changed after: it is returned to be used (as copy) in memory
+def save_table(table, filename, writer = None):
+
+    if writer is None:
+        table.to_csv(filename, index = False)
+    else:
+        writer['pending'].append(writer['pool'].submit(table.to_csv, filename, index = False))
+
+    return table
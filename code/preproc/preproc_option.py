@@ -1,6 +1,6 @@
 import os
 
-def preproc_option():
+def preproc_option(root = None):
 
     # Initialize options dictionary
     opt = {}
@@ -13,8 +13,9 @@ def preproc_option():
     
     # PATHS
     # The directory where the data are located
+    # root can point to another copy of the project folders (e.g. a synthetic dataset, see make_synthetic_dataset.py)
     opt['dir'] = {}
-    opt['dir']['root'] = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
+    opt['dir']['root'] = root or os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..')
     opt['dir']['raw'] = os.path.join(opt['dir']['root'], 'inputs')
     opt['dir']['derivatives'] = os.path.join(opt['dir']['root'], 'outputs', 'derivatives')
     opt['dir']['extracted'] = os.path.join(opt['dir']['root'], 'outputs', 'derivatives', 'extracted-data')
@@ -29,6 +30,64 @@ def preproc_option():
     opt['pipeline'] = {}
     opt['pipeline']['type'] = 'cleaning'
     
+    # PARALLEL EXTRACTION
+    # Number of processes used to extract the csv/log pairs of each subject.
+    # 1 keeps the serial extraction, None uses all the available cores
+    opt['parallel'] = {}
+    opt['parallel']['nWorkers'] = 1
+    
+    # Number of processes used to score the unique test responses (make_stimuli_statistics)
+    opt['parallel']['nScoring'] = 1
+    
+    # INCREMENTAL EXTRACTION
+    # Pairs of raw files that did not change since the last extraction are not extracted again
+    # (see the manifest in the extracted-data folder). Force re-extracts everything
+    opt['cache'] = {}
+    opt['cache']['force'] = False
+    
+    # COLUMNAR STORE
+    # Save all the extracted trials in one columnar store ('parquet' or 'feather', requires pyarrow)
+    # and use it to make the summary tables instead of reading each csv file
+    opt['store'] = {}
+    opt['store']['use'] = False
+    opt['store']['format'] = 'parquet'
+    
+    # FUSED SUMMARY
+    # Keep the extracted tables in memory and share them between the three summaries
+    # (accuracy and timing, stimuli, phases), instead of reading them again for each one.
+    # Tables of the files extracted in the run are handed over directly, the others are read once
+    opt['fused'] = {}
+    opt['fused']['use'] = False
+    
+    # CSV READER
+    # Parser used to read the csv files ('c' or 'pyarrow', requires pyarrow).
+    # Both read the decimals exactly as they were saved, so they give the same outputs.
+    # Report prints size and parsing time of each file read
+    opt['reader'] = {}
+    opt['reader']['engine'] = 'c'
+    opt['reader']['report'] = False
+    
+    # OUTLIERS
+    # Rules to exclude outlier trials (see preproc_outliers.py). Each rule is a list of conditions
+    # (column, operator, value): trials that meet all the conditions of a rule are excluded.
+    # - summary: trials of all the phases, averaged in the accuracy and timing summary
+    # - training, test: words trained and tested, in the statistics of the stimuli
+    opt['outliers'] = {}
+    opt['outliers']['summary'] = {'train-reading-over-60s': [('phase', '==', 'train'), ('readingTime', '>', 60)],
+                                  'test-no-key-under-1s': [('phase', '==', 'test'), ('check', '==', 0), ('writingTime', '<', 1)],
+                                  'test-no-key-over-30s': [('phase', '==', 'test'), ('check', '==', 0), ('writingTime', '>', 30)],
+                                  'test-breaks-over-30s': [('phase', '==', 'test'), ('breaks', '>', 30)],
+                                  'test-writing-over-60s': [('phase', '==', 'test'), ('writingTime', '>', 60)]}
+    opt['outliers']['training'] = {'reading-over-60s': [('readingTime', '>', 60)]}
+    opt['outliers']['test'] = {'writing-over-30s': [('writingTime', '>', 30)]}
+    
+    # PROFILING
+    # Record time, rows, files read and written and peak memory of each stage (and of each subject).
+    # At the end of the run, the profile is saved as json in the output folder and summarized in a table
+    opt['profile'] = {}
+    opt['profile']['use'] = False
+    opt['profile']['output'] = os.path.join(opt['dir']['derivatives'], 'profiles')
+    
     # ASSIGN SUBJECTS AND SCRIPTS
     # Load from participants.tsv 
     with open(os.path.join(opt['dir']['raw'], 'participants.tsv'), 'r') as f:
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exclude outlier trials following the rules declared in the options (opt['outliers']).
+
+A set of rules is a dictionary of named rules, each one a list of conditions on the
+columns of the trials (column, operator, value), e.g.
+    {'test-breaks-over-30s': [('phase', '==', 'test'), ('breaks', '>', 30)]}
+A trial is excluded by a rule if it meets all its conditions, and excluded from the
+table if at least one rule excludes it. Missing values never meet a condition.
+
+Rules are evaluated on the whole table at once, as masks over the columns.
+Next to the trials left, exclude_outliers returns a report: how many trials each rule excluded.
+
+@author: Filippo Cerpelloni
+"""
+
+import operator
+import numpy as np
+import pandas as pd
+
+# Operators that can be used in the conditions
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             '==': operator.eq, '!=': operator.ne}
+
+
+# Exclude the trials of the table that meet at least one of the rules.
+# Returns the trials left and the report of the exclusion
+def exclude_outliers(table, rules):
+
+    masks = get_rule_masks(table, rules)
+    excluded = np.logical_or.reduce(list(masks.values())) if masks else np.zeros(len(table), dtype = bool)
+
+    report = make_report(masks, excluded)
+
+    return table[~excluded], report
+
+
+# Columns needed to evaluate a set of rules
+def get_rule_columns(rules):
+
+    columns = []
+
+    for conditions in rules.values():
+        columns += [col for col, _, _ in conditions if col not in columns]
+
+    return columns
+
+
+### Subfunctions
+
+# For each rule, which trials of the table meet all its conditions
+def get_rule_masks(table, rules):
+
+    masks = {}
+
+    for name, conditions in rules.items():
+
+        mask = np.ones(len(table), dtype = bool)
+
+        for col, op, value in conditions:
+
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator '{op}' in outlier rule '{name}'")
+
+            # Missing values (e.g. no writing time) are never outliers
+            mask &= OPERATORS[op](table[col], value).to_numpy(dtype = bool, na_value = False)
+
+        masks[name] = mask
+
+    return masks
+
+
+# Number and percentage of trials excluded by each rule, and by all of them together.
+# A trial can be excluded by more than one rule
+def make_report(masks, excluded):
+
+    nTrials = len(excluded)
+    names = list(masks.keys()) + ['all rules']
+    counts = [int(mask.sum()) for mask in masks.values()] + [int(excluded.sum())]
+
+    return pd.DataFrame({'rule': names,
+                         'excluded': counts,
+                         'percentage': [100 * count / nTrials if nTrials else 0.0 for count in counts],
+                         'trials': nTrials})
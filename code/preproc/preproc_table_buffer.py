@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append buffer for the tables built subject by subject.
+
+Adding each subject to a table with pd.concat copies the whole table every time.
+The buffer keeps instead the pieces of the table, as they come:
+    - init_buffer: new buffer, with the columns the table starts with (if any)
+    - append_to_buffer: add one piece (a table with some or all the columns)
+    - finalize_buffer: make the table, concatenating all the pieces only once
+Columns follow the ones given at the start, then the new ones in the order
+in which they appear in the pieces, as concatenating piece by piece would do.
+
+@author: Filippo Cerpelloni
+"""
+
+import pandas as pd
+
+
+# Make a new buffer, for a table that starts with the given columns
+def init_buffer(columns = None):
+
+    return {'columns': list(columns or []), 'pieces': [], 'rows': 0}
+
+
+# Add a piece of the table to the buffer
+def append_to_buffer(buffer, table):
+
+    # Empty pieces would only change the types of the columns
+    if len(table) == 0:
+        return buffer
+
+    buffer['pieces'].append(table)
+    buffer['rows'] += len(table)
+
+    return buffer
+
+
+# Concatenate all the pieces of the buffer in one table
+def finalize_buffer(buffer):
+
+    if not buffer['pieces']:
+        return pd.DataFrame(columns = buffer['columns'])
+
+    table = pd.concat(buffer['pieces'], ignore_index = True)
+
+    # Columns given at the start go first, even if no piece has them
+    columns = buffer['columns'] + [col for col in table.columns if col not in buffer['columns']]
+
+    return table.reindex(columns = columns)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Score the test responses against their targets, all at once.
+
+Each response is compared to the correct answer:
+- distance: Levenshtein distance, divided by the length of the target
+- mistakes: which letters of the target were omitted ('.') or mistaken for another,
+  as 'target-response' separated by '_' (e.g. 'a-e_n-.'), [] for correct answers
+
+The same (response, target) pairs come back many times (same words, same mistakes,
+skipped answers), so each pair is scored only once and its results are given back
+to all the trials with it. The unique pairs can be split across processes.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import Levenshtein as lev
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Score all the responses at once.
+# - nWorkers: processes used to score the unique pairs (1 keeps everything in this process,
+#   None uses all the available cores)
+# Returns the responses as compared (see adjust_responses), distances and mistakes
+def score_test_responses(responses, targets, nWorkers = 1):
+
+    responses = adjust_responses(responses)
+
+    # Each (response, target) pair once, and where each trial finds its pair
+    pairCodes, pairs = get_unique_pairs(responses, targets)
+
+    if nWorkers == 1 or len(pairs) < 2:
+        scores = score_pairs(pairs)
+
+    else:
+        scores = score_pairs_parallel(pairs, nWorkers)
+
+    # Give the results back to each trial
+    distances = np.array(scores[0], dtype = float)[pairCodes]
+    mistakes = np.empty(len(pairs), dtype = object)
+    mistakes[:] = scores[1]
+
+    return responses, distances, mistakes[pairCodes]
+
+
+# Each (response, target) pair once, in order of appearance.
+# Returns the position of each trial's pair and the list of pairs
+def get_unique_pairs(responses, targets):
+
+    responseCodes, uniqueResponses = pd.factorize(responses)
+    targetCodes, uniqueTargets = pd.factorize(targets)
+    nTargets = max(len(uniqueTargets), 1)
+
+    pairCodes, uniquePairs = pd.factorize(responseCodes * nTargets + targetCodes)
+    pairs = list(zip(uniqueResponses[uniquePairs // nTargets], uniqueTargets[uniquePairs % nTargets]))
+
+    return pairCodes, pairs
+
+
+# Fix the responses to compare them to the targets:
+# - empty responses become '.'
+# - only lower-case letters
+def adjust_responses(responses):
+
+    return responses.where(responses.notna(), '.').astype(str).str.lower()
+
+
+### Subfunctions
+
+# Distance and mistakes of each (response, target) pair
+def score_pairs(pairs):
+
+    distances = []
+    mistakes = []
+
+    for response, target in pairs:
+
+        # Calculate Levensthein distance between two strings
+        # (number of changes to go from one to the other)
+        distance = lev.distance(response, target)
+
+        # In case the strings don't match, have a look at why
+        if distance > 0:
+            mistake = assess_mistakes(response, target)
+
+        else:
+            mistake = []
+
+        distances.append(distance/len(target))
+        mistakes.append(mistake)
+
+    return distances, mistakes
+
+
+# Score the pairs in blocks, one per process, and put the blocks back in order
+def score_pairs_parallel(pairs, nWorkers):
+
+    nBlocks = min(nWorkers or os.cpu_count(), len(pairs))
+    blocks = [pairs[i::nBlocks] for i in range(nBlocks)]
+
+    with ProcessPoolExecutor(max_workers = nBlocks) as pool:
+        results = list(pool.map(score_pairs, blocks))
+
+    distances = [None] * len(pairs)
+    mistakes = [None] * len(pairs)
+
+    for i, (blockDistances, blockMistakes) in enumerate(results):
+        distances[i::nBlocks] = blockDistances
+        mistakes[i::nBlocks] = blockMistakes
+
+    return distances, mistakes
+
+
+# Assess which mistakes were made in the response
+def assess_mistakes(re, ta):
+
+    mi = ''
+
+    # If the first character of the response is not equal to the target and
+    # it's not a '.', assume that the participant did not follow the instructions
+    # to mark the skipped letters and do it yourself
+    if not (re[0] == ta[0] or re[0] == '.') or len(re) > len(ta) :
+
+        # Ask for manual check
+        return 'Requires manual assessment'
+
+    # take the difference in length between strings and add dots to match lengths
+    if len(re) < len(ta):
+
+        # compute number of dots to add
+        nbDots = len(ta) - len(re)
+
+        # add at the end of the string
+        re = re + '.'*nbDots
+
+    # Asess errors
+    for iLet in range(0, len(re)):
+
+        # If the letter in response is different from target, store it with the
+        # corresponding target
+        if not re[iLet] == ta[iLet]:
+            mi = mi + ta[iLet] + '-' + re[iLet] + '_'
+
+    mi = mi[:-1]
+
+    return mi
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar store of all the extracted trials.
+
+Instead of reading hundreds of small csv files, the summary tables can load
+every trial of a phase (training, test, refresh, keypresses, phases) and session at once
+from a single columnar file (Parquet or Feather), saved in
+outputs/derivatives/extracted-data/VBT_trials/phase-<phase>/session-<ses>/
+
+Each file holds the trials of all the subjects, with extra 'subject', 'session'
+and 'script' columns. Loading can select only some columns.
+
+The extracted csv files can also be read once and kept in memory in the same form
+(load_extracted_tables), to be shared by the tables for stats.
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import glob
+import pandas as pd
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table, DTYPES
+from preproc_index import load_index
+
+# Phases whose files can be empty (no key pressed in a session): their subjects can be missing from the store
+EMPTY_PHASES = ['keypresses']
+
+
+# Build the store from the extracted csv files
+def save_trial_store(opt):
+
+    # Notify the user
+    print("\n\nSaving all the trials in the columnar store")
+
+    # Collect the tables of each phase and session
+    tables = {}
+
+    # Files come from the index of the extracted data, in order
+    index = load_index(opt).sort_values('path', kind = 'stable')
+
+    for subID, sesID, scriptID, phase, path in index[['subject', 'session', 'script', 'phase', 'path']].itertuples(index = False):
+
+        filename = os.path.join(opt['dir']['extracted'], path)
+        table = read_table(opt, filename, dtypes = DTYPES[phase])
+
+        # Empty files (e.g. no key pressed) add no trials, 
+        # and their untyped columns would turn numbers into text
+        if table.empty:
+            continue
+
+        table.insert(0, 'subject', subID)
+        table.insert(1, 'session', sesID)
+        table.insert(2, 'script', scriptID)
+
+        tables.setdefault((phase, sesID), []).append(table)
+
+    # Save one file for each phase and session
+    for (phase, sesID), phaseTables in tables.items():
+
+        table = pd.concat(phaseTables, ignore_index = True)
+
+        # Columnar formats need one type per column:
+        # values of text columns (e.g. responses made only of numbers in some files) are all cast as text
+        for col in table.columns[table.dtypes == object]:
+            table[col] = table[col].map(lambda x: x if pd.isna(x) else str(x))
+
+        outputDir = get_store_path(opt, phase, sesID)
+        os.makedirs(outputDir, exist_ok = True)
+
+        if opt['store']['format'] == 'feather':
+            table.to_feather(os.path.join(outputDir, 'trials.feather'))
+        else:
+            table.to_parquet(os.path.join(outputDir, 'trials.parquet'), index = False)
+
+    print(f"Trials saved in: {os.path.join(opt['dir']['extracted'], 'VBT_trials')}")
+
+
+# Is there a store in the format asked in the options? 
+# (a store in the other format, or no store at all, has to be made)
+def has_trial_store(opt):
+
+    phaseDirs = glob.glob(os.path.join(opt['dir']['extracted'], 'VBT_trials', 'phase-*', 'session-*'))
+
+    return bool(phaseDirs) and all(os.path.exists(os.path.join(phaseDir, get_store_filename(opt))) for phaseDir in phaseDirs)
+
+
+# Load the trials of the given phases from the store.
+# - columns: only read these columns (subject, session and script are always read)
+# Returns a dictionary {(phase, session): {subject: table}}, tables are the same as
+# the ones in the extracted csv files
+def load_trial_store(opt, phases, columns = None):
+
+    store = {}
+
+    for phase in phases:
+
+        # Sessions present for this phase
+        phaseDirs = sorted(glob.glob(os.path.join(opt['dir']['extracted'], 'VBT_trials', f'phase-{phase}', 'session-*')))
+
+        for phaseDir in phaseDirs:
+
+            sesID = phaseDir.split('session-')[-1]
+            table = read_store_file(opt, phaseDir, columns)
+
+            # Split the trials by subject, as if they came from the individual files
+            store[(phase, sesID)] = {subID: subTable.drop(columns = ['subject', 'session', 'script']).reset_index(drop = True)
+                                     for subID, subTable in table.groupby('subject', sort = False)}
+
+    return store
+
+
+# Read each extracted file once and keep it in memory, organized as a loaded store.
+# Tables are the same as the ones read from the csv files (all the columns),
+# and can be shared by all the tables for stats (see fused mode in preproc_option)
+# - store: tables already in memory (e.g. handed over by the extraction), not read again
+def load_extracted_tables(opt, phases = None, store = None):
+
+    store = {} if store is None else store
+
+    for subID, sesID, phase, path in load_index(opt)[['subject', 'session', 'phase', 'path']].itertuples(index = False):
+
+        if (phases is not None and phase not in phases) or subID in store.get((phase, sesID), {}):
+            continue
+
+        table = read_table(opt, os.path.join(opt['dir']['extracted'], path), dtypes = DTYPES[phase])
+        store.setdefault((phase, sesID), {})[subID] = table
+
+    return store
+
+
+# Get the table of one subject from a loaded store
+def get_from_store(store, phase, subID, sesID):
+
+    tables = store.get((phase, sesID), {})
+
+    if subID in tables:
+        return tables[subID].copy()
+
+    # Only phases that can have empty files (e.g. no key pressed) can miss a subject in the store: 
+    # return an empty table with the same columns
+    if phase in EMPTY_PHASES:
+        if tables:
+            return next(iter(tables.values())).iloc[:0].copy()
+
+        return pd.DataFrame({col: pd.Series(dtype = dtype) for col, dtype in DTYPES[phase].items()})
+
+    raise KeyError(f"No {phase} trials of sub-{subID} ses-{sesID} in the loaded tables")
+
+
+### Subfunctions
+
+def get_store_path(opt, phase, sesID):
+
+    return os.path.join(opt['dir']['extracted'], 'VBT_trials', f'phase-{phase}', f'session-{sesID}')
+
+
+def get_store_filename(opt):
+
+    return 'trials.feather' if opt['store']['format'] == 'feather' else 'trials.parquet'
+
+
+# Read one file of the store, with column projection
+def read_store_file(opt, phaseDir, columns):
+
+    # Keep only the columns present in this phase and session 
+    # (e.g. letters training in session 1 has no words)
+    if columns is not None:
+        available = read_store_columns(opt, phaseDir)
+        columns = ['subject', 'session', 'script'] + [c for c in columns if c in available and c not in ['subject', 'session', 'script']]
+
+    if opt['store']['format'] == 'feather':
+        return pd.read_feather(os.path.join(phaseDir, 'trials.feather'), columns = columns)
+
+    return pd.read_parquet(os.path.join(phaseDir, 'trials.parquet'), columns = columns)
+
+
+# Names of the columns saved in one file of the store, without reading the data
+def read_store_columns(opt, phaseDir):
+
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    if opt['store']['format'] == 'feather':
+        return pyarrow.ipc.open_file(os.path.join(phaseDir, 'trials.feather')).schema.names
+    else:
+        return pyarrow.parquet.read_schema(os.path.join(phaseDir, 'trials.parquet')).names
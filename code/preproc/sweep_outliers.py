@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Standalone script to choose the cutoffs of the outliers, on a grid of thresholds
+
+From the tables saved by make_accuracy_timing to investigate outliers, evaluates at once:
+- writing time during test: every combination of maximum writing time and maximum breaks
+  (trials with writing time or breaks above the threshold are excluded)
+- reading time during training on words (days 2-3-4): every maximum reading time
+
+For each point of the grid, reports:
+- excluded: trials excluded (number and percentage)
+- meanTime: average across subjects of each subject's mean time, with the trials left
+- meanChange, maxChange: how much the subjects' means moved from the ones with all the trials
+  (average and largest change, in seconds)
+
+Trials are not filtered again for each point: each trial is placed once in the interval
+of the grid it falls in, and the trials left at each point are cumulative sums over the intervals.
+Results are saved in outputs/derivatives/stats/ and printed:
+    python sweep_outliers.py --writing 20 30 45 60 --breaks 15 30 60 --reading 30 45 60 90
+
+@author: Filippo Cerpelloni
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from preproc_option import preproc_option
+
+# Functions shared with stats and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+
+
+# Evaluate the grid of writing and breaks thresholds on the test trials
+def sweep_writing(outWR, writingGrid, breaksGrid):
+
+    writingGrid, breaksGrid = np.sort(writingGrid), np.sort(breaksGrid)
+
+    kept, sums, counts, allSums, allCounts = count_kept(outWR['sub'], outWR['writing'],
+                                                        [(outWR['writing'], writingGrid), (outWR['breaks'], breaksGrid)])
+
+    writing, breaks = np.meshgrid(writingGrid, breaksGrid, indexing = 'ij')
+    results = pd.DataFrame({'writing': writing.ravel(), 'breaks': breaks.ravel()})
+
+    return add_effects(results, len(outWR), kept, (sums, counts), (allSums, allCounts))
+
+
+# Evaluate the grid of reading thresholds on the training trials
+def sweep_reading(outRD, readingGrid):
+
+    readingGrid = np.sort(readingGrid)
+
+    kept, sums, counts, allSums, allCounts = count_kept(outRD['sub'], outRD['readingTime'],
+                                                        [(outRD['readingTime'], readingGrid)])
+
+    results = pd.DataFrame({'reading': readingGrid})
+
+    return add_effects(results, len(outRD), kept, (sums, counts), (allSums, allCounts))
+
+
+### Subfunctions
+
+# For each point of the grid, count the trials left and, for each subject, sum and number of the times left.
+# - subjects: subject of each trial
+# - times: time to average (missing times are never excluded and never averaged)
+# - thresholds: list of (values, sorted grid). A trial is kept if each value is below or equal to its threshold
+# Returns the trials kept (points), sums and counts of the times kept (subjects x points)
+# and sums and counts with all the trials (subjects)
+def count_kept(subjects, times, thresholds):
+
+    subCodes, _ = pd.factorize(subjects)
+    nSubjects = subCodes.max() + 1 if len(subCodes) else 0
+
+    # Interval of each trial for each threshold: number of thresholds below the value.
+    # The trial is kept from the threshold in that position on (trials without value by all of them)
+    shape = [len(grid) + 1 for _, grid in thresholds]
+    intervals = [np.searchsorted(grid, np.nan_to_num(values.to_numpy(dtype = float), nan = -np.inf), side = 'left')
+                 for values, grid in thresholds]
+
+    cell = np.ravel_multi_index(intervals, shape)
+    nCells = int(np.prod(shape))
+
+    # Count trials and times in each interval (and each subject)
+    timeValues = times.to_numpy(dtype = float)
+    hasTime = ~np.isnan(timeValues)
+
+    kept = np.bincount(cell, minlength = nCells).reshape(shape)
+    sums = np.bincount(subCodes * nCells + cell, weights = np.where(hasTime, timeValues, 0),
+                       minlength = nSubjects * nCells).reshape([nSubjects] + shape)
+    counts = np.bincount(subCodes * nCells + cell, weights = hasTime.astype(float),
+                         minlength = nSubjects * nCells).reshape([nSubjects] + shape)
+
+    # Trials kept at each point: all the ones in the intervals up to it
+    for axis in range(len(shape)):
+        kept = np.cumsum(kept, axis = axis)
+        sums = np.cumsum(sums, axis = axis + 1)
+        counts = np.cumsum(counts, axis = axis + 1)
+
+    # The last interval is above all the thresholds: it is never kept,
+    # and the last cumulative sums are the ones of all the trials
+    points = tuple(slice(0, n - 1) for n in shape)
+    allTrials = tuple(n - 1 for n in shape)
+
+    return (kept[points].ravel(),
+            sums[(slice(None),) + points].reshape(nSubjects, -1),
+            counts[(slice(None),) + points].reshape(nSubjects, -1),
+            sums[(slice(None),) + allTrials],
+            counts[(slice(None),) + allTrials])
+
+
+# Add to the results the trials excluded and the effect on the subjects' mean times
+# - times: sums and counts of the times of each subject (rows) at each point (columns)
+# - allTimes: sums and counts of the times of each subject with all the trials
+def add_effects(results, nTrials, kept, times, allTimes):
+
+    # Subjects without times left have no mean, and no change
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        means = times[0] / times[1]
+        change = np.abs(means - (allTimes[0] / allTimes[1])[:, None])
+
+    results['excluded'] = nTrials - kept
+    results['percentage'] = 100 * results['excluded'] / nTrials if nTrials else 0.0
+    results['meanTime'] = np.nanmean(means, axis = 0)
+    results['meanChange'] = np.nanmean(change, axis = 0)
+    results['maxChange'] = np.nanmax(change, axis = 0)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    opt = preproc_option()
+
+    # Command line: thresholds to evaluate, in seconds
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writing', type = float, nargs = '+', default = [20, 30, 45, 60, 90], help = 'maximum writing times')
+    parser.add_argument('--breaks', type = float, nargs = '+', default = [15, 30, 45, 60], help = 'maximum breaks')
+    parser.add_argument('--reading', type = float, nargs = '+', default = [30, 45, 60, 90, 120], help = 'maximum reading times')
+    args = parser.parse_args()
+
+    # Load files
+    outWR = read_table(opt, os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-writing.csv'), 
+                       ['sub', 'writing', 'breaks'], {'sub': str, 'writing': 'float64', 'breaks': 'float64'})
+    outRD = read_table(opt, os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-reading.csv'), 
+                       ['sub', 'readingTime'], {'sub': str, 'readingTime': 'float64'})
+
+    # Evaluate the grids
+    writing = sweep_writing(outWR, args.writing, args.breaks)
+    reading = sweep_reading(outRD, args.reading)
+
+    writing.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-sweep-writing.csv'), index = False)
+    reading.to_csv(os.path.join(opt['dir']['stats'], 'VBT_investigation-outliers-sweep-reading.csv'), index = False)
+
+    # Notify the user
+    with pd.option_context('display.width', 200, 'display.max_rows', 500):
+        print(f"\nWRITING TIME DURING TEST ({len(outWR)} trials)\n\n{writing.round(3).to_string(index = False)}")
+        print(f"\n\nREADING TIME DURING TRAINING ({len(outRD)} trials)\n\n{reading.round(3).to_string(index = False)}")
+
+    print(f"\nResults are stored in: {opt['dir']['stats']}")
@@ -25,18 +25,25 @@ List of statistics that are performed in this function
 """
 
 import os
+import sys
 import pandas as pd
 import pingouin as pg
 from dfply import group_by, summarize
 import scipy.stats as stats
 from statsmodels.stats.multitest import *
 
+# Functions shared with preproc and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+from profiling import profiled
+
 
 def stats_accuracy_timing(opt):
     
     # Load table
     summary = pd.DataFrame()
-    summary = pd.read_csv(os.path.join(opt['dir']['stats'], 'VBT_results-accuracy-timing.csv'))
+    summary = read_table(opt, os.path.join(opt['dir']['stats'], 'VBT_results-accuracy-timing.csv'), 
+                         dtypes = {'subject': str, 'script': str})
     
     ### ACCURACIES
     
@@ -110,6 +117,7 @@ def reshape_table(tableIn, relevantCols):
 # From a (supposedly correct) table
 # - extract descriptive statistics for group * day
 # - perform repeated measures / mixed ANOVA
+@profiled
 def get_stats(tableIn):
     
     # Descriptive statistics
@@ -129,6 +137,7 @@ def get_stats(tableIn):
 
 
 # Perform posthoc tests
+@profiled
 def get_stats_posthoc(tableIn):
     
     # Perform t-tests on the script diffrences across sessions
@@ -156,6 +165,7 @@ def get_stats_posthoc(tableIn):
 
 # Save results to csv
 # - renames 'target' variable to either 'accuracy' or 'timing'
+@profiled
 def save_stats(opt, tableIn, newVarName, filename):
     
     # rename variable from filename
@@ -7,18 +7,23 @@ Created on Thu Oct 24 15:40:46 2024
 """
 
 import os
+import sys
 import pandas as pd
 import pingouin as pg
 from dfply import group_by, summarize
 import scipy.stats as stats
 from statsmodels.stats.multitest import *
 
+# Functions shared with preproc and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+
 
 def stats_completion(opt):
     
     # Load table
     summary = pd.DataFrame()
-    summary = pd.read_csv(os.path.join(opt['dir']['stats'], 'VBT_experiment-completion-time.csv'))
+    summary = read_table(opt, os.path.join(opt['dir']['stats'], 'VBT_experiment-completion-time.csv'))
     
     sums = pd.DataFrame()
     
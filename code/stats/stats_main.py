@@ -6,9 +6,16 @@ Created on Tue Mar  5 09:24:02 2024
 @author: Filippo Cerpelloni
 """
 
+import os
+import sys
 from stats_option import stats_option
 from stats_accuracy_timing import *
 from stats_stimuli_properties import * 
+from stats_completion import *
+
+# Functions shared with preproc and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from profiling import start_profile, profile
 
 ### VISUAL BRAILLE TRAINING - MAKE SUMMARY TABLES
 # 
@@ -24,6 +31,9 @@ from stats_stimuli_properties import *
 # Get options
 opt = stats_option()
 
+# Measure each stage, if profiling is enabled in the options
+start_profile(opt, 'stats_main')
+
 
 ## Analyses on overall accuracy and timings 
 #
@@ -32,7 +42,8 @@ opt = stats_option()
 # - accuracy across training sessions 
 # - reading time during training sessions
 # - writing times during training and test sessions
-stats_accuracy_timing(opt)
+with profile('stats_accuracy_timing'):
+    stats_accuracy_timing(opt)
 
 
 ## Analyses on stimuli scores: accuracy and timings related to language statistics
@@ -44,8 +55,10 @@ stats_accuracy_timing(opt)
 # and
 # - word length, number of syllables, frequency, orthographic and phonological neighbours
 # - letter frrequency 
-stats_stimuli_properties(opt)
+with profile('stats_stimuli_properties'):
+    stats_stimuli_properties(opt)
 
 
 ## Sums and averages about the completion time of each session
-stats_completion(opt)
+with profile('stats_completion'):
+    stats_completion(opt)
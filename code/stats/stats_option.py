@@ -34,6 +34,23 @@ def stats_option():
     opt['pipeline']['type'] = 'stats'
 
 
+    ## CSV READER
+    # Parser used to read the csv files ('c' or 'pyarrow', requires pyarrow).
+    # Both read the decimals exactly as they were saved, so they give the same outputs.
+    # Report prints size and parsing time of each file read
+    opt['reader'] = {}
+    opt['reader']['engine'] = 'c'
+    opt['reader']['report'] = False
+
+
+    ## PROFILING
+    # Record time, rows, files read and written and peak memory of each stage (and of each analysis or figure).
+    # At the end of the run, the profile is saved as json in the output folder and summarized in a table
+    opt['profile'] = {}
+    opt['profile']['use'] = False
+    opt['profile']['output'] = os.path.join(opt['dir']['derivatives'], 'profiles')
+    
+
     ## ASSIGN SUBJECTS AND SCRIPTS
     # Load from participants.tsv 
     with open(os.path.join(opt['dir']['raw'], 'participants.tsv'), 'r') as f:
@@ -29,6 +29,7 @@ To operationalize, this function computes the following statistics:
 """
 
 import os
+import sys
 import pandas as pd
 import glob as glob
 from scipy.stats import pearsonr
@@ -36,25 +37,40 @@ import pingouin as pg
 from dfply import group_by, summarize
 import matplotlib.pyplot as plt
 
+# Functions shared with preproc and visualization
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+from profiling import profiled
+from vocabulary import load_vocabulary, get_vocabulary_dtypes
+
 
 
 def stats_stimuli_properties(opt):
     
+    # Words, subjects and scripts are read as categories shared by all the tables (see vocabulary.py)
+    vocabulary = load_vocabulary(opt)
+    
     # Load stimuli results 
-    leResults = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                         'VBT_stimuli-letters_desc-behavioural-results.csv'))
-    trResults = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                         'VBT_stimuli-training_desc-behavioural-results.csv'))
-    teResults = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                         'VBT_stimuli-test_desc-behavioural-results.csv'))
+    leResults = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                            'VBT_stimuli-letters_desc-behavioural-results.csv'), 
+                           dtypes = get_vocabulary_dtypes(vocabulary, {'subject': str, 'script': str, 'letter': str, 'woord': str}))
+    trResults = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                            'VBT_stimuli-training_desc-behavioural-results.csv'), 
+                           dtypes = get_vocabulary_dtypes(vocabulary, {'subject': str, 'script': str, 'letter': str, 'woord': str}))
+    teResults = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                            'VBT_stimuli-test_desc-behavioural-results.csv'), 
+                           dtypes = get_vocabulary_dtypes(vocabulary, {'subject': str, 'script': str, 'letter': str, 'woord': str}))
     
     # Load stimuli statistics
-    leStats = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                       'VBT_stimuli-letters_desc-list-with-stats.csv'))
-    trStats = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                       'VBT_stimuli-training_desc-list-with-stats.csv'))
-    teStats = pd.read_csv(os.path.join(opt['dir']['stats'], 'datasets', 
-                                       'VBT_stimuli-test_desc-list-with-stats.csv'))
+    leStats = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                          'VBT_stimuli-letters_desc-list-with-stats.csv'), 
+                         dtypes = get_vocabulary_dtypes(vocabulary, {'letter': str, 'woord': str}))
+    trStats = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                          'VBT_stimuli-training_desc-list-with-stats.csv'), 
+                         dtypes = get_vocabulary_dtypes(vocabulary, {'letter': str, 'woord': str}))
+    teStats = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 
+                                          'VBT_stimuli-test_desc-list-with-stats.csv'), 
+                         dtypes = get_vocabulary_dtypes(vocabulary, {'letter': str, 'woord': str}))
     
     
     # Calculate lenght for all stimuli, including pseudo-words
@@ -243,10 +259,11 @@ def merge_results_stats(tab, stats, flag):
         inds.reset_index(drop = True)
         
         # Average scores, writing time, distance from the correct answer
-        avgs = tab.groupby(['script', 'session', 'woord']).agg({'score': 'mean','writingTime': 'mean','distance': 'mean'}).reset_index()
+        avgs = tab.groupby(['script', 'session', 'woord'], observed = True).agg({'score': 'mean','writingTime': 'mean','distance': 'mean'}).reset_index()
     
         # In the averages, separate groups in different columns (BR v. CB)
-        avgs = avgs.pivot(index = 'woord', columns = 'script', values=['score', 'writingTime', 'distance'])
+        # (sorted by word, as the stats, also when words are categories)
+        avgs = avgs.pivot(index = 'woord', columns = 'script', values=['score', 'writingTime', 'distance']).sort_index()
         avgs.columns = ['_'.join(col) for col in avgs.columns]
         avgs.reset_index(inplace = True)
         
@@ -281,15 +298,15 @@ def merge_results_stats(tab, stats, flag):
         
         
         # Compute averages
-        tAvgs = t.groupby(['script', 'session', 'woord']).agg({'score': 'mean', 'writingTime': 'mean'}).reset_index()
-        ntAvgs = nt.groupby(['script','session','woord']).agg({'readingTime': 'mean','checkingTime': 'mean'}).reset_index()
+        tAvgs = t.groupby(['script', 'session', 'woord'], observed = True).agg({'score': 'mean', 'writingTime': 'mean'}).reset_index()
+        ntAvgs = nt.groupby(['script','session','woord'], observed = True).agg({'readingTime': 'mean','checkingTime': 'mean'}).reset_index()
         
         # In the averages, separate groups in different columns (BR v. CB)
-        tAvgs = tAvgs.pivot_table(index = ['session', 'woord'], columns = 'script', values = ['score', 'writingTime'], aggfunc = 'first')
+        tAvgs = tAvgs.pivot_table(index = ['session', 'woord'], columns = 'script', values = ['score', 'writingTime'], aggfunc = 'first', observed = True)
         tAvgs.columns = ['_'.join(map(str, col)).strip() for col in tAvgs.columns.values]
         tAvgs.reset_index(inplace=True)
         
-        ntAvgs = ntAvgs.pivot(index = ['session','woord'], columns = 'script', values = ['readingTime'])
+        ntAvgs = ntAvgs.pivot(index = ['session','woord'], columns = 'script', values = ['readingTime']).sort_index()
         ntAvgs.columns = ['_'.join(col) for col in ntAvgs.columns]
         ntAvgs.reset_index(inplace = True)
        
@@ -304,13 +321,13 @@ def merge_results_stats(tab, stats, flag):
     elif flag == 'letters':
         
         # Extract individual times (reading and checking), averaging the repetitions for each subject
-        inds = tab.groupby(['subject', 'script', 'repetition', 'letter']).agg({'readingTime': 'mean', 'checkingTime': 'mean'}).reset_index()
+        inds = tab.groupby(['subject', 'script', 'repetition', 'letter'], observed = True).agg({'readingTime': 'mean', 'checkingTime': 'mean'}).reset_index()
         
         # Merge with stats
         inds = pd.merge(inds, stats, on = 'letter', how = 'left') 
 
         # Compute averages
-        avgs = tab.groupby(['script', 'letter']).agg({'readingTime': 'mean', 'checkingTime': 'mean'}).reset_index()
+        avgs = tab.groupby(['script', 'letter'], observed = True).agg({'readingTime': 'mean', 'checkingTime': 'mean'}).reset_index()
     
         # Separate groups into different columns, to avoid having too many variables
         avgs = avgs.pivot(index = 'letter', columns = 'script', values = ['readingTime', 'checkingTime'])
@@ -328,6 +345,7 @@ def merge_results_stats(tab, stats, flag):
                 
 
 # Correlate each column to all the other ones and produce clean output with stats
+@profiled
 def correlate_letters(tab):
     
     tab.reset_index(inplace = True)
@@ -379,6 +397,7 @@ def correlate_letters(tab):
 
 
 # Correlate each column to all the other ones and produce clean output with stats
+@profiled
 def correlate_trainings(tab):
     
     tab.reset_index(inplace = True)
@@ -443,6 +462,7 @@ def correlate_trainings(tab):
 
 
 # Correlate each column to all the other ones and produce clean output with stats
+@profiled
 def correlate_tests(tab):
     
     tab.reset_index(inplace = True)
@@ -456,7 +476,7 @@ def correlate_tests(tab):
         # * correlation table has more information, more columns
         resultColumns = ['score', 'writingTime', 'distance']
         statsColumns = ['length', 'frequency', 'old20']
-        fullColumns = ['score', 'writingTime', 'distance', 'length']
+        fullColumns = ['score', 'writingTime', 'distance', 'length', 'old20']
         session = tab['session_x'][0]
         correlationColumns = ['subject', 'script', 'column1', 'column2', 'stimuli', 'session', 
                               'correlation', 'p_value', 'degrees_of_freedom']
@@ -465,7 +485,7 @@ def correlate_tests(tab):
         # Average scores - duplicate scores, distances, times, and restriced info in correlation table
         resultColumns = ['score_br', 'score_cb', 'distance_br', 'distance_cb', 'writingTime_br', 'writingTime_cb']
         statsColumns = ['length', 'frequency', 'old20']
-        fullColumns = ['score_br', 'score_cb', 'distance_br', 'distance_cb', 'writingTime_br', 'writingTime_cb', 'length']
+        fullColumns = ['score_br', 'score_cb', 'distance_br', 'distance_cb', 'writingTime_br', 'writingTime_cb', 'length', 'old20']
         session = tab['session'][0]
         correlationColumns = ['column1', 'column2', 'stimuli', 'session', 'correlation', 'p_value', 'degrees_of_freedom']
 
@@ -544,6 +564,7 @@ def add_correlations(tab, col1, col2, corrs, stimulus, session):
 # From a (supposedly correct) table
 # - extract descriptive statistics for group * day
 # - perform repeated measures / mixed ANOVA
+@profiled
 def get_stats(opt, tableIn, name):
     
     # Descriptive statistics
@@ -7,21 +7,27 @@ Created on Mon Mar 25 15:25:34 2024
 """
 
 import os
+import sys
 import glob
 import pathlib as Path
 import pandas as pd
 import matplotlib.pyplot as plt
 
+# Functions shared with preproc and stats
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+from profiling import profiled
+
 
 def viz_accuracy_timing(opt):
     
     # Load the necessary files
     # - descriptive stats related to 'rmanova' analyses
-    teAccuracy = pd.read_csv(os.path.join(opt['dir']['results'], 'VBT_data-test_variable-accuracy_analysis-descriptive.csv'))
-    teWritingTime = pd.read_csv(os.path.join(opt['dir']['results'], 'VBT_data-test_variable-writing-time_analysis-descriptive.csv'))
+    teAccuracy = read_table(opt, os.path.join(opt['dir']['results'], 'VBT_data-test_variable-accuracy_analysis-descriptive.csv'))
+    teWritingTime = read_table(opt, os.path.join(opt['dir']['results'], 'VBT_data-test_variable-writing-time_analysis-descriptive.csv'))
     
-    trAccuracy = pd.read_csv(os.path.join(opt['dir']['results'], 'VBT_data-training_variable-accuracy_analysis-descriptive.csv'))
-    trReadingTime = pd.read_csv(os.path.join(opt['dir']['results'], 'VBT_data-training_variable-reading-time_analysis-descriptive.csv'))
+    trAccuracy = read_table(opt, os.path.join(opt['dir']['results'], 'VBT_data-training_variable-accuracy_analysis-descriptive.csv'))
+    trReadingTime = read_table(opt, os.path.join(opt['dir']['results'], 'VBT_data-training_variable-reading-time_analysis-descriptive.csv'))
 
     
     # Call the plotting function for each anova
@@ -53,6 +59,7 @@ def viz_accuracy_timing(opt):
 ### Subfunctions
 
 # Main plotting function for ANOVA results (no data cloud so far)
+@profiled
 def viz_plot_rmanova(opt, res, information):
 
     # ADD DATA CLOUDS OF INDIVIDUAL DATA
@@ -92,6 +99,7 @@ def viz_plot_rmanova(opt, res, information):
     
 
 # Plot a big legend with only dots
+@profiled
 def viz_plot_circle_legend(opt):
     
     # Create a figure with a specific size
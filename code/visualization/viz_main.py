@@ -7,10 +7,16 @@ Created on Mon Mar 25 11:18:54 2024
 """
 
 
+import os
+import sys
 from viz_option import viz_option
 from viz_accuracy_timing import * 
 from viz_stimuli_statistics import *
 
+# Functions shared with preproc and stats
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from profiling import start_profile, profile
+
 ### VISUAL BRAILLE TRAINING - VISUALIZATION
 # 
 # Main script to make plots 
@@ -18,6 +24,9 @@ from viz_stimuli_statistics import *
 # Get options
 opt = viz_option()
 
+# Measure each stage, if profiling is enabled in the options
+start_profile(opt, 'viz_main')
+
 
 ## Analyses on overall accuracy and timings 
 #
@@ -26,7 +35,8 @@ opt = viz_option()
 # - accuracy across training sessions 
 # - reading time during training sessions
 # - writing times during training and test sessions
-viz_accuracy_timing(opt)
+with profile('viz_accuracy_timing'):
+    viz_accuracy_timing(opt)
 
 
 ## Analyses on stimuli scores: accuracy and timings related to language statistics
@@ -38,7 +48,8 @@ viz_accuracy_timing(opt)
 # and
 # - word length, number of syllables, frequency, orthographic and phonological neighbours
 # - letter frrequency 
-viz_stimuli_statistics(opt)
+with profile('viz_stimuli_statistics'):
+    viz_stimuli_statistics(opt)
 
 
 # viz_scatter(opt)
\ No newline at end of file
@@ -7,22 +7,31 @@ Created on Thu Jun  6 10:26:25 2024
 """
 
 import os
+import sys
 import glob
 import pathlib as Path
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Functions shared with preproc and stats
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+from vocabulary import load_vocabulary, get_vocabulary_dtypes
+
 
 def viz_scatter(opt):
     
     # Read tables
-    results = pd.read_csv('../../outputs/derivatives/stats/datasets/VBT_stimuli-test_desc-behavioural-results.csv')
-    stats = pd.read_csv('../../outputs/derivatives/stats/datasets/VBT_stimuli-test_desc-list-with-stats.csv')
-    
-    # Skim datasets 
-    results = results[['subject','script','session','woord','writingTime']]
-    stats = stats[['woord','session','stimulus','old20']]
+    # Skim datasets: only read the columns needed
+    # Words, subjects and scripts are categories shared by the tables (see vocabulary.py): the merge is on their codes
+    vocabulary = load_vocabulary(opt)
+    results = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-behavioural-results.csv'), 
+                         ['subject','script','session','woord','writingTime'], 
+                         get_vocabulary_dtypes(vocabulary, {'subject': str, 'script': str, 'session': 'int64', 'woord': str, 'writingTime': 'float64'}))
+    stats = read_table(opt, os.path.join(opt['dir']['stats'], 'datasets', 'VBT_stimuli-test_desc-list-with-stats.csv'), 
+                       ['woord','session','stimulus','old20'], 
+                       get_vocabulary_dtypes(vocabulary, {'woord': str, 'session': 'int64', 'stimulus': str, 'old20': 'float64'}))
     merged = pd.merge(results, stats, on = 'woord', how = 'inner')
     
     merged = merged[merged['stimulus'] != 'pseudo']
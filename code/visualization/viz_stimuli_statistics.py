@@ -7,6 +7,7 @@ Created on Tue Mar 26 11:27:21 2024
 """
 
 import os
+import sys
 import glob
 import pathlib as Path
 import pandas as pd
@@ -14,6 +15,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 
+# Functions shared with preproc and stats
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from read_tables import read_table
+from profiling import profiled
+
 
 def viz_stimuli_statistics(opt):
     
@@ -33,10 +39,10 @@ def viz_stimuli_statistics(opt):
     #                         'VBT_data-training_variable-linguistic-stats_analysis-correlations_desc-nontested-items-individual.csv'))
     
     # - correlations for test phase
-    teCorrAvgs = pd.read_csv(os.path.join(opt['dir']['results'], 
-                            'VBT_data-test_variable-linguistic-stats_analysis-correlations_desc-average.csv'))
-    teCorrInds = pd.read_csv(os.path.join(opt['dir']['results'], 
-                            'VBT_data-test_variable-linguistic-stats_analysis-correlations_desc-individual.csv'))
+    teCorrAvgs = read_table(opt, os.path.join(opt['dir']['results'], 
+                                 'VBT_data-test_variable-linguistic-stats_analysis-correlations_desc-average.csv'))
+    teCorrInds = read_table(opt, os.path.join(opt['dir']['results'], 
+                                 'VBT_data-test_variable-linguistic-stats_analysis-correlations_desc-individual.csv'))
     
     
     # Call the plotting function for each of the following correlations:
@@ -62,7 +68,7 @@ def viz_stimuli_statistics(opt):
     for m in matchingFiles:
         
         # Load file
-        corr = pd.read_csv(m)
+        corr = read_table(opt, m)
         
         # Plot it
     
@@ -131,6 +137,7 @@ def viz_plot_test_correlations(opt, avgs, params):
                     viz_plot_correlations(opt, selection, params)
 
 
+@profiled
 def viz_plot_correlations(opt, subset, params):
     
     # Separate data for 'br' and 'cb' scripts
@@ -218,6 +225,7 @@ def viz_plot_correlations(opt, subset, params):
     
 
 # Plot the results of the rmANOVAs on individual correlations 
+@profiled
 def viz_anova_correlations(opt, subset, params):
 
     # Custom colors and ofsets
@@ -289,6 +297,7 @@ def viz_anova_correlations(opt, subset, params):
     
 # Make legend with squares
 # Plot a big legend with only squares
+@profiled
 def viz_plot_square_legend(opt):
     
     # Create a figure with a specific size